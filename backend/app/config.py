@@ -12,11 +12,59 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     
+    # Pool de conexiones (por worker de uvicorn: el total hacia Postgres es
+    # workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) por cada engine)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # segundos antes de reabrir una conexión
+    # Detrás de pgbouncer en modo transacción: sin sentencias preparadas
+    # ni parámetros de sesión
+    DB_PGBOUNCER: bool = False
+    
+    # Réplica de lectura (opcional): los GET leen de aquí, salvo durante
+    # READ_AFTER_WRITE_SECONDS después de que el mismo usuario escribe
+    READ_DATABASE_URL: Optional[str] = None
+    READ_AFTER_WRITE_SECONDS: float = 5.0
+    # Con varios workers o nodos esa ventana debe compartirse: con REDIS_URL
+    # se guarda en Redis; sin ella vive en cada proceso (un solo worker)
+    
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Tokens verificados que se recuerdan hasta su exp (0 lo desactiva)
+    JWT_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Hash de passwords: costo de bcrypt (al cambiarlo, cada hash se
+    # actualiza en el siguiente login), hilos dedicados (0 = uno por CPU) y
+    # cuántas peticiones pueden esperar turno antes de responder 503
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_THREADS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 64
     
+    # Caché del usuario autenticado (0 lo desactiva)
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Chat en tiempo real con varios workers/nodos: "memoria" (un solo
+    # proceso), "postgres" (LISTEN/NOTIFY) o "redis" (requiere REDIS_URL).
+    # LISTEN no funciona a través de pgbouncer en modo transacción: en ese
+    # caso CHAT_DATABASE_URL debe apuntar directo al servidor.
+    CHAT_BACKPLANE: str = "memoria"
+    CHAT_DATABASE_URL: Optional[str] = None
+    REDIS_URL: Optional[str] = None
+    # Mensajes pendientes por socket y tiempo máximo de cada envío; el
+    # socket que se pasa de cualquiera de los dos se cierra
+    CHAT_SEND_QUEUE_SIZE: int = 100
+    CHAT_SEND_TIMEOUT_SECONDS: float = 5.0
+    # Mensajes del WebSocket: se insertan por lotes cada CHAT_WRITE_BATCH_MS
+    # (o al juntar CHAT_WRITE_BATCH_SIZE); con CHAT_WRITE_MAX_PENDING en
+    # espera, los nuevos esperan turno
+    CHAT_WRITE_BATCH_MS: float = 10.0
+    CHAT_WRITE_BATCH_SIZE: int = 500
+    CHAT_WRITE_MAX_PENDING: int = 10000
+
     # Environment
     ENVIRONMENT: str = "development"
     
@@ -2,16 +2,26 @@
 Configuración de la base de datos - VERSIÓN CORREGIDA
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.requests import HTTPConnection
 from app.config import settings
+from typing import Dict, Optional
+import os
+import re
+import threading
+import time
 import urllib.parse
+import uuid
 
 # Codificar la URL de la base de datos para evitar problemas de caracteres
-def get_database_url():
+def get_database_url(db_url: Optional[str] = None):
     """Obtener y codificar correctamente la URL de la base de datos"""
-    db_url = settings.DATABASE_URL
+    db_url = db_url or settings.DATABASE_URL
     
     # Si contiene caracteres problemáticos, usar versión codificada
     if 'postgresql+psycopg2://' in db_url:
@@ -31,26 +41,482 @@ def get_database_url():
     
     return db_url
 
-# Crear engine con configuración robusta
-engine = create_engine(
-    get_database_url(),
-    pool_pre_ping=True,
-    echo=False,  # Desactivar echo temporalmente
-    connect_args={
-        "options": "-c client_encoding=utf8"
+
+def get_async_database_url(db_url: Optional[str] = None):
+    """URL de la base de datos con el driver asíncrono (asyncpg)"""
+    parsed = urllib.parse.urlparse(get_database_url(db_url))
+    return urllib.parse.urlunparse(parsed._replace(scheme='postgresql+asyncpg'))
+
+# ============================================================================
+# POOL DE CONEXIONES INSTRUMENTADO
+# ============================================================================
+
+class MetricasPool:
+    """
+    Contadores de un pool: cuántas conexiones se piden, cuánto se espera por
+    ellas, cuántas veces se abre una conexión de overflow y cuántas peticiones
+    se rinden (timeout). Se comparte entre hilos, por eso el lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.maximo_en_uso = 0
+        self.eventos_overflow = 0
+        self.timeouts = 0
+
+    def registrar_checkout(self, espera: float, en_uso: int, abrio_overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+            self.maximo_en_uso = max(self.maximo_en_uso, en_uso)
+            if abrio_overflow:
+                self.eventos_overflow += 1
+
+    def registrar_timeout(self, espera: float):
+        with self._lock:
+            self.timeouts += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+
+    def resumen(self, pool: QueuePool) -> dict:
+        """Estado actual del pool más los contadores acumulados"""
+        with self._lock:
+            intentos = self.checkouts + self.timeouts
+            return {
+                "tamano_pool": pool.size(),
+                "en_uso": pool.checkedout(),
+                "libres": pool.checkedin(),
+                "overflow_actual": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "maximo_en_uso": self.maximo_en_uso,
+                "checkouts": self.checkouts,
+                "espera_promedio_ms": round(self.espera_total / intentos * 1000, 3) if intentos else 0.0,
+                "espera_maxima_ms": round(self.espera_maxima * 1000, 3),
+                "eventos_overflow": self.eventos_overflow,
+                "timeouts": self.timeouts,
+            }
+
+
+class _MedicionPool:
+    """
+    Mide cada checkout del pool. El tiempo incluye esperar una conexión
+    libre, abrir una nueva si hace falta y el pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def connect(self):
+        inicio = time.perf_counter()
+        overflow_antes = self._overflow
+        try:
+            conexion = super().connect()
+        except exc.TimeoutError:
+            self.metricas.registrar_timeout(time.perf_counter() - inicio)
+            raise
+
+        # _overflow empieza en -pool_size y sube con cada conexión nueva:
+        # si quedó arriba de 0, esta conexión rebasó pool_size
+        abrio_overflow = self._overflow > overflow_antes and self._overflow > 0
+        self.metricas.registrar_checkout(time.perf_counter() - inicio, self.checkedout(), abrio_overflow)
+        return conexion
+
+    def recreate(self):
+        # dispose() o una conexión invalidada recrean el pool: conservar contadores
+        nuevo = super().recreate()
+        nuevo.metricas = self.metricas
+        return nuevo
+
+
+class PoolInstrumentado(_MedicionPool, QueuePool):
+    """QueuePool con métricas (engine síncrono)"""
+
+
+class PoolAsyncInstrumentado(_MedicionPool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool con métricas (engine asyncpg)"""
+
+
+def opciones_pool() -> dict:
+    """Parámetros del pool tomados de Settings, iguales para ambos engines"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
     }
+
+
+# pgbouncer en modo transacción reparte las transacciones entre varias
+# conexiones del servidor:
+#   - no acepta el parámetro de arranque "options" (client_encoding sí)
+#   - una sentencia preparada en una conexión no existe en la siguiente, así
+#     que asyncpg no debe cachearlas y cada una lleva nombre único
+# Las transacciones ya son cortas: una sesión por petición que se cierra al
+# terminar (get_db / get_async_db), sin estado de sesión (SET, LISTEN, etc.).
+if settings.DB_PGBOUNCER:
+    CONNECT_ARGS_SYNC = {"client_encoding": "utf8"}
+    CONNECT_ARGS_ASYNC = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+else:
+    CONNECT_ARGS_SYNC = {"options": "-c client_encoding=utf8"}
+    CONNECT_ARGS_ASYNC = {}
+
+
+def crear_engine(url: str):
+    """Engine síncrono con el pool instrumentado"""
+    return create_engine(
+        get_database_url(url),
+        poolclass=PoolInstrumentado,
+        echo=False,  # Desactivar echo temporalmente
+        connect_args=CONNECT_ARGS_SYNC,
+        **opciones_pool()
+    )
+
+
+def crear_engine_async(url: str):
+    """
+    Engine asíncrono (asyncpg) para los routers async def: las consultas
+    esperan con await en vez de bloquear el event loop. asyncpg ya usa UTF-8,
+    no necesita client_encoding
+    """
+    return create_async_engine(
+        get_async_database_url(url),
+        poolclass=PoolAsyncInstrumentado,
+        echo=False,
+        connect_args=CONNECT_ARGS_ASYNC,
+        **opciones_pool()
+    )
+
+
+# ============================================================================
+# RÉPLICA DE LECTURA
+# ============================================================================
+
+# Métodos HTTP que no modifican datos: sus consultas pueden ir a la réplica
+METODOS_LECTURA = {"GET", "HEAD"}
+
+
+class FijacionesPrimario:
+    """
+    Usuarios que escribieron hace poco: hasta que pase la ventana, todas sus
+    peticiones leen del primario, así ven sus propios cambios aunque la
+    réplica vaya atrasada.
+
+    Vive en memoria del proceso: cada worker conoce solo las escrituras que
+    atendió él, así que solo sirve con un worker. Con varios workers o nodos
+    y réplica de lectura se usa FijacionesRedis (ver crear_fijaciones).
+    """
+
+    # Al pasar de este tamaño se purgan las fijaciones vencidas
+    MAXIMO_SIN_PURGAR = 10000
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self._lock = threading.Lock()
+        self._hasta: Dict[str, float] = {}
+
+    def fijar(self, id_usuario):
+        ahora = time.monotonic()
+        with self._lock:
+            self._hasta[str(id_usuario)] = ahora + self.segundos
+            if len(self._hasta) > self.MAXIMO_SIN_PURGAR:
+                self._hasta = {k: hasta for k, hasta in self._hasta.items() if hasta > ahora}
+
+    def activa(self, id_usuario) -> bool:
+        hasta = self._hasta.get(str(id_usuario))
+        return hasta is not None and hasta > time.monotonic()
+
+    async def fijar_async(self, id_usuario):
+        self.fijar(id_usuario)
+
+    async def activa_async(self, id_usuario) -> bool:
+        return self.activa(id_usuario)
+
+
+class FijacionesRedis:
+    """
+    Las mismas fijaciones en Redis, compartidas por todos los workers y
+    nodos: una llave por usuario que vence sola al terminar la ventana.
+    Las sesiones síncronas usan el cliente síncrono y las AsyncSession el
+    asíncrono, para no bloquear el event loop.
+
+    Si Redis no responde, la petición lee del primario: nunca de más en la
+    réplica.
+    """
+
+    PREFIJO = "campusnest:primario"
+    TIMEOUT_SEGUNDOS = 0.5
+
+    def __init__(self, url: str, segundos: float):
+        try:
+            import redis
+            import redis.asyncio as redis_async
+        except ImportError:
+            raise RuntimeError("READ_DATABASE_URL con REDIS_URL requiere el paquete redis (pip install redis)")
+
+        self.segundos = segundos
+        opciones = {"socket_timeout": self.TIMEOUT_SEGUNDOS, "socket_connect_timeout": self.TIMEOUT_SEGUNDOS}
+        self._redis = redis.Redis.from_url(url, **opciones)
+        self._redis_async = redis_async.from_url(url, **opciones)
+
+    def _llave(self, id_usuario) -> str:
+        return f"{self.PREFIJO}:{id_usuario}"
+
+    def fijar(self, id_usuario):
+        try:
+            self._redis.set(self._llave(id_usuario), "1", px=int(self.segundos * 1000))
+        except Exception as e:
+            print(f"⚠️ No se pudo fijar al primario a {id_usuario} en Redis: {e}")
+
+    def activa(self, id_usuario) -> bool:
+        try:
+            return bool(self._redis.exists(self._llave(id_usuario)))
+        except Exception:
+            return True
+
+    async def fijar_async(self, id_usuario):
+        try:
+            await self._redis_async.set(self._llave(id_usuario), "1", px=int(self.segundos * 1000))
+        except Exception as e:
+            print(f"⚠️ No se pudo fijar al primario a {id_usuario} en Redis: {e}")
+
+    async def activa_async(self, id_usuario) -> bool:
+        try:
+            return bool(await self._redis_async.exists(self._llave(id_usuario)))
+        except Exception:
+            return True
+
+
+HAY_REPLICA = bool(settings.READ_DATABASE_URL)
+
+
+def crear_fijaciones():
+    """
+    Fijaciones en Redis si hay réplica y REDIS_URL; si no, en memoria del
+    proceso (sin réplica no se consultan)
+    """
+    if HAY_REPLICA and settings.REDIS_URL:
+        return FijacionesRedis(settings.REDIS_URL, settings.READ_AFTER_WRITE_SECONDS)
+    if HAY_REPLICA:
+        print("⚠️ READ_DATABASE_URL sin REDIS_URL: las fijaciones al primario son por proceso, correr con un solo worker")
+    return FijacionesPrimario(settings.READ_AFTER_WRITE_SECONDS)
+
+
+fijaciones_primario = crear_fijaciones()
+
+# SQL en texto que modifica datos: empieza con INSERT/UPDATE/DELETE/MERGE, o
+# es un WITH cuyo cuerpo los usa (ej: WITH x AS (...) DELETE ...)
+_DML_EN_TEXTO = re.compile(
+    r"^\s*(?:(?:INSERT|UPDATE|DELETE|MERGE)\b|WITH\b.*\b(?:INSERT\s+INTO|UPDATE\s+\S+\s+SET|DELETE\s+FROM|MERGE\s+INTO)\b)",
+    re.IGNORECASE | re.DOTALL
 )
 
+
+def es_escritura(sentencia) -> bool:
+    """
+    True si la sentencia modifica datos: insert()/update()/delete() del ORM o
+    Core, o un text() con INSERT/UPDATE/DELETE (favoritos, calificaciones)
+    """
+    if getattr(sentencia, "is_dml", False):
+        return True
+    return isinstance(sentencia, TextClause) and bool(_DML_EN_TEXTO.match(sentencia.text))
+
+
+class SesionEnrutada(Session):
+    """
+    Sesión que elige servidor en cada consulta. Las lecturas van a la réplica
+    solo si la sesión se marcó de solo lectura (ver preparar_sesion); los
+    flush y las sentencias INSERT/UPDATE/DELETE (también en text()) siempre
+    van al primario.
+    Después de la primera escritura toda la sesión se queda en el primario,
+    para que un refresh o una consulta posterior vean lo recién escrito.
+    """
+
+    # Las sesiones síncronas fijan al usuario al hacer commit; las que están
+    # detrás de una AsyncSession lo hacen con await en SesionAsync.commit
+    fijar_al_commit = True
+
+    def __init__(self, *args, replica=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._replica is not None and self.info.get("solo_lectura"):
+            if not self._flushing and not es_escritura(clause):
+                return self._replica
+            self.info["solo_lectura"] = False
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class SesionEnrutadaAsync(SesionEnrutada):
+    """SesionEnrutada que usa por dentro una SesionAsync"""
+
+    fijar_al_commit = False
+
+
+class SesionAsync(AsyncSession):
+    """AsyncSession que, después del commit, fija al usuario con await"""
+
+    async def commit(self):
+        await super().commit()
+        id_usuario = self.info.pop("fijar_primario", None)
+        if id_usuario is not None:
+            await fijaciones_primario.fijar_async(id_usuario)
+
+
+# Solo un commit que escribió algo fija al usuario: flush con cambios reales
+# o un INSERT/UPDATE/DELETE ejecutado directamente (con el ORM o en text())
+
+@event.listens_for(SesionEnrutada, "after_flush")
+def _registrar_flush_con_cambios(session, flush_context):
+    if session.deleted or session.new or any(session.is_modified(objeto) for objeto in session.dirty):
+        session.info["escribio"] = True
+
+
+@event.listens_for(SesionEnrutada, "do_orm_execute")
+def _registrar_dml(orm_execute_state):
+    if es_escritura(orm_execute_state.statement):
+        orm_execute_state.session.info["escribio"] = True
+
+
+@event.listens_for(SesionEnrutada, "after_commit")
+def _fijar_primario_tras_escritura(session):
+    """Un commit con escrituras y usuario asociado abre su ventana de lectura en el primario"""
+    id_usuario = session.info.get("id_usuario")
+    if not session.info.pop("escribio", False) or id_usuario is None:
+        return
+    if session.fijar_al_commit:
+        fijaciones_primario.fijar(id_usuario)
+    else:
+        session.info["fijar_primario"] = id_usuario
+
+
+@event.listens_for(SesionEnrutada, "after_rollback")
+def _descartar_escrituras(session):
+    session.info.pop("escribio", None)
+
+
+def _id_usuario_del_token(conexion: HTTPConnection) -> Optional[str]:
+    """Claim sub del Bearer token, sin validar que el usuario exista"""
+    # Import local: app.utils importa las dependencias, que importan este módulo
+    from app.utils.security import decode_access_token
+
+    authorization = conexion.headers.get("authorization", "")
+    if not authorization.startswith("Bearer "):
+        return None
+    payload = decode_access_token(authorization.replace("Bearer ", ""))
+    return payload.get("sub") if payload else None
+
+
+def asociar_usuario(db, id_usuario):
+    """
+    Asocia la sesión a un usuario para que sus escrituras lo fijen al
+    primario. get_db lo hace a partir del token; usar cuando la petición no
+    trae uno (ej: registro de un usuario nuevo).
+    """
+    db.info["id_usuario"] = str(id_usuario)
+
+
+def _asociar_peticion(db, conexion: HTTPConnection) -> Optional[str]:
+    """
+    Asocia la sesión al usuario del token. Devuelve su id si la petición es
+    de lectura y falta revisar su fijación para decidir el servidor.
+    """
+    id_usuario = _id_usuario_del_token(conexion)
+    if id_usuario is not None:
+        asociar_usuario(db, id_usuario)
+    db.info["solo_lectura"] = conexion.scope.get("method") in METODOS_LECTURA
+    return id_usuario if db.info["solo_lectura"] else None
+
+
+def preparar_sesion(db, conexion: HTTPConnection):
+    """
+    Decide si la sesión de esta petición puede leer de la réplica: solo en
+    GET/HEAD y si el usuario no escribió dentro de la ventana
+    READ_AFTER_WRITE_SECONDS.
+    """
+    if not HAY_REPLICA:
+        return
+
+    id_usuario = _asociar_peticion(db, conexion)
+    if id_usuario is not None and fijaciones_primario.activa(id_usuario):
+        db.info["solo_lectura"] = False
+
+
+async def preparar_sesion_async(db, conexion: HTTPConnection):
+    """preparar_sesion para get_async_db, sin bloquear el event loop"""
+    if not HAY_REPLICA:
+        return
+
+    id_usuario = _asociar_peticion(db, conexion)
+    if id_usuario is not None and await fijaciones_primario.activa_async(id_usuario):
+        db.info["solo_lectura"] = False
+
+
+# Crear engines (primario y, si está configurada, réplica de lectura)
+engine = crear_engine(settings.DATABASE_URL)
+async_engine = crear_engine_async(settings.DATABASE_URL)
+
+read_engine = crear_engine(settings.READ_DATABASE_URL) if HAY_REPLICA else None
+async_read_engine = crear_engine_async(settings.READ_DATABASE_URL) if HAY_REPLICA else None
+
 # Crear SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=SesionEnrutada,
+    replica=read_engine
+)
+
+# expire_on_commit=False: después del commit los objetos siguen legibles sin
+# otra consulta (en async no hay carga perezosa implícita)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=SesionAsync,
+    sync_session_class=SesionEnrutadaAsync,
+    replica=async_read_engine.sync_engine if HAY_REPLICA else None,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+def metricas_pools() -> dict:
+    """Métricas de los pools de este worker (cada worker tiene los suyos)"""
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    if HAY_REPLICA:
+        engines["sync_replica"] = read_engine
+        engines["async_replica"] = async_read_engine.sync_engine
+
+    metricas = {"pid": os.getpid(), "pgbouncer": settings.DB_PGBOUNCER}
+    for nombre, motor in engines.items():
+        metricas[nombre] = motor.pool.metricas.resumen(motor.pool)
+    return metricas
 
 # Base para modelos
 Base = declarative_base()
 
 # Dependency para FastAPI
-def get_db():
+def get_db(conexion: HTTPConnection):
     db = SessionLocal()
+    preparar_sesion(db, conexion)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency asíncrona para los routers async def
+async def get_async_db(conexion: HTTPConnection):
+    async with AsyncSessionLocal() as db:
+        await preparar_sesion_async(db, conexion)
+        yield db
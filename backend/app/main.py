@@ -2,10 +2,15 @@
 Main application file - CampusNest API
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal, metricas_pools
+from app.services.indice_espacial import indice_propiedades
+from app.services.buffer_mensajes import buffer_mensajes
+from app.utils.paginacion import HEADER_SIGUIENTE_CURSOR
+from app.utils.security import pool_hashing
 
 # ============================================================================
 # IMPORTS DE ROUTERS - TODOS LOS MÓDULOS
@@ -24,6 +29,37 @@ from app.routers import (
     notificaciones     # Router de notificaciones
 )
 
+# ============================================================================
+# CICLO DE VIDA (startup / shutdown)
+# ============================================================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Tareas al iniciar y detener la aplicación"""
+    
+    # Construir el índice espacial de propiedades disponibles.
+    # Si la BD no responde, se construirá en la primera búsqueda.
+    db = SessionLocal()
+    try:
+        indice_propiedades.construir(db)
+        print(f"✅ Índice espacial construido: {len(indice_propiedades)} propiedades")
+    except Exception as e:
+        print(f"⚠️ No se pudo construir el índice espacial: {e}")
+    finally:
+        db.close()
+    
+    # Backplane del chat (entrega entre workers/nodos y presencia) y
+    # buffer de escritura de los mensajes del WebSocket
+    await mensajes.manager.iniciar()
+    await buffer_mensajes.iniciar()
+    
+    yield
+    
+    # Primero guardar lo pendiente, después cerrar los sockets
+    await buffer_mensajes.detener()
+    await mensajes.manager.detener()
+
+
 # ============================================================================
 # CREAR INSTANCIA DE FASTAPI
 # ============================================================================
@@ -33,7 +69,8 @@ app = FastAPI(
     description="API para plataforma de renta de alojamiento estudiantil",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # ============================================================================
@@ -46,6 +83,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[HEADER_SIGUIENTE_CURSOR],
 )
 
 # ============================================================================
@@ -154,6 +192,22 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+@app.get("/health/pool")
+async def pool_metrics():
+    """
+    Métricas de los pools de conexiones de este worker: conexiones en uso,
+    tiempo de espera por conexión, eventos de overflow y timeouts
+    """
+    return metricas_pools()
+
+@app.get("/health/hashing")
+async def hashing_metrics():
+    """
+    Métricas del pool de bcrypt de este worker: cola, hashes en ejecución,
+    tiempo de espera y de cálculo, y peticiones rechazadas (503)
+    """
+    return pool_hashing.metricas()
+
 # ============================================================================
 # EJECUTAR APLICACIÓN
 # ============================================================================
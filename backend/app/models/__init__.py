@@ -1,5 +1,5 @@
 from app.models.usuario import Usuario, PerfilEstudiante, PerfilArrendador
-from app.models.propiedad import Propiedad, CaracteristicaPropiedad, FotoPropiedad
+from app.models.propiedad import Propiedad, CaracteristicaPropiedad, FotoPropiedad, DistanciaPropiedadCampus
 from app.models.renta_reporte import Renta, ReporteInquilino
 
 __all__ = [
@@ -9,6 +9,7 @@ __all__ = [
     "Propiedad",
     "CaracteristicaPropiedad", 
     "FotoPropiedad",
+    "DistanciaPropiedadCampus",
     "Renta", 
     "ReporteInquilino"
 ]
@@ -3,7 +3,7 @@ Modelos adicionales: Mensajes, Notificaciones y Pagos
 AGREGAR ESTE CONTENIDO A TUS MODELOS EXISTENTES
 """
 
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Integer, Text, Float
+from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Index, Integer, Text, Float
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -33,6 +33,26 @@ class Mensaje(Base):
     destinatario = relationship("Usuario", foreign_keys=[id_destinatario], backref="mensajes_recibidos")
     propiedad = relationship("Propiedad", back_populates="mensajes", foreign_keys=[id_propiedad])
 
+    __table_args__ = (
+        # Lista de conversaciones (GET /mensajes/conversaciones): último
+        # mensaje de cada par de usuarios sin importar quién lo envió
+        # (ver migrations/009_conversaciones.sql)
+        Index(
+            "ix_mensajes_par_fecha",
+            func.least(id_remitente, id_destinatario),
+            func.greatest(id_remitente, id_destinatario),
+            fecha_envio
+        ),
+        Index("ix_mensajes_remitente", id_remitente),
+        Index("ix_mensajes_destinatario", id_destinatario),
+        # Conteo de no leídos por remitente
+        Index(
+            "ix_mensajes_no_leidos",
+            id_destinatario, id_remitente,
+            postgresql_where=(leido == False)
+        ),
+    )
+
 
 # ============================================================================
 # MODELO: NOTIFICACION (sistema de notificaciones)
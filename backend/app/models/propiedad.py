@@ -2,9 +2,9 @@
 Modelos de SQLAlchemy para Propiedades
 """
 
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer, DECIMAL, Date
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer, DECIMAL, Date, Index, Float, select, event
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, selectinload, deferred
 from sqlalchemy.sql import func
 import uuid
 from app.database import Base
@@ -33,12 +33,101 @@ class Propiedad(Base):
     activa = Column(Boolean, default=True)
     fecha_publicacion = Column(DateTime(timezone=True), server_default=func.now())
     fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Texto de búsqueda (titulo, colonia, descripcion); lo llena un trigger en la BD
+    # (ver crear_busqueda_texto). Diferida: solo se usa en el WHERE, nunca se
+    # carga con la propiedad
+    busqueda = deferred(Column(TSVECTOR, nullable=True))
 
     # Relaciones
     arrendador = relationship("Usuario", back_populates="propiedades")
     caracteristicas = relationship("CaracteristicaPropiedad", back_populates="propiedad", uselist=False, cascade="all, delete-orphan")
     fotos = relationship("FotoPropiedad", back_populates="propiedad", cascade="all, delete-orphan")
     mensajes = relationship("Mensaje", back_populates="propiedad", cascade="all, delete-orphan")
+    distancias_campus = relationship("DistanciaPropiedadCampus", back_populates="propiedad", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Índice GiST sobre point(longitud, latitud) para búsquedas por cercanía
+        # (ver app/utils/geo.py y migrations/001_indice_ubicacion_propiedades.sql)
+        Index(
+            "ix_propiedades_ubicacion",
+            func.point(longitud, latitud),
+            postgresql_using="gist"
+        ),
+        # Orden y paginación por cursor (precio_mensual, id_propiedad)
+        Index("ix_propiedades_precio_id", precio_mensual, id_propiedad),
+        # Búsqueda en GET /propiedades (disponible=true): índices parciales
+        # sobre las propiedades publicadas, que son las que se listan
+        Index(
+            "ix_propiedades_publicadas_precio",
+            precio_mensual, id_propiedad,
+            postgresql_where=(disponible == True) & (activa == True)
+        ),
+        Index(
+            "ix_propiedades_publicadas_tipo_precio",
+            tipo_propiedad, precio_mensual, id_propiedad,
+            postgresql_where=(disponible == True) & (activa == True)
+        ),
+        # Búsqueda de texto completo (?q=), ver app/utils/busqueda.py; sin
+        # lista pendiente (migrations/010_indice_busqueda_sin_lista_pendiente.sql)
+        Index("ix_propiedades_busqueda", busqueda, postgresql_using="gin", postgresql_with={"fastupdate": "off"}),
+    )
+
+
+# Trigger que llena propiedades.busqueda, para las BD creadas con
+# Base.metadata.create_all; las existentes lo reciben de
+# migrations/006_busqueda_texto_propiedades.sql (mismas definiciones)
+DDL_BUSQUEDA_TEXTO = [
+    # titulo pesa más que colonia, y colonia más que descripcion
+    """
+    CREATE OR REPLACE FUNCTION propiedades_actualizar_busqueda() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda :=
+            setweight(to_tsvector('es_sin_acentos', coalesce(NEW.titulo, '')), 'A') ||
+            setweight(to_tsvector('es_sin_acentos', coalesce(NEW.colonia, '')), 'B') ||
+            setweight(to_tsvector('es_sin_acentos', coalesce(NEW.descripcion, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tr_propiedades_busqueda ON propiedades",
+    """
+    CREATE TRIGGER tr_propiedades_busqueda
+        BEFORE INSERT OR UPDATE OF titulo, colonia, descripcion ON propiedades
+        FOR EACH ROW EXECUTE FUNCTION propiedades_actualizar_busqueda()
+    """,
+]
+
+
+@event.listens_for(Propiedad.__table__, "after_create")
+def crear_busqueda_texto(tabla, conexion, **kw):
+    """
+    Crea la configuración es_sin_acentos (español con stemming, sin acentos;
+    ver app/utils/busqueda.py) y el trigger de la columna busqueda. Sin ellos
+    la columna queda vacía y ?q= no encuentra nada.
+    """
+    if conexion.dialect.name != "postgresql":
+        return
+
+    existe_config = conexion.exec_driver_sql(
+        "SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_sin_acentos'"
+    ).first() is not None
+    if not existe_config:
+        hay_unaccent = conexion.exec_driver_sql(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'unaccent'"
+        ).first() is not None
+        conexion.exec_driver_sql("CREATE TEXT SEARCH CONFIGURATION es_sin_acentos (COPY = pg_catalog.spanish)")
+        if hay_unaccent:
+            conexion.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS unaccent")
+            conexion.exec_driver_sql(
+                "ALTER TEXT SEARCH CONFIGURATION es_sin_acentos "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem"
+            )
+        else:
+            # Sin la extensión la búsqueda funciona, pero distingue acentos
+            print("⚠️ Extensión unaccent no disponible: la búsqueda de texto distinguirá acentos (habitacion != habitación)")
+
+    for sentencia in DDL_BUSQUEDA_TEXTO:
+        conexion.exec_driver_sql(sentencia)
 
 
 class CaracteristicaPropiedad(Base):
@@ -60,10 +149,68 @@ class CaracteristicaPropiedad(Base):
     numero_camas = Column(Integer, default=1)
     numero_banios = Column(Integer, default=1)
     metros_cuadrados = Column(DECIMAL(6, 2), nullable=True)
+    # Bitmask de las amenidades (bit i = AMENIDADES[i]); se sincroniza al guardar
+    amenidades = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relación
     propiedad = relationship("Propiedad", back_populates="caracteristicas")
 
+    __table_args__ = (
+        # Filtro por amenidades (amenidades = ANY(valores_con_amenidades(...)))
+        Index("ix_caracteristicas_amenidades", "amenidades"),
+    )
+
+
+# Columnas booleanas de CaracteristicaPropiedad que se muestran como amenidades
+AMENIDADES = (
+    "wifi",
+    "agua_incluida",
+    "luz_incluida",
+    "gas_incluido",
+    "amueblado",
+    "cocina",
+    "lavadora",
+    "estacionamiento",
+    "mascotas_permitidas",
+    "banio_privado",
+)
+
+
+def mascara_amenidades(nombres) -> int:
+    """Bitmask con los bits de las amenidades indicadas"""
+    mascara = 0
+    for nombre in nombres:
+        mascara |= 1 << AMENIDADES.index(nombre)
+    return mascara
+
+
+def valores_con_amenidades(requeridas: int, excluidas: int) -> list:
+    """
+    Todos los bitmasks posibles que tienen las amenidades requeridas y
+    ninguna de las excluidas (a lo más 2^10 valores).
+
+    Filtrar con amenidades = ANY(valores) equivale a
+    (amenidades & (requeridas | excluidas)) = requeridas, pero PostgreSQL
+    estima bien cuántas filas cumplen (con sus estadísticas por valor) y
+    puede usar el índice sobre la columna.
+    """
+    mascara = requeridas | excluidas
+    return [valor for valor in range(1 << len(AMENIDADES)) if valor & mascara == requeridas]
+
+
+def calcular_amenidades(caracteristica: CaracteristicaPropiedad) -> int:
+    """Bitmask de las amenidades activas de una fila de características"""
+    return mascara_amenidades(
+        amenidad for amenidad in AMENIDADES if getattr(caracteristica, amenidad)
+    )
+
+
+@event.listens_for(CaracteristicaPropiedad, "before_insert")
+@event.listens_for(CaracteristicaPropiedad, "before_update")
+def sincronizar_amenidades(mapper, connection, caracteristica):
+    """Mantiene la columna amenidades al crear o editar las características"""
+    caracteristica.amenidades = calcular_amenidades(caracteristica)
+
 
 class FotoPropiedad(Base):
     """Modelo de Fotos de Propiedad - COMPATIBLE"""
@@ -77,4 +224,92 @@ class FotoPropiedad(Base):
     fecha_subida = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relación
-    propiedad = relationship("Propiedad", back_populates="fotos")
\ No newline at end of file
+    propiedad = relationship("Propiedad", back_populates="fotos")
+
+    __table_args__ = (
+        # Carga de fotos por propiedad (selectinload) y búsqueda de la foto principal
+        Index("ix_fotos_propiedad_orden", "id_propiedad", "orden"),
+    )
+
+
+class DistanciaPropiedadCampus(Base):
+    """
+    Distancias precalculadas propiedad x campus (tabla materializada)
+
+    Se recalcula cuando cambian las coordenadas de la propiedad
+    (ver app/services/distancias_campus.py). Solo se guardan los campus
+    a menos de RADIO_MAXIMO_KM de la propiedad; es_mas_cercano marca, por
+    universidad, el campus más cercano a la propiedad.
+    """
+    __tablename__ = "distancias_propiedad_campus"
+
+    id_propiedad = Column(UUID(as_uuid=True), ForeignKey("propiedades.id_propiedad", ondelete="CASCADE"), primary_key=True)
+    id_universidad = Column(Integer, primary_key=True)  # id en UNIVERSIDADES_PUEBLA
+    indice_campus = Column(Integer, primary_key=True)  # posición en la lista "campus"
+    distancia_km = Column(Float, nullable=False)
+    es_mas_cercano = Column(Boolean, nullable=False, default=False)  # campus más cercano de su universidad
+
+    # Relación
+    propiedad = relationship("Propiedad", back_populates="distancias_campus")
+
+    __table_args__ = (
+        # Búsqueda "propiedades a menos de X km de la universidad U" ordenadas por
+        # (distancia, id): filtro por rango y paginación por cursor sobre el mismo índice
+        Index(
+            "ix_distancias_universidad_cercano",
+            "id_universidad", "distancia_km", "id_propiedad",
+            postgresql_where=es_mas_cercano
+        ),
+    )
+
+
+# ============================================================================
+# PERFILES DE CARGA (eager loading) POR TIPO DE ENDPOINT
+# ============================================================================
+# Evitan el N+1 al serializar: cada relación se carga con una sola consulta
+# extra para toda la página, en vez de una por propiedad.
+#   - "detalle": características y todas las fotos (PropiedadResponse)
+# La vista "tarjeta" no carga objetos: usa las columnas de columnas_tarjeta().
+# Todas con selectinload: un JOIN en la consulta principal se haría antes del
+# ORDER BY ... LIMIT (p. ej. orden por relevancia) sobre todas las coincidencias.
+
+PERFILES_CARGA = {
+    "detalle": (
+        (selectinload, "caracteristicas"),
+        (selectinload, "fotos"),
+    ),
+}
+
+
+def opciones_carga(perfil: str):
+    """
+    Opciones de carga para query.options(*opciones_carga("detalle"))
+
+    Se construyen al llamarla (no al importar el módulo) para no forzar la
+    configuración de los mappers antes de que existan todos los modelos.
+    """
+    return [estrategia(getattr(Propiedad, relacion)) for estrategia, relacion in PERFILES_CARGA[perfil]]
+
+
+def columnas_tarjeta():
+    """
+    Proyección mínima para la vista "tarjeta" (grid de la app): solo las
+    columnas que se muestran y la URL de la foto principal, en una sola
+    consulta y sin construir objetos ORM.
+    """
+    foto_principal = select(FotoPropiedad.url_foto).where(
+        FotoPropiedad.id_propiedad == Propiedad.id_propiedad,
+        FotoPropiedad.es_principal == True
+    ).order_by(FotoPropiedad.orden).limit(1).correlate(Propiedad).scalar_subquery()
+
+    return (
+        Propiedad.id_propiedad,
+        Propiedad.titulo,
+        Propiedad.tipo_propiedad,
+        Propiedad.precio_mensual,
+        Propiedad.colonia,
+        foto_principal.label("foto_principal"),
+    )
+
+
+CAMPOS_TARJETA = ("id_propiedad", "titulo", "tipo_propiedad", "precio_mensual", "colonia", "foto_principal")
@@ -3,9 +3,10 @@ Router para autenticación: registro, login y gestión de perfil
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_async_db, asociar_usuario
 from app.models.usuario import Usuario, PerfilEstudiante, PerfilArrendador
 from app.schemas.usuario import (
     UsuarioCreate, 
@@ -16,17 +17,17 @@ from app.schemas.usuario import (
     PerfilEstudianteCreate,
     PerfilEstudianteUpdate
 )
-from app.utils.security import get_password_hash, verify_password, create_access_token
+from app.utils.security import get_password_hash_async, verify_and_update_password_async, create_access_token
 from app.config import settings
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user_async, OPCIONES_USUARIO
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(
+async def register(
     user_data: UsuarioCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Registrar un nuevo usuario
@@ -51,7 +52,8 @@ def register(
     
     try:
         # Verificar si el email ya existe
-        existing_user = db.query(Usuario).filter(Usuario.email == user_data.email).first()
+        result = await db.execute(select(Usuario.id_usuario).where(Usuario.email == user_data.email))
+        existing_user = result.first()
         if existing_user:
             print(f"❌ ERROR: Email {user_data.email} ya existe")
             raise HTTPException(
@@ -59,10 +61,15 @@ def register(
                 detail="El email ya está registrado"
             )
         
+        # Hash en el pool de bcrypt, sin ocupar un hilo del servidor ni una
+        # conexión del pool mientras espera
+        await db.commit()
+        password_hash = await get_password_hash_async(user_data.password)
+        
         # Crear usuario (AGREGADO foto_perfil_url)
         db_user = Usuario(
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=password_hash,
             tipo_usuario=user_data.tipo_usuario,
             nombre_completo=user_data.nombre_completo,
             telefono=user_data.telefono,
@@ -70,7 +77,10 @@ def register(
         )
         
         db.add(db_user)
-        db.flush()  # Para obtener el id_usuario antes de commit
+        await db.flush()  # Para obtener el id_usuario antes de commit
+        # La petición no trae token: asociar el usuario nuevo para que sus
+        # primeras lecturas vayan al primario y no a una réplica atrasada
+        asociar_usuario(db, db_user.id_usuario)
         
         print(f"✅ Usuario creado con ID: {db_user.id_usuario}")
         
@@ -96,8 +106,14 @@ def register(
                 db.add(perfil_arr)
                 print(f"✅ Perfil arrendador creado")
         
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        # Volver a leer con los perfiles cargados (con AsyncSession no hay carga perezosa)
+        result = await db.execute(
+            select(Usuario).options(*OPCIONES_USUARIO)
+            .where(Usuario.id_usuario == db_user.id_usuario)
+            .execution_options(populate_existing=True)
+        )
+        db_user = result.scalars().one()
         
         print(f"✅ Usuario registrado exitosamente: {db_user.email}")
         print(f"   Foto URL guardada: {db_user.foto_perfil_url}")
@@ -118,7 +134,7 @@ def register(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ ERROR EN REGISTER: {type(e).__name__}: {str(e)}")
         import traceback
         print(traceback.format_exc())
@@ -129,9 +145,9 @@ def register(
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     credentials: UsuarioLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Iniciar sesión
@@ -143,7 +159,10 @@ def login(
     """
     
     # Buscar usuario por email
-    user = db.query(Usuario).filter(Usuario.email == credentials.email).first()
+    result = await db.execute(
+        select(Usuario).options(*OPCIONES_USUARIO).where(Usuario.email == credentials.email)
+    )
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -152,8 +171,13 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Verificar contraseña
-    if not verify_password(credentials.password, user.password_hash):
+    # Terminar la transacción de lectura antes de esperar a bcrypt: la
+    # conexión vuelve al pool y user sigue cargado (expire_on_commit=False)
+    await db.commit()
+    
+    # Verificar contraseña (en el pool de bcrypt, sin ocupar un hilo del servidor)
+    password_valida, nuevo_hash = await verify_and_update_password_async(credentials.password, user.password_hash)
+    if not password_valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
@@ -167,6 +191,11 @@ def login(
             detail="Usuario inactivo"
         )
     
+    # El hash usa otro costo de bcrypt: guardar el recalculado
+    if nuevo_hash:
+        user.password_hash = nuevo_hash
+        await db.commit()
+    
     # Generar token JWT
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -182,7 +211,7 @@ def login(
 
 @router.get("/me", response_model=UsuarioResponse)
 async def get_perfil_usuario(
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Usuario = Depends(get_current_user_async)
 ):
     """
     Obtener perfil del usuario actual
@@ -193,8 +222,8 @@ async def get_perfil_usuario(
 @router.put("/me", response_model=UsuarioResponse)
 async def actualizar_perfil_usuario(
     usuario_data: UsuarioUpdate,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualizar perfil del usuario actual
@@ -210,13 +239,13 @@ async def actualizar_perfil_usuario(
         if usuario_data.foto_perfil_url:
             current_user.foto_perfil_url = usuario_data.foto_perfil_url
         
-        db.commit()
-        db.refresh(current_user)
+        # Sin refresh: la sesión no expira los objetos al hacer commit
+        await db.commit()
         
         return current_user
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error al actualizar usuario: {str(e)}"
@@ -226,8 +255,8 @@ async def actualizar_perfil_usuario(
 @router.put("/me/perfil-estudiante", response_model=UsuarioResponse)
 async def actualizar_perfil_estudiante(
     perfil_data: PerfilEstudianteUpdate,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualizar perfil de estudiante del usuario actual
@@ -242,25 +271,26 @@ async def actualizar_perfil_estudiante(
         
         # Verificar si ya tiene perfil
         if not current_user.perfil_estudiante:
-            # Crear perfil nuevo
-            perfil = PerfilEstudiante(
+            # Crear perfil nuevo (asignado a la relación para devolverlo
+            # sin volver a consultar)
+            current_user.perfil_estudiante = PerfilEstudiante(
                 id_usuario=current_user.id_usuario,
                 **perfil_data.model_dump(exclude_unset=True)
             )
-            db.add(perfil)
         else:
             # Actualizar perfil existente
             for key, value in perfil_data.model_dump(exclude_unset=True).items():
                 setattr(current_user.perfil_estudiante, key, value)
         
-        db.commit()
-        db.refresh(current_user)
+        await db.commit()
         
         return current_user
         
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error al actualizar perfil estudiante: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -2,15 +2,15 @@
 Router para Favoritos - Guardar propiedades
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, text
 from typing import List
 from app.database import get_db
 from app.models.usuario import Usuario
-from app.models.propiedad import Propiedad
-from app.schemas.propiedad import PropiedadDetalleResponse
+from app.models.propiedad import Propiedad, opciones_carga, columnas_tarjeta
 from app.utils.dependencies import get_current_user
+from app.utils.vistas import serializar_propiedad, PATRON_VISTA
 from datetime import datetime
 import uuid
 
@@ -104,17 +104,19 @@ def eliminar_favorito(
     return None
 
 
-@router.get("", response_model=List[PropiedadDetalleResponse])
+@router.get("", response_model=List[dict])
 def mis_favoritos(
+    vista: str = Query("completa", pattern=PATRON_VISTA, description="completa o tarjeta (solo lo que muestra el grid)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Obtener todas las propiedades favoritas del usuario
+    (más recientes primero; con vista=tarjeta solo los campos del grid)
     """
-    # Consulta con JOIN
+    # Ids en orden de fecha_agregado
     query = text("""
-        SELECT p.* 
+        SELECT p.id_propiedad 
         FROM propiedades p
         INNER JOIN favoritos f ON p.id_propiedad = f.id_propiedad
         WHERE f.id_usuario = :user_id AND p.activa = true
@@ -124,12 +126,21 @@ def mis_favoritos(
     result = db.execute(query, {"user_id": str(current_user.id_usuario)})
     propiedades_ids = [row[0] for row in result]
     
-    # Obtener propiedades completas con relaciones
-    propiedades = db.query(Propiedad).filter(
-        Propiedad.id_propiedad.in_(propiedades_ids)
-    ).all()
+    if not propiedades_ids:
+        return []
     
-    return propiedades
+    # Obtener las propiedades en una sola consulta
+    query = db.query(*columnas_tarjeta()) if vista == "tarjeta" else \
+        db.query(Propiedad).options(*opciones_carga("detalle"))
+    filas = query.filter(Propiedad.id_propiedad.in_(propiedades_ids)).all()
+    
+    # El IN no respeta el orden: reordenar por fecha_agregado
+    por_id = {}
+    for fila in filas:
+        prop_dict = serializar_propiedad(fila, vista)
+        por_id[prop_dict["id_propiedad"]] = prop_dict
+    
+    return [por_id[id_propiedad] for id_propiedad in propiedades_ids if id_propiedad in por_id]
 
 
 @router.get("/check/{id_propiedad}")
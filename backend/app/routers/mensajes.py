@@ -2,17 +2,24 @@
 Router para mensajería entre usuarios
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, WebSocket, WebSocketDisconnect, WebSocketException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, or_, and_, case, tuple_
 from typing import List, Optional
 from datetime import datetime
+from uuid import UUID
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db
 from app.models.usuario import Usuario
 from app.models.mensajes_notificaciones_pagos import Mensaje
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user_async, get_current_user_websocket
+from app.utils.paginacion import codificar_cursor, decodificar_cursor, HEADER_SIGUIENTE_CURSOR
+from app.services.chat_backplane import Backplane, crear_backplane
+from app.services.buffer_mensajes import buffer_mensajes
 
 router = APIRouter()
 
@@ -53,28 +60,134 @@ class ConversacionResponse(BaseModel):
 # CONEXIONES WEBSOCKET ACTIVAS
 # ============================================================================
 
+class ConexionChat:
+    """
+    Un socket abierto (un dispositivo) con su propia cola de envío
+
+    Los mensajes se encolan sin esperar a la red y una tarea por socket los
+    envía en orden. Si la cola se llena (el cliente no lee) o un envío tarda
+    más de CHAT_SEND_TIMEOUT_SECONDS o falla, el socket se cierra y se saca
+    del manager: un cliente lento no frena a quien le envía.
+    """
+    def __init__(self, manager: "ConnectionManager", user_id: str, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=settings.CHAT_SEND_QUEUE_SIZE)
+        self.expulsada = False
+        self.tarea = asyncio.create_task(self._enviar_pendientes())
+    
+    def encolar(self, message: dict) -> bool:
+        if self.expulsada:
+            return False
+        try:
+            self.cola.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            print(f"⚠️ Chat: cola llena para {self.user_id}, se cierra el socket")
+            self._expulsar()
+            return False
+    
+    def _expulsar(self):
+        self.expulsada = True
+        asyncio.create_task(self.manager.expulsar(self))
+    
+    async def _enviar_pendientes(self):
+        while True:
+            message = await self.cola.get()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_json(message),
+                    timeout=settings.CHAT_SEND_TIMEOUT_SECONDS
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Chat: no se pudo enviar a {self.user_id} ({type(e).__name__}), se cierra el socket")
+                self._expulsar()
+                return
+    
+    async def cerrar(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.tarea.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=1)
+        except Exception:
+            # Ya estaba cerrado o el cliente no responde
+            pass
+
+
 class ConnectionManager:
     """
     Gestor de conexiones WebSocket para chat en tiempo real
+
+    Cada worker guarda solo sus propias conexiones, varias por usuario (un
+    socket por dispositivo). Los mensajes se entregan a los sockets locales y
+    se publican en el backplane para que los demás workers/nodos los
+    entreguen a los suyos (ver app/services/chat_backplane.py).
     """
-    def __init__(self):
-        # Diccionario de conexiones activas: {user_id: websocket}
-        self.active_connections: dict[str, WebSocket] = {}
+    def __init__(self, backplane: Backplane):
+        # Conexiones activas en este worker: {user_id: {conexión, ...}}
+        self.active_connections: dict[str, set[ConexionChat]] = {}
+        self.backplane = backplane
     
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+    async def iniciar(self):
+        await self.backplane.iniciar(self.entregar_local)
+    
+    async def detener(self):
+        conexiones = [c for grupo in self.active_connections.values() for c in grupo]
+        self.active_connections.clear()
+        await asyncio.gather(*(conexion.cerrar(status.WS_1001_GOING_AWAY) for conexion in conexiones))
+        await self.backplane.detener()
     
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    async def connect(self, user_id: str, websocket: WebSocket) -> ConexionChat:
+        await websocket.accept()
+        conexion = ConexionChat(self, user_id, websocket)
+        conexiones = self.active_connections.setdefault(user_id, set())
+        conexiones.add(conexion)
+        if len(conexiones) == 1:
+            try:
+                await self.backplane.conectado(user_id)
+            except Exception as e:
+                print(f"⚠️ Chat: no se pudo registrar la presencia de {user_id}: {e}")
+        return conexion
+    
+    async def disconnect(self, conexion: ConexionChat):
+        conexiones = self.active_connections.get(conexion.user_id)
+        if conexiones is None or conexion not in conexiones:
+            return
+        conexiones.discard(conexion)
+        conexion.tarea.cancel()
+        if not conexiones:
+            del self.active_connections[conexion.user_id]
+            try:
+                await self.backplane.desconectado(conexion.user_id)
+            except Exception as e:
+                print(f"⚠️ Chat: no se pudo quitar la presencia de {conexion.user_id}: {e}")
+    
+    async def expulsar(self, conexion: ConexionChat):
+        """Saca y cierra un socket lento o muerto"""
+        await self.disconnect(conexion)
+        await conexion.cerrar(status.WS_1011_INTERNAL_ERROR)
+    
+    async def entregar_local(self, user_id: str, message: dict):
+        # Solo encola: el envío real lo hace la tarea de cada socket
+        for conexion in list(self.active_connections.get(user_id, ())):
+            conexion.encolar(message)
     
     async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            await websocket.send_json(message)
+        await self.entregar_local(user_id, message)
+        # El usuario puede estar conectado (también) a otro worker o nodo
+        try:
+            await self.backplane.publicar(user_id, message)
+        except Exception as e:
+            print(f"⚠️ Chat: no se pudo publicar el mensaje para {user_id}: {e}")
+    
+    async def en_linea(self, user_id: str) -> bool:
+        if self.active_connections.get(user_id):
+            return True
+        return await self.backplane.en_linea(user_id)
 
-manager = ConnectionManager()
+manager = ConnectionManager(crear_backplane())
 
 
 # ============================================================================
@@ -84,8 +197,8 @@ manager = ConnectionManager()
 @router.post("/mensajes", response_model=MensajeResponse, status_code=status.HTTP_201_CREATED)
 async def enviar_mensaje(
     mensaje_data: MensajeCreate,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Enviar un mensaje a otro usuario
@@ -96,9 +209,10 @@ async def enviar_mensaje(
     """
     
     # Verificar que el destinatario existe
-    destinatario = db.query(Usuario).filter(
-        Usuario.id_usuario == mensaje_data.id_destinatario
-    ).first()
+    result = await db.execute(
+        select(Usuario).where(Usuario.id_usuario == mensaje_data.id_destinatario)
+    )
+    destinatario = result.scalars().first()
     
     if not destinatario:
         raise HTTPException(
@@ -122,8 +236,8 @@ async def enviar_mensaje(
         leido=False
     )
     db.add(nuevo_mensaje)
-    db.commit()
-    db.refresh(nuevo_mensaje)
+    await db.commit()
+    await db.refresh(nuevo_mensaje)
     
     # Enviar notificación en tiempo real si el destinatario está conectado
     await manager.send_personal_message(
@@ -150,72 +264,98 @@ async def enviar_mensaje(
 
 @router.get("/mensajes/conversaciones", response_model=List[ConversacionResponse])
 async def obtener_conversaciones(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=f"Cursor de la página anterior (header {HEADER_SIGUIENTE_CURSOR})"),
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener lista de conversaciones del usuario
     
     Retorna lista de usuarios con los que ha conversado,
-    mostrando el último mensaje y cantidad de no leídos
+    mostrando el último mensaje y cantidad de no leídos,
+    de la conversación más reciente a la más antigua.
+    
+    Paginación por cursor: si hay más conversaciones, la respuesta incluye
+    el header X-Siguiente-Cursor, que se envía como ?cursor=
     """
     
-    # Obtener todos los usuarios con los que ha conversado
-    mensajes = db.query(Mensaje).filter(
-        or_(
-            Mensaje.id_remitente == current_user.id_usuario,
-            Mensaje.id_destinatario == current_user.id_usuario
+    yo = current_user.id_usuario
+    par = (
+        func.least(Mensaje.id_remitente, Mensaje.id_destinatario),
+        func.greatest(Mensaje.id_remitente, Mensaje.id_destinatario)
+    )
+    
+    # Último mensaje de cada conversación (DISTINCT ON por el par de usuarios)
+    ultimos = select(
+        case((Mensaje.id_remitente == yo, Mensaje.id_destinatario), else_=Mensaje.id_remitente).label("id_otro"),
+        Mensaje.contenido,
+        Mensaje.fecha_envio
+    ).where(
+        or_(Mensaje.id_remitente == yo, Mensaje.id_destinatario == yo)
+    ).distinct(*par).order_by(
+        *par, Mensaje.fecha_envio.desc(), Mensaje.id_mensaje.desc()
+    ).subquery()
+    
+    # No leídos por remitente
+    no_leidos = select(
+        Mensaje.id_remitente,
+        func.count().label("total")
+    ).where(
+        Mensaje.id_destinatario == yo,
+        Mensaje.leido == False
+    ).group_by(Mensaje.id_remitente).subquery()
+    
+    query = select(
+        Usuario.id_usuario,
+        Usuario.nombre_completo,
+        Usuario.foto_perfil_url,
+        ultimos.c.contenido,
+        ultimos.c.fecha_envio,
+        func.coalesce(no_leidos.c.total, 0)
+    ).join(
+        Usuario, Usuario.id_usuario == ultimos.c.id_otro
+    ).outerjoin(
+        no_leidos, no_leidos.c.id_remitente == ultimos.c.id_otro
+    )
+    
+    if cursor:
+        fecha_cursor, id_cursor = decodificar_cursor(cursor, "conversaciones", (datetime.fromisoformat, UUID))
+        query = query.where(
+            tuple_(ultimos.c.fecha_envio, ultimos.c.id_otro) < tuple_(fecha_cursor, id_cursor)
         )
-    ).all()
-    
-    # Agrupar por usuario
-    conversaciones = {}
-    for mensaje in mensajes:
-        # Determinar el ID del otro usuario
-        otro_usuario_id = (
-            mensaje.id_destinatario 
-            if mensaje.id_remitente == current_user.id_usuario 
-            else mensaje.id_remitente
+    
+    result = await db.execute(
+        query.order_by(ultimos.c.fecha_envio.desc(), ultimos.c.id_otro.desc()).limit(limit + 1)
+    )
+    filas = result.all()
+    
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        response.headers[HEADER_SIGUIENTE_CURSOR] = codificar_cursor(
+            "conversaciones", [ultima.fecha_envio.isoformat(), ultima.id_usuario]
         )
-        
-        if str(otro_usuario_id) not in conversaciones:
-            # Obtener datos del usuario
-            otro_usuario = db.query(Usuario).filter(
-                Usuario.id_usuario == otro_usuario_id
-            ).first()
-            
-            if otro_usuario:
-                conversaciones[str(otro_usuario_id)] = {
-                    "id_usuario": str(otro_usuario.id_usuario),
-                    "nombre_usuario": otro_usuario.nombre_completo,
-                    "foto_usuario": otro_usuario.foto_perfil_url,
-                    "ultimo_mensaje": mensaje.contenido,
-                    "fecha_ultimo_mensaje": mensaje.fecha_envio,
-                    "mensajes_no_leidos": 0
-                }
-        else:
-            # Actualizar último mensaje si es más reciente
-            if mensaje.fecha_envio > conversaciones[str(otro_usuario_id)]["fecha_ultimo_mensaje"]:
-                conversaciones[str(otro_usuario_id)]["ultimo_mensaje"] = mensaje.contenido
-                conversaciones[str(otro_usuario_id)]["fecha_ultimo_mensaje"] = mensaje.fecha_envio
-    
-    # Contar mensajes no leídos
-    for user_id in conversaciones:
-        count = db.query(Mensaje).filter(
-            Mensaje.id_remitente == user_id,
-            Mensaje.id_destinatario == current_user.id_usuario,
-            Mensaje.leido == False
-        ).count()
-        conversaciones[user_id]["mensajes_no_leidos"] = count
     
-    return list(conversaciones.values())
+    return [
+        ConversacionResponse(
+            id_usuario=str(id_usuario),
+            nombre_usuario=nombre,
+            foto_usuario=foto,
+            ultimo_mensaje=contenido,
+            fecha_ultimo_mensaje=fecha_envio,
+            mensajes_no_leidos=total
+        )
+        for id_usuario, nombre, foto, contenido, fecha_envio, total in filas
+    ]
 
 
 @router.get("/mensajes/conversacion/{id_usuario}", response_model=List[MensajeResponse])
 async def obtener_conversacion(
     id_usuario: str,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 50,
     offset: int = 0
 ):
@@ -228,7 +368,8 @@ async def obtener_conversacion(
     """
     
     # Verificar que el usuario existe
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == id_usuario).first()
+    result = await db.execute(select(Usuario).where(Usuario.id_usuario == id_usuario))
+    usuario = result.scalars().first()
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -236,26 +377,31 @@ async def obtener_conversacion(
         )
     
     # Obtener mensajes entre current_user y id_usuario
-    mensajes = db.query(Mensaje).filter(
-        or_(
-            and_(
-                Mensaje.id_remitente == current_user.id_usuario,
-                Mensaje.id_destinatario == id_usuario
-            ),
-            and_(
-                Mensaje.id_remitente == id_usuario,
-                Mensaje.id_destinatario == current_user.id_usuario
+    result = await db.execute(
+        select(Mensaje).where(
+            or_(
+                and_(
+                    Mensaje.id_remitente == current_user.id_usuario,
+                    Mensaje.id_destinatario == id_usuario
+                ),
+                and_(
+                    Mensaje.id_remitente == id_usuario,
+                    Mensaje.id_destinatario == current_user.id_usuario
+                )
             )
-        )
-    ).order_by(Mensaje.fecha_envio.desc()).limit(limit).offset(offset).all()
+        ).order_by(Mensaje.fecha_envio.desc()).limit(limit).offset(offset)
+    )
+    mensajes = result.scalars().all()
     
     # Marcar mensajes como leídos
-    db.query(Mensaje).filter(
-        Mensaje.id_remitente == id_usuario,
-        Mensaje.id_destinatario == current_user.id_usuario,
-        Mensaje.leido == False
-    ).update({"leido": True})
-    db.commit()
+    await db.execute(
+        update(Mensaje).where(
+            Mensaje.id_remitente == id_usuario,
+            Mensaje.id_destinatario == current_user.id_usuario,
+            Mensaje.leido == False
+        ).values(leido=True)
+    )
+    await db.commit()
     
     return [
         MensajeResponse(
@@ -274,17 +420,20 @@ async def obtener_conversacion(
 @router.put("/mensajes/{id_mensaje}/marcar-leido")
 async def marcar_mensaje_leido(
     id_mensaje: int,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Marcar un mensaje como leído
     """
     
-    mensaje = db.query(Mensaje).filter(
-        Mensaje.id_mensaje == id_mensaje,
-        Mensaje.id_destinatario == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Mensaje).where(
+            Mensaje.id_mensaje == id_mensaje,
+            Mensaje.id_destinatario == current_user.id_usuario
+        )
+    )
+    mensaje = result.scalars().first()
     
     if not mensaje:
         raise HTTPException(
@@ -293,7 +442,7 @@ async def marcar_mensaje_leido(
         )
     
     mensaje.leido = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Mensaje marcado como leído"}
 
@@ -301,17 +450,20 @@ async def marcar_mensaje_leido(
 @router.delete("/mensajes/{id_mensaje}")
 async def eliminar_mensaje(
     id_mensaje: int,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Eliminar un mensaje (solo el remitente)
     """
     
-    mensaje = db.query(Mensaje).filter(
-        Mensaje.id_mensaje == id_mensaje,
-        Mensaje.id_remitente == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Mensaje).where(
+            Mensaje.id_mensaje == id_mensaje,
+            Mensaje.id_remitente == current_user.id_usuario
+        )
+    )
+    mensaje = result.scalars().first()
     
     if not mensaje:
         raise HTTPException(
@@ -319,30 +471,119 @@ async def eliminar_mensaje(
             detail="Mensaje no encontrado"
         )
     
-    db.delete(mensaje)
-    db.commit()
+    await db.delete(mensaje)
+    await db.commit()
     
     return {"message": "Mensaje eliminado exitosamente"}
 
 
+@router.get("/mensajes/presencia/{id_usuario}")
+async def obtener_presencia(
+    id_usuario: str,
+    current_user: Usuario = Depends(get_current_user_async)
+):
+    """
+    Saber si un usuario tiene el chat abierto (en cualquier worker o nodo)
+    """
+    
+    return {"id_usuario": id_usuario, "en_linea": await manager.en_linea(id_usuario)}
+
+
 # ============================================================================
 # WEBSOCKET ENDPOINT (Chat en tiempo real)
 # ============================================================================
 
+async def _guardar_y_entregar(conexion: ConexionChat, data: dict, secuencia: int):
+    """
+    Guarda un mensaje recibido por el WebSocket (en el lote que toque),
+    confirma al remitente y lo entrega al destinatario
+    """
+    id_cliente = data.get("id_cliente")
+    try:
+        guardado = await buffer_mensajes.guardar(
+            id_remitente=UUID(conexion.user_id),
+            id_destinatario=UUID(str(data["id_destinatario"])),
+            contenido=data["contenido"],
+            id_propiedad=UUID(str(data["id_propiedad"])) if data.get("id_propiedad") else None
+        )
+    except Exception as e:
+        print(f"⚠️ Chat: no se pudo guardar un mensaje de {conexion.user_id}: {type(e).__name__}")
+        conexion.encolar({
+            "tipo": "error",
+            "id_cliente": id_cliente,
+            "secuencia": secuencia,
+            "detail": "No se pudo guardar el mensaje"
+        })
+        return
+    
+    fecha_envio = guardado.fecha_envio.isoformat() if guardado.fecha_envio else None
+    conexion.encolar({
+        "tipo": "ack",
+        "id_cliente": id_cliente,
+        "secuencia": secuencia,
+        "id_mensaje": guardado.id_mensaje,
+        "fecha_envio": fecha_envio
+    })
+    await manager.send_personal_message(
+        {
+            **data,
+            "id_remitente": conexion.user_id,
+            "id_mensaje": guardado.id_mensaje,
+            "fecha_envio": fecha_envio
+        },
+        data["id_destinatario"]
+    )
+
+
+def _validar_mensaje(user_id: str, data: dict) -> Optional[str]:
+    """Motivo por el que el mensaje no se puede guardar (None si es válido)"""
+    contenido = data.get("contenido")
+    if not isinstance(contenido, str) or not contenido.strip():
+        return "El mensaje está vacío"
+    try:
+        UUID(user_id)
+        UUID(str(data.get("id_destinatario")))
+        if data.get("id_propiedad"):
+            UUID(str(data["id_propiedad"]))
+    except ValueError:
+        return "Identificador inválido"
+    if str(data["id_destinatario"]) == user_id:
+        return "No puedes enviarte mensajes a ti mismo"
+    return None
+
+
 @router.websocket("/ws/chat/{user_id}")
 async def websocket_chat(
     websocket: WebSocket,
     user_id: str,
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_websocket)
 ):
     """
     WebSocket para chat en tiempo real
     
     Conecta al usuario y mantiene la conexión abierta para
-    recibir mensajes en tiempo real
+    recibir mensajes en tiempo real.
+    
+    Los mensajes de tipo "mensaje" se guardan en la BD (por lotes) y se
+    confirman con {"tipo": "ack", "id_cliente", "secuencia", "id_mensaje",
+    "fecha_envio"}; "secuencia" numera en orden los mensajes recibidos en
+    esta conexión e "id_cliente" es el que mandó el cliente, si mandó uno.
+    
+    Requiere el token del usuario (header Authorization o ?token=) y que
+    user_id sea el suyo. No mantiene una sesión de BD abierta: los mensajes
+    se guardan con sesiones cortas del buffer de escritura.
     """
     
-    await manager.connect(user_id, websocket)
+    if str(current_user.id_usuario) != user_id:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="El token no corresponde a este usuario"
+        )
+    
+    conexion = await manager.connect(user_id, websocket)
+    secuencia = 0
+    # Referencias a las tareas de guardado para que no se recolecten
+    pendientes: set[asyncio.Task] = set()
     
     try:
         while True:
@@ -351,9 +592,21 @@ async def websocket_chat(
             
             # Procesar el mensaje según el tipo
             if data.get("tipo") == "mensaje":
-                # Reenviar al destinatario si está conectado
-                id_destinatario = data.get("id_destinatario")
-                await manager.send_personal_message(data, id_destinatario)
+                secuencia += 1
+                error = _validar_mensaje(user_id, data)
+                if error:
+                    conexion.encolar({
+                        "tipo": "error",
+                        "id_cliente": data.get("id_cliente"),
+                        "secuencia": secuencia,
+                        "detail": error
+                    })
+                    continue
+                # Guardar sin esperar: el siguiente mensaje se lee mientras
+                # este espera su lote
+                tarea = asyncio.create_task(_guardar_y_entregar(conexion, data, secuencia))
+                pendientes.add(tarea)
+                tarea.add_done_callback(pendientes.discard)
             
             elif data.get("tipo") == "typing":
                 # Notificar que el usuario está escribiendo
@@ -368,4 +621,6 @@ async def websocket_chat(
                 )
     
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
\ No newline at end of file
+        pass
+    finally:
+        await manager.disconnect(conexion)
@@ -3,20 +3,21 @@ Router para sistema de notificaciones
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.usuario import Usuario
 from app.models.mensajes_notificaciones_pagos import (
     Notificacion, 
     ConfiguracionNotificacionesUsuario,
     TipoNotificacion as TipoNotificacionEnum
 )
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user_async
 
 router = APIRouter()
 
@@ -79,8 +80,8 @@ class ConfiguracionNotificaciones(BaseModel):
 
 @router.get("/notificaciones", response_model=List[NotificacionResponse])
 async def obtener_notificaciones(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
     solo_no_leidas: bool = False,
     limit: int = 50,
     offset: int = 0
@@ -94,16 +95,17 @@ async def obtener_notificaciones(
     """
     
     # Implementar query a la tabla notificaciones
-    query = db.query(Notificacion).filter(
+    query = select(Notificacion).where(
         Notificacion.id_usuario == current_user.id_usuario
     )
     
     if solo_no_leidas:
-        query = query.filter(Notificacion.leida == False)
+        query = query.where(Notificacion.leido == False)
     
-    notificaciones = query.order_by(
-        Notificacion.fecha_creacion.desc()
-    ).limit(limit).offset(offset).all()
+    result = await db.execute(
+        query.order_by(Notificacion.fecha_creacion.desc()).limit(limit).offset(offset)
+    )
+    notificaciones = result.scalars().all()
     
     return [
         NotificacionResponse(
@@ -111,7 +113,7 @@ async def obtener_notificaciones(
             tipo=n.tipo.value if hasattr(n.tipo, 'value') else str(n.tipo),
             titulo=n.titulo,
             mensaje=n.mensaje,
-            leida=n.leida,
+            leida=n.leido,
             fecha_creacion=n.fecha_creacion,
             id_relacionado=n.id_relacionado,
             url_accion=n.url_accion
@@ -122,8 +124,8 @@ async def obtener_notificaciones(
 
 @router.get("/notificaciones/no-leidas/count")
 async def contar_notificaciones_no_leidas(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener cantidad de notificaciones no leídas
@@ -131,10 +133,12 @@ async def contar_notificaciones_no_leidas(
     Útil para mostrar badge en la UI
     """
     
-    count = db.query(Notificacion).filter(
-        Notificacion.id_usuario == current_user.id_usuario,
-        Notificacion.leida == False
-    ).count()
+    count = await db.scalar(
+        select(func.count()).select_from(Notificacion).where(
+            Notificacion.id_usuario == current_user.id_usuario,
+            Notificacion.leido == False
+        )
+    )
     
     return {"count": count}
 
@@ -142,17 +146,20 @@ async def contar_notificaciones_no_leidas(
 @router.put("/notificaciones/{id_notificacion}/marcar-leida")
 async def marcar_notificacion_leida(
     id_notificacion: int,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Marcar una notificación como leída
     """
     
-    notificacion = db.query(Notificacion).filter(
-        Notificacion.id_notificacion == id_notificacion,
-        Notificacion.id_usuario == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Notificacion).where(
+            Notificacion.id_notificacion == id_notificacion,
+            Notificacion.id_usuario == current_user.id_usuario
+        )
+    )
+    notificacion = result.scalars().first()
     
     if not notificacion:
         raise HTTPException(
@@ -160,26 +167,28 @@ async def marcar_notificacion_leida(
             detail="Notificación no encontrada"
         )
     
-    notificacion.leida = True
-    db.commit()
+    notificacion.leido = True
+    await db.commit()
     
     return {"message": "Notificación marcada como leída"}
 
 
 @router.put("/notificaciones/marcar-todas-leidas")
 async def marcar_todas_leidas(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Marcar todas las notificaciones del usuario como leídas
     """
     
-    db.query(Notificacion).filter(
-        Notificacion.id_usuario == current_user.id_usuario,
-        Notificacion.leida == False
-    ).update({"leida": True})
-    db.commit()
+    await db.execute(
+        update(Notificacion).where(
+            Notificacion.id_usuario == current_user.id_usuario,
+            Notificacion.leido == False
+        ).values(leido=True)
+    )
+    await db.commit()
     
     return {"message": "Todas las notificaciones marcadas como leídas"}
 
@@ -187,17 +196,20 @@ async def marcar_todas_leidas(
 @router.delete("/notificaciones/{id_notificacion}")
 async def eliminar_notificacion(
     id_notificacion: int,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Eliminar una notificación
     """
     
-    notificacion = db.query(Notificacion).filter(
-        Notificacion.id_notificacion == id_notificacion,
-        Notificacion.id_usuario == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Notificacion).where(
+            Notificacion.id_notificacion == id_notificacion,
+            Notificacion.id_usuario == current_user.id_usuario
+        )
+    )
+    notificacion = result.scalars().first()
     
     if not notificacion:
         raise HTTPException(
@@ -205,25 +217,25 @@ async def eliminar_notificacion(
             detail="Notificación no encontrada"
         )
     
-    db.delete(notificacion)
-    db.commit()
+    await db.delete(notificacion)
+    await db.commit()
     
     return {"message": "Notificación eliminada exitosamente"}
 
 
 @router.delete("/notificaciones/eliminar-todas")
 async def eliminar_todas_notificaciones(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Eliminar todas las notificaciones del usuario
     """
     
-    db.query(Notificacion).filter(
-        Notificacion.id_usuario == current_user.id_usuario
-    ).delete()
-    db.commit()
+    await db.execute(
+        delete(Notificacion).where(Notificacion.id_usuario == current_user.id_usuario)
+    )
+    await db.commit()
     
     return {"message": "Todas las notificaciones eliminadas"}
 
@@ -234,8 +246,8 @@ async def eliminar_todas_notificaciones(
 
 @router.get("/notificaciones/configuracion", response_model=ConfiguracionNotificaciones)
 async def obtener_configuracion_notificaciones(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener configuración de notificaciones del usuario
@@ -244,9 +256,12 @@ async def obtener_configuracion_notificaciones(
     """
     
     # Implementar tabla de configuración de notificaciones
-    config = db.query(ConfiguracionNotificacionesUsuario).filter(
-        ConfiguracionNotificacionesUsuario.id_usuario == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(ConfiguracionNotificacionesUsuario).where(
+            ConfiguracionNotificacionesUsuario.id_usuario == current_user.id_usuario
+        )
+    )
+    config = result.scalars().first()
     
     if not config:
         # Crear configuración por defecto
@@ -254,8 +269,8 @@ async def obtener_configuracion_notificaciones(
             id_usuario=current_user.id_usuario
         )
         db.add(config)
-        db.commit()
-        db.refresh(config)
+        await db.commit()
+        await db.refresh(config)
     
     return ConfiguracionNotificaciones(
         email_nuevas_solicitudes=config.email_nuevas_solicitudes,
@@ -272,8 +287,8 @@ async def obtener_configuracion_notificaciones(
 @router.put("/notificaciones/configuracion", response_model=ConfiguracionNotificaciones)
 async def actualizar_configuracion_notificaciones(
     config_data: ConfiguracionNotificaciones,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualizar configuración de notificaciones del usuario
@@ -281,9 +296,12 @@ async def actualizar_configuracion_notificaciones(
     Permite habilitar/deshabilitar diferentes tipos de notificaciones
     """
     
-    config = db.query(ConfiguracionNotificacionesUsuario).filter(
-        ConfiguracionNotificacionesUsuario.id_usuario == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(ConfiguracionNotificacionesUsuario).where(
+            ConfiguracionNotificacionesUsuario.id_usuario == current_user.id_usuario
+        )
+    )
+    config = result.scalars().first()
     
     if not config:
         config = ConfiguracionNotificacionesUsuario(
@@ -295,8 +313,7 @@ async def actualizar_configuracion_notificaciones(
         for key, value in config_data.model_dump().items():
             setattr(config, key, value)
     
-    db.commit()
-    db.refresh(config)
+    await db.commit()
     
     return config_data
 
@@ -306,7 +323,7 @@ async def actualizar_configuracion_notificaciones(
 # ============================================================================
 
 async def crear_notificacion(
-    db: Session,
+    db: AsyncSession,
     id_usuario: str,  # UUID como string
     tipo: TipoNotificacionEnum,
     titulo: str,
@@ -343,10 +360,10 @@ async def crear_notificacion(
         mensaje=mensaje,
         id_relacionado=id_relacionado,
         url_accion=url_accion,
-        leida=False
+        leido=False
     )
     db.add(nueva_notificacion)
-    db.commit()
+    await db.commit()
     
     # TODO: Si el usuario tiene habilitadas notificaciones push, enviar
     # config = db.query(ConfiguracionNotificacionesUsuario).filter(
@@ -4,16 +4,17 @@ NOTA: Este router está en modo MOCK. Para producción, descomentar integración
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from decimal import Decimal
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.usuario import Usuario
 from app.models.renta_reporte import Renta
 from app.models.mensajes_notificaciones_pagos import Pago, EstadoPago, MetodoPago
-from app.utils.dependencies import get_current_user, get_current_estudiante
+from app.utils.dependencies import get_current_user_async, get_current_estudiante_async
 from app.config import settings
 from pydantic import BaseModel
 
@@ -53,8 +54,8 @@ class PagoResponse(BaseModel):
 @router.post("/pagos/crear-intencion")
 async def crear_intencion_pago(
     pago_data: PagoCreate,
-    current_user: Usuario = Depends(get_current_estudiante),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_estudiante_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear intención de pago para una renta
@@ -67,10 +68,13 @@ async def crear_intencion_pago(
     """
     
     # Verificar que la renta existe y pertenece al usuario
-    renta = db.query(Renta).filter(
-        Renta.id_renta == pago_data.id_renta,
-        Renta.id_estudiante == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Renta).where(
+            Renta.id_renta == pago_data.id_renta,
+            Renta.id_estudiante == current_user.id_usuario
+        )
+    )
+    renta = result.scalars().first()
     
     if not renta:
         raise HTTPException(
@@ -79,7 +83,7 @@ async def crear_intencion_pago(
         )
     
     # Verificar que la renta esté en estado aprobado o activo
-    if renta.estado not in ["aprobada", "activa"]:
+    if renta.estado_renta not in ["aprobada", "activa"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="La renta debe estar aprobada o activa para realizar pagos"
@@ -94,8 +98,8 @@ async def crear_intencion_pago(
         referencia_externa=None
     )
     db.add(nuevo_pago)
-    db.commit()
-    db.refresh(nuevo_pago)
+    await db.commit()
+    await db.refresh(nuevo_pago)
     
     # TODO: Integración real con Stripe/OpenPay
     if pago_data.metodo_pago == "stripe":
@@ -120,7 +124,7 @@ async def crear_intencion_pago(
         # 
         # # Actualizar pago con referencia de Stripe
         # nuevo_pago.referencia_externa = intent.id
-        # db.commit()
+        # await db.commit()
         # 
         # return {
         #     "id_pago": nuevo_pago.id_pago,
@@ -166,8 +170,8 @@ async def crear_intencion_pago(
 @router.post("/pagos/confirmar")
 async def confirmar_pago(
     confirmacion: PagoConfirmar,
-    current_user: Usuario = Depends(get_current_estudiante),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_estudiante_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Confirmar un pago realizado
@@ -179,10 +183,13 @@ async def confirmar_pago(
     """
     
     # Verificar que la renta pertenece al usuario
-    renta = db.query(Renta).filter(
-        Renta.id_renta == confirmacion.id_renta,
-        Renta.id_estudiante == current_user.id_usuario
-    ).first()
+    result = await db.execute(
+        select(Renta).where(
+            Renta.id_renta == confirmacion.id_renta,
+            Renta.id_estudiante == current_user.id_usuario
+        )
+    )
+    renta = result.scalars().first()
     
     if not renta:
         raise HTTPException(
@@ -191,10 +198,13 @@ async def confirmar_pago(
         )
     
     # Buscar el pago
-    pago = db.query(Pago).filter(
-        Pago.id_renta == confirmacion.id_renta,
-        Pago.estado == EstadoPago.PENDIENTE
-    ).first()
+    result = await db.execute(
+        select(Pago).where(
+            Pago.id_renta == confirmacion.id_renta,
+            Pago.estado == EstadoPago.PENDIENTE
+        )
+    )
+    pago = result.scalars().first()
     
     if not pago:
         raise HTTPException(
@@ -209,7 +219,7 @@ async def confirmar_pago(
     # 
     # if payment_intent.status != "succeeded":
     #     pago.estado = EstadoPago.FALLIDO
-    #     db.commit()
+    #     await db.commit()
     #     raise HTTPException(
     #         status_code=status.HTTP_400_BAD_REQUEST,
     #         detail="El pago no fue exitoso"
@@ -218,7 +228,7 @@ async def confirmar_pago(
     # Marcar pago como completado
     pago.estado = EstadoPago.COMPLETADO
     pago.referencia_externa = confirmacion.payment_intent_id
-    db.commit()
+    await db.commit()
     
     # TODO: Crear notificación para el arrendador
     # from app.routers.notificaciones import crear_notificacion
@@ -242,8 +252,8 @@ async def confirmar_pago(
 
 @router.get("/pagos/historial", response_model=List[PagoResponse])
 async def obtener_historial_pagos(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener historial de pagos del usuario
@@ -254,15 +264,17 @@ async def obtener_historial_pagos(
     
     if current_user.tipo_usuario in ["estudiante", "ambos"]:
         # Pagos realizados por el estudiante
-        rentas = db.query(Renta).filter(
+        # Una sola consulta: las rentas del estudiante van como subconsulta
+        renta_ids = select(Renta.id_renta).where(
             Renta.id_estudiante == current_user.id_usuario
-        ).all()
-        
-        renta_ids = [r.id_renta for r in rentas]
+        )
         
-        pagos = db.query(Pago).filter(
-            Pago.id_renta.in_(renta_ids)
-        ).order_by(Pago.fecha_pago.desc()).all()
+        result = await db.execute(
+            select(Pago).where(
+                Pago.id_renta.in_(renta_ids)
+            ).order_by(Pago.fecha_pago.desc())
+        )
+        pagos = result.scalars().all()
         
     elif current_user.tipo_usuario == "arrendador":
         # Pagos recibidos por el arrendador
@@ -305,14 +317,14 @@ async def obtener_historial_pagos(
 @router.get("/pagos/{id_pago}", response_model=PagoResponse)
 async def obtener_detalle_pago(
     id_pago: int,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener detalles de un pago específico
     """
     
-    pago = db.query(Pago).filter(Pago.id_pago == id_pago).first()
+    pago = await db.get(Pago, id_pago)
     
     if not pago:
         raise HTTPException(
@@ -321,7 +333,7 @@ async def obtener_detalle_pago(
         )
     
     # Verificar que el usuario tiene permiso para ver este pago
-    renta = db.query(Renta).filter(Renta.id_renta == pago.id_renta).first()
+    renta = await db.get(Renta, pago.id_renta)
     
     if not renta:
         raise HTTPException(
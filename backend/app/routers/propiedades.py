@@ -2,11 +2,20 @@
 Router para propiedades con sistema de universidades completo
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import and_, tuple_, cast, func, literal, any_, REAL, Numeric, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, array
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from functools import lru_cache
+from uuid import UUID
+from decimal import Decimal
 from app.database import get_db
-from app.models.propiedad import Propiedad
+from app.models.propiedad import (
+    Propiedad, CaracteristicaPropiedad, FotoPropiedad,
+    opciones_carga, columnas_tarjeta, AMENIDADES, mascara_amenidades,
+    valores_con_amenidades
+)
 from app.models.usuario import Usuario
 from app.schemas.propiedad import PropiedadCreate, PropiedadResponse, PropiedadUpdate
 from app.utils.dependencies import get_current_user, get_current_arrendador
@@ -15,90 +24,174 @@ from app.utils.universidades import (
     get_universidades_nombres,
     buscar_universidades
 )
-import math
+from app.utils.paginacion import codificar_cursor, decodificar_cursor, HEADER_SIGUIENTE_CURSOR
+from app.utils.busqueda import consulta_texto, coincide_sql, relevancia_sql
+from app.utils.cache_http import RespuestaPrecalculada
+from app.utils.vistas import serializar_propiedad, PATRON_VISTA
+from app.services.indice_espacial import indice_propiedades
+from app.services.distancias_campus import (
+    campus_mas_cercano,
+    recalcular_distancias_propiedad,
+    subconsulta_distancias_universidad
+)
 
 router = APIRouter(prefix="/propiedades")
 
+# Límites de los rangos del histograma de precios en GET /propiedades/facetas
+LIMITES_RANGOS_PRECIO = (2000, 3000, 4000, 5000, 6000, 8000, 10000)
+
+
+def parsear_amenidades(amenidades: str):
+    """
+    Convierte "wifi,amueblado,-mascotas_permitidas" en dos bitmasks:
+    (amenidades requeridas, amenidades excluidas con "-")
+    
+    Raises:
+        HTTPException: Si alguna amenidad no existe
+    """
+    requeridas, excluidas = [], []
+    for nombre in filter(None, (parte.strip() for parte in amenidades.split(","))):
+        destino = excluidas if nombre.startswith("-") else requeridas
+        nombre = nombre.lstrip("-")
+        if nombre not in AMENIDADES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Amenidad no reconocida: {nombre}. Opciones: {', '.join(AMENIDADES)}"
+            )
+        destino.append(nombre)
+    
+    return mascara_amenidades(requeridas), mascara_amenidades(excluidas)
+
 
-def calcular_distancia(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def filtrar_propiedades(
+    query,
+    disponible: bool,
+    tipo: Optional[str],
+    precio_min: Optional[float],
+    precio_max: Optional[float],
+    num_habitaciones: Optional[int],
+    q: Optional[str],
+    amenidades: Optional[str] = None
+):
     """
-    Calcula la distancia entre dos coordenadas usando la fórmula de Haversine
-    Retorna la distancia en kilómetros
+    Filtros de búsqueda comunes al listado (GET /propiedades) y a sus facetas
     """
-    R = 6371  # Radio de la Tierra en km
+    # Solo propiedades activas; con disponible=true la búsqueda usa los
+    # índices parciales WHERE disponible AND activa
+    query = query.filter(Propiedad.activa == True)
+    
+    # Filtrar por disponibilidad
+    if disponible:
+        query = query.filter(Propiedad.disponible == True)
+    
+    # Filtrar por tipo
+    if tipo:
+        query = query.filter(Propiedad.tipo_propiedad == tipo)
+    
+    # Filtrar por precio
+    if precio_min is not None:
+        query = query.filter(Propiedad.precio_mensual >= precio_min)
+    if precio_max is not None:
+        query = query.filter(Propiedad.precio_mensual <= precio_max)
     
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
+    # Filtros sobre características, en un solo EXISTS
+    condiciones_caracteristicas = []
+    
+    # Filtrar por habitaciones (número de camas en características)
+    if num_habitaciones is not None:
+        condiciones_caracteristicas.append(CaracteristicaPropiedad.numero_camas >= num_habitaciones)
+    
+    # Filtrar por amenidades con el bitmask: "wifi AND amueblado AND NOT mascotas"
+    # es una sola comparación de la columna amenidades
+    if amenidades:
+        requeridas, excluidas = parsear_amenidades(amenidades)
+        if requeridas & excluidas:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Una amenidad no puede ser requerida y excluida a la vez"
+            )
+        valores = valores_con_amenidades(requeridas, excluidas)
+        condiciones_caracteristicas.append(
+            CaracteristicaPropiedad.amenidades == any_(literal(valores, ARRAY(Integer)))
+        )
     
-    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon / 2) * math.sin(dlon / 2))
+    if condiciones_caracteristicas:
+        query = query.filter(Propiedad.caracteristicas.has(and_(*condiciones_caracteristicas)))
     
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distancia = R * c
+    # Búsqueda de texto completo (índice GIN sobre propiedades.busqueda)
+    if q:
+        query = query.filter(coincide_sql(Propiedad.busqueda, consulta_texto(q)))
     
-    return distancia
+    return query
+
+
+# El catálogo de universidades es estático: la lista se serializa una sola vez
+RESPUESTA_UNIVERSIDADES = RespuestaPrecalculada(get_universidades_nombres())
+
+
+@lru_cache(maxsize=1024)
+def respuesta_busqueda_universidades(q: str) -> RespuestaPrecalculada:
+    """Resultado del autocomplete ya serializado, uno por texto buscado"""
+    return RespuestaPrecalculada(buscar_universidades(q))
 
 
 @router.get("/universidades", response_model=List[dict])
-def get_universidades():
+def get_universidades(request: Request):
     """
     Obtener lista de todas las universidades disponibles
+    (JSON precalculado con ETag: los clientes que ya la tienen reciben 304)
     """
-    return get_universidades_nombres()
+    return RESPUESTA_UNIVERSIDADES.responder(request)
 
 
-@router.get("/universidades/buscar")
-def buscar_universidades_endpoint(q: str = Query(..., min_length=2)):
+@router.get("/universidades/buscar", response_model=List[dict])
+def buscar_universidades_endpoint(request: Request, q: str = Query(..., min_length=2)):
     """
     Buscar universidades por nombre (para autocomplete)
     """
-    return buscar_universidades(q)
+    return respuesta_busqueda_universidades(q.strip().lower()).responder(request)
 
 
 @router.get("/", response_model=List[dict])
 def get_propiedades(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = Query(None, description=f"Cursor de la página anterior (header {HEADER_SIGUIENTE_CURSOR})"),
+    limit: int = Query(100, ge=1, le=100),
+    q: Optional[str] = Query(None, min_length=2, description="Texto a buscar en título, colonia y descripción"),
     universidad: Optional[str] = Query(None, description="Filtrar por cercanía a universidad"),
     distancia_max: Optional[float] = Query(5.0, description="Distancia máxima en km"),
     precio_min: Optional[float] = Query(None),
     precio_max: Optional[float] = Query(None),
     tipo: Optional[str] = Query(None),
     num_habitaciones: Optional[int] = Query(None),
+    amenidades: Optional[str] = Query(None, description="Amenidades separadas por coma; con - para excluir (ej: wifi,amueblado,-mascotas_permitidas)"),
     disponible: bool = Query(True, description="Mostrar solo disponibles"),
+    vista: str = Query("completa", pattern=PATRON_VISTA, description="completa o tarjeta (solo lo que muestra el grid)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Obtener lista de propiedades con filtros opcionales
     
-    Si se proporciona una universidad, las propiedades se ordenan por distancia
-    """
-    
-    # Query base
-    query = db.query(Propiedad)
+    Si se proporciona una universidad, las propiedades se ordenan por distancia;
+    si no, por relevancia cuando hay texto de búsqueda (q) o por precio. La paginación es por cursor: si hay más resultados, la
+    respuesta incluye el header X-Siguiente-Cursor, que se envía como ?cursor=
+    para pedir la siguiente página.
     
-    # Filtrar por disponibilidad
-    if disponible:
-        query = query.filter(Propiedad.disponible == True)    
-    # Filtrar por tipo
-    if tipo:
-        query = query.filter(Propiedad.tipo == tipo)
-    
-    # Filtrar por precio
-    if precio_min is not None:
-        query = query.filter(Propiedad.precio >= precio_min)
-    if precio_max is not None:
-        query = query.filter(Propiedad.precio <= precio_max)
+    Con vista=tarjeta solo se leen las columnas que muestra el grid de la app.
+    """
     
-    # Filtrar por habitaciones
-    if num_habitaciones is not None:
-        query = query.filter(Propiedad.num_habitaciones >= num_habitaciones)
+    # Query base: la vista tarjeta es una proyección de pocas columnas; la
+    # completa precarga características y fotos para toda la página
+    if vista == "tarjeta":
+        query = db.query(*columnas_tarjeta())
+    else:
+        query = db.query(Propiedad).options(*opciones_carga("detalle"))
     
-    propiedades = query.offset(skip).limit(limit).all()
+    query = filtrar_propiedades(query, disponible, tipo, precio_min, precio_max, num_habitaciones, q, amenidades)
     
-    # Si se especifica universidad, calcular distancias y ordenar
+    # Si se especifica universidad, filtrar y ordenar por distancia en la BD
+    # antes de paginar, usando las distancias precalculadas a todos sus campus
     if universidad:
         uni_coords = get_coordenadas_universidad(universidad)
         
@@ -108,29 +201,185 @@ def get_propiedades(
                 detail=f"Universidad no encontrada: {universidad}"
             )
         
+        distancias = subconsulta_distancias_universidad(uni_coords["id"], distancia_max)
+        
+        query = query.join(
+            distancias, distancias.c.id_propiedad == Propiedad.id_propiedad
+        ).add_columns(
+            distancias.c.indice_campus,
+            distancias.c.distancia
+        )
+        
+        if cursor:
+            distancia_cursor, id_cursor = decodificar_cursor(cursor, "distancia", (float, UUID))
+            query = query.filter(
+                tuple_(distancias.c.distancia, distancias.c.id_propiedad) > tuple_(distancia_cursor, id_cursor)
+            )
+        
+        # Se pide una fila extra para saber si hay siguiente página
+        resultados = query.order_by(
+            distancias.c.distancia, distancias.c.id_propiedad
+        ).limit(limit + 1).all()
+        
+        hay_mas = len(resultados) > limit
+        resultados = resultados[:limit]
+        
         propiedades_con_distancia = []
-        for prop in propiedades:
-            if prop.latitud and prop.longitud:
-                distancia = calcular_distancia(
-                    uni_coords["lat"],
-                    uni_coords["lng"],
-                    float(prop.latitud),
-                    float(prop.longitud)
-                )
-                
-                # Filtrar por distancia máxima
-                if distancia <= distancia_max:
-                    prop_dict = PropiedadResponse.model_validate(prop).model_dump()
-                    prop_dict["distancia"] = round(distancia, 2)
-                    prop_dict["universidad_referencia"] = uni_coords["nombre_completo"]
-                    propiedades_con_distancia.append(prop_dict)
+        for fila in resultados:
+            prop_dict = serializar_propiedad(fila, vista)
+            prop_dict["distancia"] = round(fila.distancia, 2)
+            prop_dict["universidad_referencia"] = uni_coords["nombre_completo"]
+            prop_dict["campus_referencia"] = uni_coords["campus"][fila.indice_campus]["nombre"]
+            propiedades_con_distancia.append(prop_dict)
+        
+        if hay_mas:
+            response.headers[HEADER_SIGUIENTE_CURSOR] = codificar_cursor(
+                "distancia", (resultados[-1].distancia, propiedades_con_distancia[-1]["id_propiedad"])
+            )
         
-        # Ordenar por distancia
-        propiedades_con_distancia.sort(key=lambda x: x["distancia"])
         return propiedades_con_distancia
     
+    # Con texto de búsqueda: ordenar por relevancia (más relevantes primero)
+    if q:
+        relevancia = relevancia_sql(Propiedad.busqueda, consulta_texto(q))
+        query = query.add_columns(relevancia.label("relevancia"))
+        
+        if cursor:
+            relevancia_cursor, id_cursor = decodificar_cursor(cursor, "relevancia", (float, UUID))
+            # ts_rank_cd es real: comparar contra real para no perder empates
+            query = query.filter(
+                tuple_(relevancia, Propiedad.id_propiedad) < tuple_(cast(relevancia_cursor, REAL), id_cursor)
+            )
+        
+        resultados = query.order_by(
+            relevancia.desc(), Propiedad.id_propiedad.desc()
+        ).limit(limit + 1).all()
+        
+        propiedades = [serializar_propiedad(fila, vista) for fila in resultados[:limit]]
+        
+        if len(resultados) > limit:
+            response.headers[HEADER_SIGUIENTE_CURSOR] = codificar_cursor(
+                "relevancia", (resultados[limit - 1].relevancia, propiedades[-1]["id_propiedad"])
+            )
+        
+        return propiedades
+    
+    # Sin universidad ni texto: ordenar por (precio_mensual, id_propiedad)
+    if cursor:
+        precio_cursor, id_cursor = decodificar_cursor(cursor, "precio", (Decimal, UUID))
+        query = query.filter(
+            tuple_(Propiedad.precio_mensual, Propiedad.id_propiedad) > tuple_(precio_cursor, id_cursor)
+        )
+    
+    resultados = query.order_by(
+        Propiedad.precio_mensual, Propiedad.id_propiedad
+    ).limit(limit + 1).all()
+    
     # Si no hay universidad, retornar sin distancia
-    return [PropiedadResponse.model_validate(prop).model_dump() for prop in propiedades]
+    propiedades = [serializar_propiedad(fila, vista) for fila in resultados[:limit]]
+    
+    if len(resultados) > limit:
+        response.headers[HEADER_SIGUIENTE_CURSOR] = codificar_cursor(
+            "precio", (propiedades[-1]["precio_mensual"], propiedades[-1]["id_propiedad"])
+        )
+    
+    return propiedades
+
+
+@router.get("/facetas", response_model=dict)
+def get_facetas_propiedades(
+    q: Optional[str] = Query(None, min_length=2, description="Texto a buscar en título, colonia y descripción"),
+    universidad: Optional[str] = Query(None, description="Filtrar por cercanía a universidad"),
+    distancia_max: Optional[float] = Query(5.0, description="Distancia máxima en km"),
+    precio_min: Optional[float] = Query(None),
+    precio_max: Optional[float] = Query(None),
+    tipo: Optional[str] = Query(None),
+    num_habitaciones: Optional[int] = Query(None),
+    amenidades: Optional[str] = Query(None, description="Amenidades separadas por coma; con - para excluir (ej: wifi,amueblado,-mascotas_permitidas)"),
+    disponible: bool = Query(True, description="Mostrar solo disponibles"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Conteos para los filtros de la búsqueda (mismos parámetros que GET /propiedades):
+    por tipo de propiedad, por rango de precio, por colonia y por amenidad.
+    
+    Todas las facetas salen de una sola consulta agregada (GROUPING SETS)
+    sobre las propiedades que cumplen los filtros.
+    """
+    rango_precio = func.width_bucket(
+        Propiedad.precio_mensual,
+        cast(array(LIMITES_RANGOS_PRECIO), ARRAY(Numeric))
+    )
+    
+    base = db.query(
+        Propiedad.tipo_propiedad,
+        Propiedad.colonia,
+        rango_precio.label("rango_precio"),
+        *[getattr(CaracteristicaPropiedad, amenidad) for amenidad in AMENIDADES]
+    ).outerjoin(
+        CaracteristicaPropiedad, CaracteristicaPropiedad.id_propiedad == Propiedad.id_propiedad
+    )
+    base = filtrar_propiedades(base, disponible, tipo, precio_min, precio_max, num_habitaciones, q, amenidades)
+    
+    if universidad:
+        uni_coords = get_coordenadas_universidad(universidad)
+        
+        if not uni_coords:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Universidad no encontrada: {universidad}"
+            )
+        
+        distancias = subconsulta_distancias_universidad(uni_coords["id"], distancia_max)
+        base = base.join(distancias, distancias.c.id_propiedad == Propiedad.id_propiedad)
+    
+    filas = base.subquery()
+    
+    # Un grupo por faceta: (tipo), (rango de precio), (colonia) y () para el
+    # total y las amenidades. grouping() indica a qué faceta pertenece cada fila
+    conjunto = func.grouping(filas.c.tipo_propiedad, filas.c.rango_precio, filas.c.colonia)
+    resultados = db.query(
+        conjunto.label("conjunto"),
+        filas.c.tipo_propiedad,
+        filas.c.rango_precio,
+        filas.c.colonia,
+        func.count().label("total"),
+        *[func.count().filter(filas.c[amenidad]).label(amenidad) for amenidad in AMENIDADES]
+    ).group_by(
+        func.grouping_sets(
+            tuple_(filas.c.tipo_propiedad),
+            tuple_(filas.c.rango_precio),
+            tuple_(filas.c.colonia),
+            tuple_()
+        )
+    ).all()
+    
+    limites = (None,) + LIMITES_RANGOS_PRECIO + (None,)
+    facetas = {
+        "total": 0,
+        "tipo_propiedad": {},
+        "rango_precio": [
+            {"min": limites[i], "max": limites[i + 1], "total": 0}
+            for i in range(len(limites) - 1)
+        ],
+        "colonia": {},
+        "amenidades": {amenidad: 0 for amenidad in AMENIDADES},
+    }
+    
+    for fila in resultados:
+        if fila.conjunto == 0b011:
+            facetas["tipo_propiedad"][fila.tipo_propiedad] = fila.total
+        elif fila.conjunto == 0b101:
+            facetas["rango_precio"][fila.rango_precio]["total"] = fila.total
+        elif fila.conjunto == 0b110:
+            if fila.colonia is not None:
+                facetas["colonia"][fila.colonia] = fila.total
+        else:
+            facetas["total"] = fila.total
+            facetas["amenidades"] = {amenidad: getattr(fila, amenidad) for amenidad in AMENIDADES}
+    
+    return facetas
 
 
 @router.get("/cercanas", response_model=List[dict])
@@ -138,6 +387,7 @@ def get_propiedades_cercanas_mi_universidad(
     current_user: Usuario = Depends(get_current_user),
     distancia_max: float = Query(5.0, description="Distancia máxima en km"),
     limit: int = Query(20),
+    vista: str = Query("completa", pattern=PATRON_VISTA, description="completa o tarjeta (solo lo que muestra el grid)"),
     db: Session = Depends(get_db)
 ):
     """
@@ -148,10 +398,13 @@ def get_propiedades_cercanas_mi_universidad(
     # Verificar que el usuario tenga perfil de estudiante
     if not current_user.perfil_estudiante:
         # Si no es estudiante, retornar propiedades generales
-        propiedades = db.query(Propiedad).filter(
-            Propiedad.disponibilidad == "disponible"
+        query = db.query(*columnas_tarjeta()) if vista == "tarjeta" else \
+            db.query(Propiedad).options(*opciones_carga("detalle"))
+        propiedades = query.filter(
+            Propiedad.disponible == True,
+            Propiedad.activa == True
         ).limit(limit).all()
-        return [PropiedadResponse.model_validate(prop).model_dump() for prop in propiedades]
+        return [serializar_propiedad(fila, vista) for fila in propiedades]
     
     universidad_nombre = current_user.perfil_estudiante.universidad
     uni_coords = get_coordenadas_universidad(universidad_nombre)
@@ -162,35 +415,54 @@ def get_propiedades_cercanas_mi_universidad(
             detail=f"Universidad no reconocida: {universidad_nombre}"
         )
     
-    # Obtener todas las propiedades disponibles
-    propiedades = db.query(Propiedad).filter(
-        Propiedad.disponibilidad == "disponible"
+    # Buscar en el índice espacial en memoria (solo ids y distancias)
+    # alrededor de cada campus, quedándose con el campus más cercano
+    indice_propiedades.asegurar_vigente(db)
+    mas_cercano = {}
+    for campus in uni_coords["campus"]:
+        for id_propiedad, distancia in indice_propiedades.buscar_radio(
+            campus["lat"], campus["lng"], distancia_max, limit=limit
+        ):
+            if id_propiedad not in mas_cercano or distancia < mas_cercano[id_propiedad][1]:
+                mas_cercano[id_propiedad] = (campus["nombre"], distancia)
+    
+    cercanas = sorted(mas_cercano.items(), key=lambda x: x[1][1])[:limit]
+    
+    if not cercanas:
+        return []
+    
+    # Cargar las filas (completas o de tarjeta) en una sola consulta. El
+    # índice puede ir hasta REVISION_SEGUNDOS atrasado: se vuelve a filtrar
+    # por disponible/activa para no mostrar las que otro worker acaba de retirar
+    query = db.query(*columnas_tarjeta()) if vista == "tarjeta" else \
+        db.query(Propiedad).options(*opciones_carga("detalle"))
+    propiedades = query.filter(
+        Propiedad.id_propiedad.in_([id_propiedad for id_propiedad, _ in cercanas]),
+        Propiedad.disponible == True,
+        Propiedad.activa == True
     ).all()
+    propiedades_por_id = {}
+    for fila in propiedades:
+        prop_dict = serializar_propiedad(fila, vista)
+        propiedades_por_id[prop_dict["id_propiedad"]] = prop_dict
     
     propiedades_cercanas = []
-    for prop in propiedades:
-        if prop.latitud and prop.longitud:
-            distancia = calcular_distancia(
-                uni_coords["lat"],
-                uni_coords["lng"],
-                float(prop.latitud),
-                float(prop.longitud)
-            )
-            
-            if distancia <= distancia_max:
-                prop_dict = PropiedadResponse.model_validate(prop).model_dump()
-                prop_dict["distancia"] = round(distancia, 2)
-                prop_dict["universidad_referencia"] = uni_coords["nombre_completo"]
-                propiedades_cercanas.append(prop_dict)
-    
-    # Ordenar por distancia y limitar resultados
-    propiedades_cercanas.sort(key=lambda x: x["distancia"])
-    return propiedades_cercanas[:limit]
+    for id_propiedad, (nombre_campus, distancia) in cercanas:
+        prop_dict = propiedades_por_id.get(id_propiedad)
+        if prop_dict is None:
+            continue
+        
+        prop_dict["distancia"] = round(distancia, 2)
+        prop_dict["universidad_referencia"] = uni_coords["nombre_completo"]
+        prop_dict["campus_referencia"] = nombre_campus
+        propiedades_cercanas.append(prop_dict)
+    
+    return propiedades_cercanas
 
 
 @router.get("/{id_propiedad}", response_model=dict)
 def get_propiedad(
-    id_propiedad: int,
+    id_propiedad: UUID,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -198,7 +470,7 @@ def get_propiedad(
     Obtener detalle de una propiedad específica
     Si el usuario es estudiante, incluye la distancia a su universidad
     """
-    propiedad = db.query(Propiedad).filter(
+    propiedad = db.query(Propiedad).options(*opciones_carga("detalle")).filter(
         Propiedad.id_propiedad == id_propiedad
     ).first()
     
@@ -210,20 +482,20 @@ def get_propiedad(
     
     prop_dict = PropiedadResponse.model_validate(propiedad).model_dump()
     
-    # Si el usuario es estudiante, calcular distancia a su universidad
+    # Si el usuario es estudiante, calcular distancia al campus más cercano de su universidad
     if current_user.perfil_estudiante and propiedad.latitud and propiedad.longitud:
         universidad_nombre = current_user.perfil_estudiante.universidad
         uni_coords = get_coordenadas_universidad(universidad_nombre)
         
         if uni_coords:
-            distancia = calcular_distancia(
-                uni_coords["lat"],
-                uni_coords["lng"],
+            campus, distancia = campus_mas_cercano(
+                uni_coords["id"],
                 float(propiedad.latitud),
                 float(propiedad.longitud)
             )
             prop_dict["distancia"] = round(distancia, 2)
             prop_dict["universidad_referencia"] = uni_coords["nombre_completo"]
+            prop_dict["campus_referencia"] = campus.nombre
     
     return prop_dict
 
@@ -238,20 +510,29 @@ def crear_propiedad(
     Crear una nueva propiedad (solo arrendadores)
     """
     nueva_propiedad = Propiedad(
-        **propiedad_data.model_dump(),
+        **propiedad_data.model_dump(exclude={"caracteristicas", "fotos"}),
         id_arrendador=current_user.id_usuario
     )
+    nueva_propiedad.caracteristicas = CaracteristicaPropiedad(
+        **propiedad_data.caracteristicas.model_dump()
+    )
+    nueva_propiedad.fotos = [
+        FotoPropiedad(**foto.model_dump()) for foto in propiedad_data.fotos
+    ]
     
     db.add(nueva_propiedad)
+    recalcular_distancias_propiedad(db, nueva_propiedad)
     db.commit()
     db.refresh(nueva_propiedad)
     
+    indice_propiedades.actualizar(nueva_propiedad)
+    
     return nueva_propiedad
 
 
 @router.put("/{id_propiedad}", response_model=PropiedadResponse)
 def actualizar_propiedad(
-    id_propiedad: int,
+    id_propiedad: UUID,
     propiedad_data: PropiedadUpdate,
     current_user: Usuario = Depends(get_current_arrendador),
     db: Session = Depends(get_db)
@@ -277,18 +558,34 @@ def actualizar_propiedad(
         )
     
     # Actualizar campos
-    for key, value in propiedad_data.model_dump(exclude_unset=True).items():
+    datos = propiedad_data.model_dump(exclude_unset=True)
+    datos_caracteristicas = datos.pop("caracteristicas", None)
+    for key, value in datos.items():
         setattr(propiedad, key, value)
     
+    # Las características son una fila aparte: actualizar sus columnas
+    # (el bitmask de amenidades se recalcula al guardar)
+    if datos_caracteristicas is not None:
+        if propiedad.caracteristicas is None:
+            propiedad.caracteristicas = CaracteristicaPropiedad()
+        for key, value in datos_caracteristicas.items():
+            setattr(propiedad.caracteristicas, key, value)
+    
+    # Recalcular distancias a campus solo si cambió la ubicación
+    if "latitud" in datos or "longitud" in datos:
+        recalcular_distancias_propiedad(db, propiedad)
+    
     db.commit()
     db.refresh(propiedad)
     
+    indice_propiedades.actualizar(propiedad)
+    
     return propiedad
 
 
 @router.delete("/{id_propiedad}", status_code=status.HTTP_204_NO_CONTENT)
 def eliminar_propiedad(
-    id_propiedad: int,
+    id_propiedad: UUID,
     current_user: Usuario = Depends(get_current_arrendador),
     db: Session = Depends(get_db)
 ):
@@ -315,4 +612,6 @@ def eliminar_propiedad(
     db.delete(propiedad)
     db.commit()
     
+    indice_propiedades.eliminar(id_propiedad)
+    
     return None
\ No newline at end of file
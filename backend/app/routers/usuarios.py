@@ -2,18 +2,18 @@
 Router para gestión de usuarios
 """
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.usuario import Usuario
 from app.schemas.usuario import UsuarioResponse, UsuarioUpdate
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user_async
 
 router = APIRouter()
 
 @router.get("/me", response_model=UsuarioResponse)
 async def obtener_perfil(
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener perfil del usuario actual"""
     return current_user
@@ -22,8 +22,8 @@ async def obtener_perfil(
 @router.put("/me", response_model=UsuarioResponse)
 async def actualizar_perfil(
     usuario_data: UsuarioUpdate,
-    current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Usuario = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar perfil del usuario actual"""
     if usuario_data.nombre_completo:
@@ -35,7 +35,7 @@ async def actualizar_perfil(
     if usuario_data.foto_perfil_url:
         current_user.foto_perfil_url = usuario_data.foto_perfil_url
     
-    db.commit()
-    db.refresh(current_user)
+    # Sin refresh: la sesión no expira los objetos al hacer commit
+    await db.commit()
     
     return current_user
\ No newline at end of file
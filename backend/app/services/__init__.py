@@ -3,8 +3,11 @@ Services package - Lógica de negocio y servicios
 """
 
 from app.services.usuario_service import usuario_service, UsuarioService
+from app.services.indice_espacial import indice_propiedades, IndiceEspacial
 
 __all__ = [
     "usuario_service",
-    "UsuarioService"
+    "UsuarioService",
+    "indice_propiedades",
+    "IndiceEspacial"
 ]
\ No newline at end of file
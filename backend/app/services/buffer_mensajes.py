@@ -0,0 +1,150 @@
+"""
+Buffer de escritura diferida (write-behind) para los mensajes del chat
+
+Los mensajes que llegan por el WebSocket no se guardan uno por uno: se
+encolan y una tarea los inserta por lotes cada CHAT_WRITE_BATCH_MS
+milisegundos (o en cuanto se juntan CHAT_WRITE_BATCH_SIZE), con un solo
+INSERT ... RETURNING y un solo commit por lote. Quien encola espera a que
+su lote se guarde y recibe el id_mensaje y la fecha_envio asignados por
+la BD, para confirmarle al cliente.
+
+Si un lote falla (ej: un destinatario que no existe viola la FK), sus
+mensajes se reintentan uno por uno para que solo fallen los inválidos.
+"""
+
+import asyncio
+from typing import List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal, fijaciones_primario
+from app.models.mensajes_notificaciones_pagos import Mensaje
+
+
+class MensajeGuardado(NamedTuple):
+    id_mensaje: int
+    fecha_envio: object
+
+
+Pendiente = Tuple[dict, asyncio.Future]
+
+
+class BufferMensajes:
+    def __init__(self, intervalo_ms: float, tamano_lote: int, maximo_pendientes: int):
+        self.intervalo = intervalo_ms / 1000
+        self.tamano_lote = tamano_lote
+        self.maximo_pendientes = maximo_pendientes
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.lotes = 0
+        self.guardados = 0
+
+    async def iniciar(self):
+        # La cola se crea aquí para quedar en el event loop de la aplicación
+        self._cola = asyncio.Queue(maxsize=self.maximo_pendientes)
+        self._tarea = asyncio.create_task(self._escribir_lotes())
+
+    async def detener(self):
+        """Guarda lo que quede pendiente y detiene la tarea"""
+        if self._tarea is None:
+            return
+        tarea, self._tarea = self._tarea, None
+        # Marca de fin: la tarea guarda todo lo encolado antes y termina
+        await self._cola.put(None)
+        await tarea
+
+    async def guardar(
+        self,
+        id_remitente: UUID,
+        id_destinatario: UUID,
+        contenido: str,
+        id_propiedad: Optional[UUID] = None
+    ) -> MensajeGuardado:
+        """
+        Encola el mensaje y espera a que su lote se inserte.
+        Si hay maximo_pendientes en espera, espera turno (backpressure).
+        """
+        if self._tarea is None:
+            raise RuntimeError("El buffer de mensajes no está iniciado")
+        futuro = asyncio.get_running_loop().create_future()
+        fila = {
+            "id_remitente": id_remitente,
+            "id_destinatario": id_destinatario,
+            "contenido": contenido,
+            "id_propiedad": id_propiedad,
+            "leido": False,
+        }
+        await self._cola.put((fila, futuro))
+        return await futuro
+
+    async def _escribir_lotes(self):
+        while True:
+            primero = await self._cola.get()
+            if primero is None:
+                return
+            lote = [primero]
+            fin = False
+            # Juntar lo que llegue durante el intervalo, hasta el tamaño del lote
+            limite = asyncio.get_running_loop().time() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = limite - asyncio.get_running_loop().time()
+                if restante <= 0:
+                    break
+                try:
+                    pendiente = await asyncio.wait_for(self._cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                if pendiente is None:
+                    fin = True
+                    break
+                lote.append(pendiente)
+            await self._guardar(lote)
+            if fin:
+                return
+
+    async def _guardar(self, lote: List[Pendiente]):
+        try:
+            resultados = await self._insertar([fila for fila, _ in lote])
+        except Exception as e:
+            if len(lote) == 1:
+                _, futuro = lote[0]
+                if not futuro.done():
+                    futuro.set_exception(e)
+                return
+            # Aislar los mensajes inválidos
+            for pendiente in lote:
+                await self._guardar([pendiente])
+            return
+
+        for (_, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+    async def _insertar(self, filas: List[dict]) -> List[MensajeGuardado]:
+        async with AsyncSessionLocal() as db:
+            resultado = await db.execute(
+                insert(Mensaje).returning(
+                    Mensaje.id_mensaje,
+                    Mensaje.fecha_envio,
+                    sort_by_parameter_order=True
+                ),
+                filas
+            )
+            guardados = [MensajeGuardado(*fila) for fila in resultado.all()]
+            await db.commit()
+
+        self.lotes += 1
+        self.guardados += len(guardados)
+        # Los remitentes leen su propio mensaje del primario (ver database.py)
+        for id_remitente in {fila["id_remitente"] for fila in filas}:
+            await fijaciones_primario.fijar_async(id_remitente)
+        return guardados
+
+
+buffer_mensajes = BufferMensajes(
+    settings.CHAT_WRITE_BATCH_MS,
+    settings.CHAT_WRITE_BATCH_SIZE,
+    settings.CHAT_WRITE_MAX_PENDING
+)
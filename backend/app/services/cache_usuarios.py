@@ -0,0 +1,166 @@
+"""
+Caché en memoria del usuario autenticado
+
+get_current_user corre en cada petición autenticada (cada consulta del chat,
+cada conteo de notificaciones). En vez de un SELECT por petición, guarda por
+USER_CACHE_TTL_SECONDS una foto del usuario con sus perfiles de estudiante y
+arrendador; con un acierto la autenticación no hace ninguna consulta.
+
+La foto son solo valores de columnas (no objetos ORM, que pertenecen a una
+sesión). En cada petición se reconstruye un Usuario "detached" y se une a la
+sesión con merge(load=False): queda persistente, con perfil_estudiante y
+perfil_arrendador ya cargados, y se puede modificar y hacer commit como si
+viniera de una consulta.
+
+Invalidación: cualquier commit que inserte, modifique o borre un Usuario o
+alguno de sus perfiles por el ORM (actualizar perfil, desactivar cuenta)
+saca al usuario del caché. Con varios workers cada uno tiene su caché; en
+los demás el cambio se ve al vencer el TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import settings
+from app.models.usuario import Usuario, PerfilEstudiante, PerfilArrendador
+
+# Relación de Usuario -> modelo del perfil que se guarda junto con el usuario
+PERFILES = {
+    "perfil_estudiante": PerfilEstudiante,
+    "perfil_arrendador": PerfilArrendador,
+}
+
+Foto = Dict[str, Any]
+
+
+def _columnas(objeto) -> Dict[str, Any]:
+    return {
+        columna.key: getattr(objeto, columna.key)
+        for columna in inspect(type(objeto)).column_attrs
+    }
+
+
+def foto_usuario(usuario: Usuario) -> Foto:
+    """Valores de columnas del usuario y de sus perfiles (None si no tiene)"""
+    foto = {"usuario": _columnas(usuario)}
+    for relacion in PERFILES:
+        perfil = getattr(usuario, relacion)
+        foto[relacion] = _columnas(perfil) if perfil is not None else None
+    return foto
+
+
+def _detached(modelo, columnas: Dict[str, Any]):
+    """Instancia con identidad de BD pero sin sesión, sin cambios pendientes"""
+    objeto = modelo()
+    for clave, valor in columnas.items():
+        set_committed_value(objeto, clave, valor)
+    make_transient_to_detached(objeto)
+    return objeto
+
+
+def usuario_desde_foto(foto: Foto) -> Usuario:
+    """Usuario detached (con sus perfiles) reconstruido desde la foto"""
+    usuario = _detached(Usuario, foto["usuario"])
+    for relacion, modelo in PERFILES.items():
+        perfil = None
+        if foto[relacion] is not None:
+            perfil = _detached(modelo, foto[relacion])
+            set_committed_value(perfil, "usuario", usuario)
+        set_committed_value(usuario, relacion, perfil)
+    return usuario
+
+
+class CacheUsuarios:
+    """
+    Caché LRU thread-safe con vencimiento (TTL), por id de usuario.
+    ttl=0 lo desactiva.
+    """
+
+    def __init__(self, ttl: float, maximo: int):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._fotos: "OrderedDict[UUID, Tuple[float, Foto]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self) -> int:
+        return len(self._fotos)
+
+    def obtener(self, id_usuario: UUID) -> Optional[Foto]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entrada = self._fotos.get(id_usuario)
+            if entrada is None or entrada[0] <= time.monotonic():
+                if entrada is not None:
+                    del self._fotos[id_usuario]
+                self.fallos += 1
+                return None
+            self._fotos.move_to_end(id_usuario)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, usuario: Usuario):
+        if self.ttl <= 0:
+            return
+        foto = foto_usuario(usuario)
+        with self._lock:
+            self._fotos[usuario.id_usuario] = (time.monotonic() + self.ttl, foto)
+            self._fotos.move_to_end(usuario.id_usuario)
+            while len(self._fotos) > self.maximo:
+                self._fotos.popitem(last=False)
+
+    def invalidar(self, id_usuario: UUID):
+        with self._lock:
+            self._fotos.pop(id_usuario, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._fotos.clear()
+
+
+cache_usuarios = CacheUsuarios(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_ENTRIES)
+
+
+# ============================================================================
+# INVALIDACIÓN AL HACER COMMIT
+# ============================================================================
+
+@event.listens_for(Session, "after_flush")
+def _registrar_usuarios_modificados(session, flush_context):
+    modificados = session.info.setdefault("usuarios_modificados", set())
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, (Usuario, PerfilEstudiante, PerfilArrendador)) and objeto.id_usuario:
+            modificados.add(objeto.id_usuario)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _registrar_update_masivo(orm_execute_state):
+    # update(Usuario)/delete(Usuario) no dicen qué filas tocan: se vacía todo
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (Usuario, PerfilEstudiante, PerfilArrendador):
+            orm_execute_state.session.info["usuarios_modificados_todos"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_usuarios_modificados(session):
+    # Después del commit: una petición que leyó antes ya no deja la versión vieja
+    if session.info.pop("usuarios_modificados_todos", False):
+        cache_usuarios.limpiar()
+    for id_usuario in session.info.pop("usuarios_modificados", ()):
+        cache_usuarios.invalidar(id_usuario)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_usuarios_modificados(session):
+    session.info.pop("usuarios_modificados", None)
+    session.info.pop("usuarios_modificados_todos", None)
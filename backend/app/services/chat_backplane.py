@@ -0,0 +1,372 @@
+"""
+Backplane de pub/sub para el chat en tiempo real
+
+Cada proceso (worker de uvicorn, nodo) solo tiene los WebSockets que se
+conectaron a él. Para que un mensaje llegue a un usuario conectado en otro
+proceso, send_personal_message entrega a los sockets locales y además
+publica el mensaje en el backplane; cada nodo recibe la publicación y la
+entrega a sus propios sockets (el nodo que publicó la ignora).
+
+También lleva la presencia: qué usuarios tienen al menos un socket abierto
+en algún nodo.
+
+Backends (settings.CHAT_BACKPLANE):
+    - "memoria": dentro del proceso. Con un solo worker es todo lo que hace
+      falta; en pruebas, varios backplanes sobre el mismo BusMemoria simulan
+      varios nodos.
+    - "postgres": LISTEN/NOTIFY sobre la misma BD (sin servicios extra).
+      Presencia en la tabla presencia_chat (migrations/008_presencia_chat.sql).
+      LISTEN necesita una conexión directa: detrás de pgbouncer en modo
+      transacción usar CHAT_DATABASE_URL apuntando al servidor.
+    - "redis": pub/sub de Redis (o cualquier servidor con su protocolo:
+      Valkey, KeyDB, un redis-server local). Requiere el paquete redis.
+"""
+
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from app.config import settings
+
+# Canal de publicación (mismo nombre en Postgres y Redis)
+CANAL_CHAT = "campusnest_chat"
+
+# Cada nodo renueva su presencia con esta frecuencia; la de un nodo que no
+# la renueva en PRESENCIA_VENCE_SEGUNDOS (ej: se cayó) deja de contar
+PRESENCIA_INTERVALO_SEGUNDOS = 15
+PRESENCIA_VENCE_SEGUNDOS = 3 * PRESENCIA_INTERVALO_SEGUNDOS
+
+# NOTIFY no acepta payloads de 8000 bytes o más
+MAXIMO_PAYLOAD_NOTIFY = 7999
+
+Entregar = Callable[[str, dict], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """
+    Interfaz común. El ConnectionManager llama a iniciar() con su función de
+    entrega local, publicar() para cada mensaje y conectado()/desconectado()
+    cuando un usuario abre su primer socket o cierra el último en este nodo.
+    """
+
+    def __init__(self):
+        self.nodo = uuid.uuid4().hex
+        self._entregar: Optional[Entregar] = None
+        # Usuarios con sockets en este nodo (para renovar y limpiar presencia)
+        self._locales: Set[str] = set()
+
+    async def iniciar(self, entregar: Entregar):
+        self._entregar = entregar
+
+    async def detener(self):
+        self._locales.clear()
+
+    @abstractmethod
+    async def publicar(self, id_usuario: str, mensaje: dict):
+        """Envía el mensaje a los demás nodos"""
+
+    async def conectado(self, id_usuario: str):
+        self._locales.add(id_usuario)
+
+    async def desconectado(self, id_usuario: str):
+        self._locales.discard(id_usuario)
+
+    @abstractmethod
+    async def en_linea(self, id_usuario: str) -> bool:
+        """True si el usuario tiene algún socket abierto en algún nodo"""
+
+    def _sobre(self, id_usuario: str, mensaje: dict) -> str:
+        """Mensaje serializado con su destino y el nodo de origen"""
+        return json.dumps({"origen": self.nodo, "destino": id_usuario, "mensaje": mensaje})
+
+    async def _recibir(self, payload: str):
+        sobre = json.loads(payload)
+        # El nodo que publica ya entregó a sus sockets locales
+        if sobre["origen"] == self.nodo or self._entregar is None:
+            return
+        try:
+            await self._entregar(sobre["destino"], sobre["mensaje"])
+        except Exception as e:
+            print(f"⚠️ Chat: no se pudo entregar un mensaje del backplane: {e}")
+
+
+# ============================================================================
+# EN MEMORIA
+# ============================================================================
+
+class BusMemoria:
+    """Canal compartido por los backplanes en memoria de un proceso"""
+
+    def __init__(self):
+        self.suscriptores: Set["BackplaneMemoria"] = set()
+        self.presencia: Dict[str, Set[str]] = {}
+
+
+BUS_PROCESO = BusMemoria()
+
+
+class BackplaneMemoria(Backplane):
+    def __init__(self, bus: BusMemoria = BUS_PROCESO):
+        super().__init__()
+        self.bus = bus
+
+    async def iniciar(self, entregar: Entregar):
+        await super().iniciar(entregar)
+        self.bus.suscriptores.add(self)
+
+    async def detener(self):
+        self.bus.suscriptores.discard(self)
+        for id_usuario in list(self._locales):
+            await self.desconectado(id_usuario)
+        await super().detener()
+
+    async def publicar(self, id_usuario: str, mensaje: dict):
+        # Serializar igual que los otros backends: lo que no es JSON falla aquí también
+        payload = self._sobre(id_usuario, mensaje)
+        for suscriptor in list(self.bus.suscriptores):
+            await suscriptor._recibir(payload)
+
+    async def conectado(self, id_usuario: str):
+        await super().conectado(id_usuario)
+        self.bus.presencia.setdefault(id_usuario, set()).add(self.nodo)
+
+    async def desconectado(self, id_usuario: str):
+        await super().desconectado(id_usuario)
+        nodos = self.bus.presencia.get(id_usuario)
+        if nodos is not None:
+            nodos.discard(self.nodo)
+            if not nodos:
+                del self.bus.presencia[id_usuario]
+
+    async def en_linea(self, id_usuario: str) -> bool:
+        return bool(self.bus.presencia.get(id_usuario))
+
+
+# ============================================================================
+# POSTGRES (LISTEN/NOTIFY)
+# ============================================================================
+
+class BackplanePostgres(Backplane):
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._escucha = None
+        self._pool = None
+        self._latido: Optional[asyncio.Task] = None
+        # Entregas en curso: se guarda la referencia para que el recolector
+        # no las cancele a medias y para esperarlas al detener
+        self._recepciones: Set[asyncio.Task] = set()
+
+    async def iniciar(self, entregar: Entregar):
+        import asyncpg
+
+        await super().iniciar(entregar)
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        await self._escuchar()
+        self._latido = asyncio.create_task(self._renovar_presencia())
+
+    async def _escuchar(self):
+        import asyncpg
+
+        self._escucha = await asyncpg.connect(self.dsn)
+        await self._escucha.add_listener(CANAL_CHAT, self._al_notificar)
+
+    def _al_notificar(self, conexion, pid, canal, payload):
+        # asyncpg llama este callback de forma síncrona: la entrega va en una tarea
+        tarea = asyncio.create_task(self._recibir(payload))
+        self._recepciones.add(tarea)
+        tarea.add_done_callback(self._recepcion_terminada)
+
+    def _recepcion_terminada(self, tarea: asyncio.Task):
+        self._recepciones.discard(tarea)
+        if not tarea.cancelled() and tarea.exception() is not None:
+            print(f"⚠️ Chat: falló la recepción de una notificación de Postgres: {tarea.exception()!r}")
+
+    async def _renovar_presencia(self):
+        while True:
+            await asyncio.sleep(PRESENCIA_INTERVALO_SEGUNDOS)
+            try:
+                # Si se perdió la conexión de LISTEN, reconectar
+                if self._escucha is None or self._escucha.is_closed():
+                    await self._escuchar()
+                await self._pool.execute(
+                    "UPDATE presencia_chat SET visto = now() WHERE nodo = $1", self.nodo
+                )
+                # Filas de nodos que se cayeron sin llegar a detener()
+                await self._pool.execute(
+                    "DELETE FROM presencia_chat WHERE visto < now() - make_interval(secs => $1)",
+                    PRESENCIA_VENCE_SEGUNDOS
+                )
+            except Exception as e:
+                print(f"⚠️ Chat: no se pudo renovar la presencia en Postgres: {e}")
+
+    async def detener(self):
+        if self._latido is not None:
+            self._latido.cancel()
+        if self._escucha is not None and not self._escucha.is_closed():
+            await self._escucha.remove_listener(CANAL_CHAT, self._al_notificar)
+        if self._recepciones:
+            await asyncio.gather(*self._recepciones, return_exceptions=True)
+        if self._pool is not None:
+            await self._pool.execute("DELETE FROM presencia_chat WHERE nodo = $1", self.nodo)
+            await self._pool.close()
+        if self._escucha is not None and not self._escucha.is_closed():
+            await self._escucha.close()
+        await super().detener()
+
+    async def publicar(self, id_usuario: str, mensaje: dict):
+        payload = self._sobre(id_usuario, mensaje)
+        if len(payload.encode("utf-8")) > MAXIMO_PAYLOAD_NOTIFY:
+            print(f"⚠️ Chat: mensaje de {len(payload)} bytes excede el límite de NOTIFY; solo se entregó localmente")
+            return
+        await self._pool.execute("SELECT pg_notify($1, $2)", CANAL_CHAT, payload)
+
+    async def conectado(self, id_usuario: str):
+        await super().conectado(id_usuario)
+        await self._pool.execute(
+            """
+            INSERT INTO presencia_chat (id_usuario, nodo, visto) VALUES ($1, $2, now())
+            ON CONFLICT (id_usuario, nodo) DO UPDATE SET visto = now()
+            """,
+            id_usuario, self.nodo
+        )
+
+    async def desconectado(self, id_usuario: str):
+        await super().desconectado(id_usuario)
+        await self._pool.execute(
+            "DELETE FROM presencia_chat WHERE id_usuario = $1 AND nodo = $2",
+            id_usuario, self.nodo
+        )
+
+    async def en_linea(self, id_usuario: str) -> bool:
+        return await self._pool.fetchval(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM presencia_chat
+                WHERE id_usuario = $1 AND visto > now() - make_interval(secs => $2)
+            )
+            """,
+            id_usuario, PRESENCIA_VENCE_SEGUNDOS
+        )
+
+
+# ============================================================================
+# REDIS
+# ============================================================================
+
+class BackplaneRedis(Backplane):
+    """
+    Presencia con dos tipos de llave:
+        chat:nodo:<nodo>        existe mientras el nodo renueve su latido (TTL)
+        chat:usuario:<id>       conjunto de nodos donde el usuario tiene sockets
+    Un usuario está en línea si alguno de sus nodos sigue vivo.
+    """
+
+    PREFIJO = "campusnest:chat"
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._tareas = []
+
+    def _llave_nodo(self, nodo: str) -> str:
+        return f"{self.PREFIJO}:nodo:{nodo}"
+
+    def _llave_usuario(self, id_usuario: str) -> str:
+        return f"{self.PREFIJO}:usuario:{id_usuario}"
+
+    async def iniciar(self, entregar: Entregar):
+        try:
+            import redis.asyncio as redis_async
+        except ImportError:
+            raise RuntimeError("CHAT_BACKPLANE=redis requiere el paquete redis (pip install redis)")
+
+        await super().iniciar(entregar)
+        self._redis = redis_async.from_url(self.url, decode_responses=True)
+        await self._redis.set(self._llave_nodo(self.nodo), "1", ex=PRESENCIA_VENCE_SEGUNDOS)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(CANAL_CHAT)
+        self._tareas = [
+            asyncio.create_task(self._escuchar()),
+            asyncio.create_task(self._renovar_presencia()),
+        ]
+
+    async def _escuchar(self):
+        while True:
+            try:
+                async for mensaje in self._pubsub.listen():
+                    if mensaje["type"] == "message":
+                        await self._recibir(mensaje["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconecta la suscripción en la siguiente lectura
+                print(f"⚠️ Chat: se perdió la suscripción a Redis: {e}")
+                await asyncio.sleep(1)
+
+    async def _renovar_presencia(self):
+        while True:
+            await asyncio.sleep(PRESENCIA_INTERVALO_SEGUNDOS)
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(self._llave_nodo(self.nodo), "1", ex=PRESENCIA_VENCE_SEGUNDOS)
+                    for id_usuario in self._locales:
+                        pipe.sadd(self._llave_usuario(id_usuario), self.nodo)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Chat: no se pudo renovar la presencia en Redis: {e}")
+
+    async def detener(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+        if self._redis is not None:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.delete(self._llave_nodo(self.nodo))
+                for id_usuario in self._locales:
+                    pipe.srem(self._llave_usuario(id_usuario), self.nodo)
+                await pipe.execute()
+            await self._pubsub.aclose()
+            await self._redis.aclose()
+        await super().detener()
+
+    async def publicar(self, id_usuario: str, mensaje: dict):
+        await self._redis.publish(CANAL_CHAT, self._sobre(id_usuario, mensaje))
+
+    async def conectado(self, id_usuario: str):
+        await super().conectado(id_usuario)
+        await self._redis.sadd(self._llave_usuario(id_usuario), self.nodo)
+
+    async def desconectado(self, id_usuario: str):
+        await super().desconectado(id_usuario)
+        await self._redis.srem(self._llave_usuario(id_usuario), self.nodo)
+
+    async def en_linea(self, id_usuario: str) -> bool:
+        nodos = await self._redis.smembers(self._llave_usuario(id_usuario))
+        if not nodos:
+            return False
+        nodos = list(nodos)
+        vivos = await self._redis.mget([self._llave_nodo(nodo) for nodo in nodos])
+        muertos = [nodo for nodo, vivo in zip(nodos, vivos) if vivo is None]
+        if muertos:
+            # Nodos que se cayeron sin limpiar su presencia
+            await self._redis.srem(self._llave_usuario(id_usuario), *muertos)
+        return len(muertos) < len(nodos)
+
+
+def crear_backplane() -> Backplane:
+    """Backplane configurado en settings.CHAT_BACKPLANE"""
+    tipo = settings.CHAT_BACKPLANE
+    if tipo == "memoria":
+        return BackplaneMemoria()
+    if tipo == "postgres":
+        from app.database import get_database_url
+        return BackplanePostgres(get_database_url(settings.CHAT_DATABASE_URL))
+    if tipo == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("CHAT_BACKPLANE=redis requiere REDIS_URL")
+        return BackplaneRedis(settings.REDIS_URL)
+    raise RuntimeError(f"CHAT_BACKPLANE desconocido: {tipo}")
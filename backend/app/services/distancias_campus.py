@@ -0,0 +1,165 @@
+"""
+Servicio de distancias precalculadas propiedad x campus
+
+Mantiene la tabla distancias_propiedad_campus, que guarda la distancia de
+cada propiedad a cada campus de UNIVERSIDADES_PUEBLA (no solo al primero).
+Con ella, filtrar por distancia_max, ordenar por cercanía y elegir el campus
+más cercano de una universidad son búsquedas por índice en vez de cálculos
+por petición.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, literal, update, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.propiedad import Propiedad, DistanciaPropiedadCampus
+from app.utils.geo import calcular_distancia, calcular_distancias, distancia_sql, dentro_de_caja_sql
+from app.utils.universidades import UNIVERSIDADES_PUEBLA, ALIAS_UNIVERSIDADES
+
+# Más allá de este radio no se guardan distancias (nadie busca a 50 km del campus)
+RADIO_MAXIMO_KM = 50.0
+
+
+class Campus(NamedTuple):
+    """Un campus concreto de una universidad"""
+    id_universidad: int
+    indice_campus: int
+    nombre: str
+    lat: float
+    lng: float
+
+
+# Los alias (ej: UTM -> UTP) resuelven al id de la universidad principal,
+# así que no necesitan distancias propias
+CAMPUS_PUEBLA: List[Campus] = [
+    Campus(uni["id"], indice, campus["nombre"], campus["lat"], campus["lng"])
+    for uni in UNIVERSIDADES_PUEBLA
+    if uni["nombre"] not in ALIAS_UNIVERSIDADES
+    for indice, campus in enumerate(uni["campus"])
+]
+
+CAMPUS_LATS = np.array([campus.lat for campus in CAMPUS_PUEBLA], dtype=np.float64)
+CAMPUS_LNGS = np.array([campus.lng for campus in CAMPUS_PUEBLA], dtype=np.float64)
+
+CAMPUS_POR_UNIVERSIDAD: Dict[int, List[Campus]] = {}
+for _campus in CAMPUS_PUEBLA:
+    CAMPUS_POR_UNIVERSIDAD.setdefault(_campus.id_universidad, []).append(_campus)
+
+
+def campus_mas_cercano(id_universidad: int, lat: float, lng: float) -> Optional[Tuple[Campus, float]]:
+    """
+    Campus de la universidad más cercano al punto y su distancia en km
+    """
+    mejor = None
+    for campus in CAMPUS_POR_UNIVERSIDAD.get(id_universidad, []):
+        distancia = calcular_distancia(campus.lat, campus.lng, lat, lng)
+        if mejor is None or distancia < mejor[1]:
+            mejor = (campus, distancia)
+    return mejor
+
+
+def recalcular_distancias_propiedad(db: Session, propiedad: Propiedad):
+    """
+    Recalcula las distancias de una propiedad a todos los campus.
+    Llamar cuando se crea la propiedad o cambian latitud/longitud.
+    No hace commit: se guarda en la misma transacción que la propiedad.
+    """
+    db.flush()
+    db.query(DistanciaPropiedadCampus).filter(
+        DistanciaPropiedadCampus.id_propiedad == propiedad.id_propiedad
+    ).delete(synchronize_session=False)
+
+    if propiedad.latitud is None or propiedad.longitud is None:
+        return
+
+    distancias = calcular_distancias(
+        CAMPUS_LATS,
+        CAMPUS_LNGS,
+        float(propiedad.latitud),
+        float(propiedad.longitud)
+    )
+
+    # Campus más cercano de cada universidad
+    mas_cercano: Dict[int, Tuple[int, float]] = {}
+    for campus, distancia in zip(CAMPUS_PUEBLA, distancias.tolist()):
+        actual = mas_cercano.get(campus.id_universidad)
+        if actual is None or distancia < actual[1]:
+            mas_cercano[campus.id_universidad] = (campus.indice_campus, distancia)
+
+    for campus, distancia in zip(CAMPUS_PUEBLA, distancias.tolist()):
+        if distancia <= RADIO_MAXIMO_KM:
+            db.add(DistanciaPropiedadCampus(
+                id_propiedad=propiedad.id_propiedad,
+                id_universidad=campus.id_universidad,
+                indice_campus=campus.indice_campus,
+                distancia_km=distancia,
+                es_mas_cercano=mas_cercano[campus.id_universidad][0] == campus.indice_campus
+            ))
+
+
+def recalcular_todas_las_distancias(db: Session):
+    """
+    Reconstruye la tabla completa (carga inicial o cuando cambia la lista
+    de campus). Un INSERT ... SELECT por campus, calculado en la BD.
+    """
+    db.query(DistanciaPropiedadCampus).delete(synchronize_session=False)
+
+    for campus in CAMPUS_PUEBLA:
+        distancia = distancia_sql(Propiedad.latitud, Propiedad.longitud, campus.lat, campus.lng)
+        seleccion = select(
+            Propiedad.id_propiedad,
+            literal(campus.id_universidad),
+            literal(campus.indice_campus),
+            distancia
+        ).where(
+            dentro_de_caja_sql(Propiedad.latitud, Propiedad.longitud, campus.lat, campus.lng, RADIO_MAXIMO_KM),
+            distancia <= RADIO_MAXIMO_KM
+        )
+        db.execute(
+            DistanciaPropiedadCampus.__table__.insert().from_select(
+                ["id_propiedad", "id_universidad", "indice_campus", "distancia_km"],
+                seleccion
+            )
+        )
+
+    # Marcar el campus más cercano de cada (propiedad, universidad)
+    mas_cercanos = select(
+        DistanciaPropiedadCampus.id_propiedad,
+        DistanciaPropiedadCampus.id_universidad,
+        DistanciaPropiedadCampus.indice_campus
+    ).distinct(
+        DistanciaPropiedadCampus.id_propiedad,
+        DistanciaPropiedadCampus.id_universidad
+    ).order_by(
+        DistanciaPropiedadCampus.id_propiedad,
+        DistanciaPropiedadCampus.id_universidad,
+        DistanciaPropiedadCampus.distancia_km
+    )
+    db.execute(
+        update(DistanciaPropiedadCampus).where(
+            tuple_(
+                DistanciaPropiedadCampus.id_propiedad,
+                DistanciaPropiedadCampus.id_universidad,
+                DistanciaPropiedadCampus.indice_campus
+            ).in_(mas_cercanos)
+        ).values(es_mas_cercano=True)
+    )
+
+
+def subconsulta_distancias_universidad(id_universidad: int, distancia_max: float):
+    """
+    Subconsulta (id_propiedad, indice_campus, distancia) con la distancia al
+    campus más cercano de la universidad, solo para propiedades dentro de
+    distancia_max. Usa el índice parcial (id_universidad, distancia_km, id_propiedad).
+    """
+    return select(
+        DistanciaPropiedadCampus.id_propiedad,
+        DistanciaPropiedadCampus.indice_campus,
+        DistanciaPropiedadCampus.distancia_km.label("distancia")
+    ).where(
+        DistanciaPropiedadCampus.es_mas_cercano == True,
+        DistanciaPropiedadCampus.id_universidad == id_universidad,
+        DistanciaPropiedadCampus.distancia_km <= distancia_max
+    ).subquery()
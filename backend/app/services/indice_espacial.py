@@ -0,0 +1,218 @@
+"""
+Índice espacial en memoria de las propiedades disponibles
+
+Divide el mapa en celdas de tamaño fijo (cuadrícula) y guarda en cada celda
+las propiedades que caen en ella. Las búsquedas por radio solo revisan las
+celdas alrededor del punto, así que su costo depende de cuántas propiedades
+hay cerca y no del tamaño total de la tabla.
+
+El índice solo guarda tuplas ligeras (id, lat, lng, precio, tipo) y devuelve
+ids; las filas completas se cargan después en una sola consulta.
+
+Cada worker tiene su propia copia. Los cambios que atiende un worker se
+aplican al momento (actualizar/eliminar); los de otros workers o procesos se
+detectan comparando cada REVISION_SEGUNDOS una huella de la tabla (número de
+filas y última fecha_actualizacion), y si cambió se reconstruye el índice.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.propiedad import Propiedad
+from app.utils.geo import calcular_distancias, caja_delimitadora
+
+# ~1.1 km por celda en latitud; suficiente para búsquedas de 1-10 km
+TAMANIO_CELDA_GRADOS = 0.01
+
+# Cada cuánto se revisa si otro worker cambió las propiedades
+REVISION_SEGUNDOS = 10.0
+
+
+class EntradaIndice(NamedTuple):
+    """Datos mínimos de una propiedad dentro del índice"""
+    id_propiedad: UUID
+    lat: float
+    lng: float
+    precio: float
+    tipo: str
+
+
+class IndiceEspacial:
+    """
+    Índice de cuadrícula (grid) thread-safe sobre propiedades disponibles
+    """
+
+    def __init__(self, tamanio_celda: float = TAMANIO_CELDA_GRADOS):
+        self.tamanio_celda = tamanio_celda
+        self.construido = False
+        self._celdas: Dict[Tuple[int, int], Dict[UUID, EntradaIndice]] = {}
+        self._entradas: Dict[UUID, EntradaIndice] = {}
+        self._lock = threading.RLock()
+        # Huella de la tabla al construir y cuándo volver a compararla; la
+        # revisión tiene su propio lock para no frenar las búsquedas
+        self._huella: Optional[tuple] = None
+        self._revisar_en = 0.0
+        self._lock_revision = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    # ------------------------------------------------------------------
+    # Construcción y mantenimiento
+    # ------------------------------------------------------------------
+
+    def _celda(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.tamanio_celda), math.floor(lng / self.tamanio_celda))
+
+    @staticmethod
+    def _huella_tabla(db: Session) -> tuple:
+        """Cambia con cualquier alta, baja o edición de una propiedad"""
+        return tuple(db.query(func.count(Propiedad.id_propiedad), func.max(Propiedad.fecha_actualizacion)).one())
+
+    def construir(self, db: Session):
+        """
+        (Re)construye el índice completo con las propiedades disponibles
+        """
+        # La huella se toma antes de leer: un cambio intermedio se detecta
+        # en la siguiente revisión
+        huella = self._huella_tabla(db)
+        filas = db.query(
+            Propiedad.id_propiedad,
+            Propiedad.latitud,
+            Propiedad.longitud,
+            Propiedad.precio_mensual,
+            Propiedad.tipo_propiedad
+        ).filter(
+            Propiedad.disponible == True,
+            Propiedad.activa == True,
+            Propiedad.latitud.isnot(None),
+            Propiedad.longitud.isnot(None)
+        ).all()
+
+        with self._lock:
+            self._celdas = {}
+            self._entradas = {}
+            for id_propiedad, lat, lng, precio, tipo in filas:
+                self._insertar(EntradaIndice(id_propiedad, float(lat), float(lng), float(precio), tipo))
+            self._huella = huella
+            self._revisar_en = time.monotonic() + REVISION_SEGUNDOS
+            self.construido = True
+
+    def asegurar_vigente(self, db: Session):
+        """
+        Construye el índice la primera vez que se necesita y lo reconstruye
+        si la tabla cambió desde entonces (ej: otro worker editó una propiedad)
+        """
+        if self.construido and time.monotonic() < self._revisar_en:
+            return
+        with self._lock_revision:
+            if self.construido and time.monotonic() < self._revisar_en:
+                return
+            if self.construido and self._huella_tabla(db) == self._huella:
+                self._revisar_en = time.monotonic() + REVISION_SEGUNDOS
+                return
+            self.construir(db)
+
+    def _insertar(self, entrada: EntradaIndice):
+        self._entradas[entrada.id_propiedad] = entrada
+        self._celdas.setdefault(self._celda(entrada.lat, entrada.lng), {})[entrada.id_propiedad] = entrada
+
+    def eliminar(self, id_propiedad: UUID):
+        """Quita una propiedad del índice (si estaba)"""
+        with self._lock:
+            entrada = self._entradas.pop(id_propiedad, None)
+            if entrada is None:
+                return
+            celda = self._celda(entrada.lat, entrada.lng)
+            bucket = self._celdas.get(celda)
+            if bucket is not None:
+                bucket.pop(id_propiedad, None)
+                if not bucket:
+                    del self._celdas[celda]
+
+    def actualizar(self, propiedad: Propiedad):
+        """
+        Sincroniza una propiedad después de crearla o editarla.
+        Si deja de estar disponible o no tiene coordenadas, se elimina del índice.
+        """
+        with self._lock:
+            self.eliminar(propiedad.id_propiedad)
+            if (propiedad.disponible and propiedad.activa
+                    and propiedad.latitud is not None and propiedad.longitud is not None):
+                self._insertar(EntradaIndice(
+                    propiedad.id_propiedad,
+                    float(propiedad.latitud),
+                    float(propiedad.longitud),
+                    float(propiedad.precio_mensual),
+                    propiedad.tipo_propiedad
+                ))
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _candidatos(self, lat: float, lng: float, radio_km: float) -> List[EntradaIndice]:
+        lat_min, lng_min, lat_max, lng_max = caja_delimitadora(lat, lng, radio_km)
+        fila_min, col_min = self._celda(lat_min, lng_min)
+        fila_max, col_max = self._celda(lat_max, lng_max)
+
+        candidatos = []
+        num_celdas = (fila_max - fila_min + 1) * (col_max - col_min + 1)
+        if num_celdas > len(self._celdas):
+            # Radio muy grande: es más barato recorrer solo las celdas ocupadas
+            for (fila, col), bucket in self._celdas.items():
+                if fila_min <= fila <= fila_max and col_min <= col <= col_max:
+                    candidatos.extend(bucket.values())
+            return candidatos
+
+        for fila in range(fila_min, fila_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self._celdas.get((fila, col))
+                if bucket:
+                    candidatos.extend(bucket.values())
+        return candidatos
+
+    def buscar_radio(
+        self,
+        lat: float,
+        lng: float,
+        radio_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[UUID, float]]:
+        """
+        Propiedades a menos de radio_km del punto, ordenadas por distancia
+
+        Returns:
+            Lista de (id_propiedad, distancia_km)
+        """
+        with self._lock:
+            candidatos = self._candidatos(lat, lng, radio_km)
+
+        if not candidatos:
+            return []
+
+        # Distancias de todos los candidatos en una sola llamada vectorizada
+        distancias = calcular_distancias(
+            lat,
+            lng,
+            np.fromiter((e.lat for e in candidatos), dtype=np.float64, count=len(candidatos)),
+            np.fromiter((e.lng for e in candidatos), dtype=np.float64, count=len(candidatos))
+        )
+
+        dentro = np.flatnonzero(distancias <= radio_km)
+        orden = dentro[np.argsort(distancias[dentro], kind="stable")]
+        if limit is not None:
+            orden = orden[:limit]
+
+        return [(candidatos[i].id_propiedad, float(distancias[i])) for i in orden]
+
+
+# Instancia global usada por el router de propiedades
+indice_propiedades = IndiceEspacial()
@@ -0,0 +1,264 @@
+"""
+Índice de autocompletado en memoria (trie de prefijos + índice de trigramas)
+
+Se construye una sola vez con los textos de cada elemento (ej: siglas y
+nombre completo de cada universidad) y responde búsquedas sin recorrer el
+catálogo completo:
+
+    - Trie de prefijos por palabra: "benem aut" encuentra "Benemérita
+      Universidad Autónoma de Puebla" siguiendo solo los nodos de cada prefijo.
+    - Índice de trigramas: encuentra subcadenas ("ebla" -> "Puebla") y errores
+      de escritura ("anahuak" -> "Anáhuac") sin comparar contra todo.
+
+Todo el texto se normaliza sin acentos y en minúsculas, así que "anahuac"
+encuentra "ANÁHUAC". Los resultados vienen ordenados por relevancia.
+
+No depende del origen de los datos: sirve igual para la lista de Puebla que
+para un catálogo nacional cargado desde un archivo.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Similitud mínima (0-1) entre trigramas para aceptar un error de escritura
+UMBRAL_SIMILITUD = 0.4
+
+# Niveles de relevancia (mayor es mejor)
+NIVEL_EXACTO = 4       # el texto principal es exactamente la búsqueda
+NIVEL_INICIO = 3       # el texto principal empieza con la búsqueda
+NIVEL_PREFIJOS = 2     # cada palabra buscada es prefijo de alguna palabra
+NIVEL_SUBCADENA = 1    # la búsqueda aparece dentro del texto
+NIVEL_PARECIDO = 0     # parecido por trigramas (errores de escritura)
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos y con un solo espacio entre palabras"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_acentos).strip()
+
+
+def trigramas(palabra: str) -> Set[str]:
+    """Trigramas de una palabra con relleno al inicio y al final (como pg_trgm)"""
+    relleno = f"  {palabra} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _trigramas_de_subcadena(tokens: List[str]) -> Set[str]:
+    """
+    Trigramas (con el relleno de trigramas()) que tiene por fuerza cualquier
+    texto que contenga los tokens como subcadena: los interiores de cada
+    token; si hay varios tokens, además el final del primero (termina una
+    palabra), el inicio del último (empieza una) y todos los de los de en
+    medio (son palabras completas).
+    """
+    requeridos = {token[i:i + 3] for token in tokens for i in range(len(token) - 2)}
+    if len(tokens) > 1:
+        primero, ultimo = tokens[0], tokens[-1]
+        if len(primero) >= 2:
+            requeridos.add(f"{primero[-2:]} ")
+        requeridos.add(f"  {ultimo[0]}")
+        if len(ultimo) >= 2:
+            requeridos.add(f" {ultimo[:2]}")
+        for token in tokens[1:-1]:
+            requeridos |= trigramas(token)
+    return requeridos
+
+
+class _Nodo:
+    """Nodo del trie: hijos por letra e ids de los elementos con ese prefijo"""
+    __slots__ = ("hijos", "ids")
+
+    def __init__(self):
+        self.hijos: Dict[str, "_Nodo"] = {}
+        self.ids: Set[int] = set()
+
+
+class IndiceAutocompletado:
+    """
+    Índice inmutable de autocompletado
+
+    Args:
+        elementos: pares (textos, resultado). El primer texto es el principal
+            (ej: las siglas); el resultado es lo que devuelve buscar().
+    """
+
+    def __init__(self, elementos: Iterable[Tuple[Sequence[str], Any]]):
+        self._resultados: List[Any] = []
+        self._principales: List[str] = []
+        self._textos: List[str] = []
+        self._raiz = _Nodo()
+        # Trigrama -> elementos que lo tienen (búsqueda por subcadena)
+        self._por_trigrama: Dict[str, Set[int]] = {}
+        # Vocabulario: cada palabra distinta una sola vez, con sus trigramas
+        # y sus elementos (búsqueda por parecido)
+        self._id_palabra: Dict[str, int] = {}
+        self._trigramas_palabra: List[Set[str]] = []
+        self._elementos_palabra: List[Set[int]] = []
+        self._palabras_por_trigrama: Dict[str, Set[int]] = {}
+
+        for id_elemento, (textos, resultado) in enumerate(elementos):
+            normalizados = [normalizar(texto) for texto in textos if texto]
+            palabras = sorted({palabra for texto in normalizados for palabra in texto.split()})
+
+            self._resultados.append(resultado)
+            self._principales.append(normalizados[0] if normalizados else "")
+            self._textos.append(" | ".join(normalizados))
+
+            for palabra in palabras:
+                self._insertar_prefijos(palabra, id_elemento)
+                id_palabra = self._registrar_palabra(palabra)
+                self._elementos_palabra[id_palabra].add(id_elemento)
+                for trigrama in self._trigramas_palabra[id_palabra]:
+                    self._por_trigrama.setdefault(trigrama, set()).add(id_elemento)
+
+        # Posición alfabética de cada elemento (desempate al ordenar por relevancia)
+        self._posicion: List[int] = [0] * len(self._textos)
+        for posicion, id_elemento in enumerate(sorted(range(len(self._textos)), key=self._textos.__getitem__)):
+            self._posicion[id_elemento] = posicion
+
+    def __len__(self) -> int:
+        return len(self._resultados)
+
+    def _registrar_palabra(self, palabra: str) -> int:
+        id_palabra = self._id_palabra.get(palabra)
+        if id_palabra is None:
+            id_palabra = len(self._trigramas_palabra)
+            self._id_palabra[palabra] = id_palabra
+            self._trigramas_palabra.append(trigramas(palabra))
+            self._elementos_palabra.append(set())
+            for trigrama in self._trigramas_palabra[id_palabra]:
+                self._palabras_por_trigrama.setdefault(trigrama, set()).add(id_palabra)
+        return id_palabra
+
+    def _insertar_prefijos(self, palabra: str, id_elemento: int):
+        nodo = self._raiz
+        for letra in palabra:
+            nodo = nodo.hijos.setdefault(letra, _Nodo())
+            nodo.ids.add(id_elemento)
+
+    def _con_prefijo(self, prefijo: str) -> Set[int]:
+        nodo = self._raiz
+        for letra in prefijo:
+            nodo = nodo.hijos.get(letra)
+            if nodo is None:
+                return set()
+        return nodo.ids
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def _por_subcadena(self, consulta: str, tokens: List[str]) -> Set[int]:
+        """
+        Elementos que pueden contener la búsqueda: tienen todos los trigramas
+        que cualquier texto que la contenga tiene (ver _trigramas_de_subcadena).
+        Los que solo comparten trigramas comunes (" un", "de ") no llegan a
+        compararse.
+        """
+        if len(consulta) < 3:
+            return set()
+        vacio: Set[int] = set()
+        resultado: Optional[Set[int]] = None
+        # De la lista más corta a la más larga: el resultado parcial solo se achica
+        for con_trigrama in sorted(
+            (self._por_trigrama.get(trigrama, vacio) for trigrama in _trigramas_de_subcadena(tokens)),
+            key=len
+        ):
+            resultado = set(con_trigrama) if resultado is None else resultado & con_trigrama
+            if not resultado:
+                break
+        return resultado or set()
+
+    def _parecidos_a_token(self, token: str) -> Dict[int, float]:
+        """
+        Elementos con alguna palabra parecida al token (Jaccard de trigramas
+        >= UMBRAL_SIMILITUD) y la mejor similitud de cada uno
+
+        Se compara contra el vocabulario, no contra cada elemento: una
+        palabra con similitud >= UMBRAL_SIMILITUD comparte al menos
+        `minimo` de los n trigramas del token, así que aparece en alguna de
+        las n - minimo + 1 listas más cortas, y solo esas palabras se miden.
+        """
+        del_token = trigramas(token)
+        vacio: Set[int] = set()
+        listas = sorted((self._palabras_por_trigrama.get(trigrama, vacio) for trigrama in del_token), key=len)
+        minimo = math.ceil(UMBRAL_SIMILITUD * len(del_token))
+
+        mejores: Dict[int, float] = {}
+        for id_palabra in set().union(*listas[:len(listas) - minimo + 1]):
+            de_palabra = self._trigramas_palabra[id_palabra]
+            comunes = len(del_token & de_palabra)
+            similitud = comunes / (len(del_token) + len(de_palabra) - comunes)
+            if similitud < UMBRAL_SIMILITUD:
+                continue
+            for id_elemento in self._elementos_palabra[id_palabra]:
+                if similitud > mejores.get(id_elemento, 0.0):
+                    mejores[id_elemento] = similitud
+        return mejores
+
+    def _parecidos(self, tokens: List[str]) -> Dict[int, float]:
+        """
+        Elementos parecidos a todos los tokens, con la similitud promedio
+        """
+        por_token = []
+        for token in tokens:
+            parecidos = self._parecidos_a_token(token)
+            if not parecidos:
+                return {}
+            por_token.append(parecidos)
+
+        comunes = set.intersection(*(set(parecidos) for parecidos in por_token))
+        return {
+            id_elemento: sum(parecidos[id_elemento] for parecidos in por_token) / len(por_token)
+            for id_elemento in comunes
+        }
+
+    def buscar(self, texto: str, limit: Optional[int] = None) -> List[Any]:
+        """
+        Elementos que coinciden con el texto, del más al menos relevante
+        """
+        consulta = normalizar(texto)
+        tokens = consulta.split()
+        if not tokens:
+            return []
+
+        niveles: Dict[int, Tuple[int, float]] = {}
+
+        # 1. Prefijos: cada palabra buscada debe ser prefijo de alguna palabra
+        coincidencias = set.intersection(*(self._con_prefijo(token) for token in tokens))
+        for id_elemento in coincidencias:
+            principal = self._principales[id_elemento]
+            if principal == consulta:
+                niveles[id_elemento] = (NIVEL_EXACTO, 1.0)
+            elif principal.startswith(consulta):
+                niveles[id_elemento] = (NIVEL_INICIO, 1.0)
+            else:
+                niveles[id_elemento] = (NIVEL_PREFIJOS, 1.0)
+
+        # 2. Subcadenas y errores de escritura, solo si los prefijos no
+        #    llenaron el límite (todos tienen menor relevancia)
+        if limit is None or len(niveles) < limit:
+            for id_elemento in self._por_subcadena(consulta, tokens):
+                if id_elemento not in niveles and consulta in self._textos[id_elemento]:
+                    niveles[id_elemento] = (NIVEL_SUBCADENA, 1.0)
+
+            for id_elemento, similitud in self._parecidos(tokens).items():
+                if id_elemento not in niveles:
+                    niveles[id_elemento] = (NIVEL_PARECIDO, similitud)
+
+        def relevancia(id_elemento: int):
+            nivel, similitud = niveles[id_elemento]
+            return (-nivel, -similitud, self._posicion[id_elemento])
+
+        if limit is None:
+            orden = sorted(niveles, key=relevancia)
+        else:
+            orden = heapq.nsmallest(limit, niveles, key=relevancia)
+
+        return [self._resultados[id_elemento] for id_elemento in orden]
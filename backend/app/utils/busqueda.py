@@ -0,0 +1,37 @@
+"""
+Utilidades de búsqueda de texto completo (full-text search) en propiedades
+
+La columna propiedades.busqueda (tsvector) la mantiene un trigger en la BD
+(ver migrations/006_busqueda_texto_propiedades.sql, o crear_busqueda_texto
+en app/models/propiedad.py si se creó con create_all) con titulo (peso A),
+colonia (peso B) y descripcion (peso C), usando la configuración
+es_sin_acentos: español con stemming y sin acentos, para que "habitacion"
+encuentre "Habitación" y "amueblados" encuentre "amueblado".
+"""
+
+from sqlalchemy import func
+
+# Configuración de texto (debe coincidir con la del trigger)
+CONFIG_BUSQUEDA = "es_sin_acentos"
+
+
+def consulta_texto(q: str):
+    """
+    Convierte el texto del usuario en un tsquery.
+    websearch_to_tsquery acepta texto libre ("amueblado cerca de CU",
+    "depa -compartido", "\"cerca de cu\"") sin errores de sintaxis.
+    """
+    return func.websearch_to_tsquery(CONFIG_BUSQUEDA, q)
+
+
+def coincide_sql(columna, consulta):
+    """Condición columna @@ consulta, resuelta con el índice GIN"""
+    return columna.op("@@")(consulta)
+
+
+def relevancia_sql(columna, consulta):
+    """
+    Relevancia de cada coincidencia (mayor es mejor); considera los pesos
+    A/B/C y qué tan juntas aparecen las palabras buscadas
+    """
+    return func.ts_rank_cd(columna, consulta)
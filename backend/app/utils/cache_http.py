@@ -0,0 +1,46 @@
+"""
+Respuestas HTTP precalculadas con ETag y Cache-Control
+
+Para datos que solo cambian al desplegar (ej: el catálogo de universidades),
+el JSON se serializa una sola vez a bytes junto con su ETag. Cada petición
+solo compara el header If-None-Match: si el cliente ya tiene esa versión se
+responde 304 sin cuerpo; si no, se envían los bytes ya listos.
+"""
+
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request, Response, status
+
+# El catálogo cambia solo con un despliegue; el ETag cubre el resto
+CACHE_CONTROL_CATALOGOS = "public, max-age=3600"
+
+
+class RespuestaPrecalculada:
+    """Cuerpo JSON serializado una vez, con ETag fuerte (hash del contenido)"""
+
+    def __init__(self, datos: Any, cache_control: str = CACHE_CONTROL_CATALOGOS):
+        # Mismo formato que JSONResponse de FastAPI
+        self.cuerpo = json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.cuerpo).hexdigest()[:32] + '"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def cliente_tiene_version(self, request: Request) -> bool:
+        """True si el If-None-Match del cliente incluye este ETag"""
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+
+        # If-None-Match usa comparación débil: se ignora el prefijo W/
+        etiquetas = (etiqueta.strip() for etiqueta in if_none_match.split(","))
+        return any(etiqueta.removeprefix("W/") == self.etag for etiqueta in etiquetas)
+
+    def responder(self, request: Request) -> Response:
+        """304 si el cliente ya tiene esta versión; si no, el JSON precalculado"""
+        if self.cliente_tiene_version(request):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers)
+
+        return Response(content=self.cuerpo, media_type="application/json", headers=self.headers)
@@ -2,63 +2,68 @@
 Dependencias reutilizables para los endpoints
 """
 
-from fastapi import Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import Depends, HTTPException, status, Header, WebSocket, WebSocketException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, get_async_db, AsyncSessionLocal
 from app.utils.security import decode_access_token
 from app.models.usuario import Usuario
+from app.services.cache_usuarios import cache_usuarios, usuario_desde_foto
 from uuid import UUID
 from typing import Optional
 
 
-def get_current_user(
-    authorization: str = Header(...),
-    db: Session = Depends(get_db)
-) -> Usuario:
-    """
-    Dependency para obtener el usuario actual desde el JWT token
-    
-    Args:
-        authorization: Header Authorization con formato "Bearer <token>"
-        db: Sesión de base de datos
-        
-    Returns:
-        Usuario: Usuario autenticado
-        
-    Raises:
-        HTTPException: Si el token es inválido o el usuario no existe
-    """
-    credentials_exception = HTTPException(
+# Los perfiles se cargan junto con el usuario en la misma consulta (joinedload):
+# se guardan en el caché, con AsyncSession no hay carga perezosa y
+# UsuarioResponse los incluye
+OPCIONES_USUARIO = (
+    joinedload(Usuario.perfil_estudiante),
+    joinedload(Usuario.perfil_arrendador),
+)
+
+
+def _credenciales_invalidas() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _id_usuario_desde_header(authorization: str) -> UUID:
+    """
+    Valida el header "Bearer <token>" y regresa el UUID del usuario (claim sub)
+
+    Raises:
+        HTTPException: 401 si el token es inválido
+    """
     # Extraer token del header Authorization
     if not authorization.startswith("Bearer "):
-        raise credentials_exception
+        raise _credenciales_invalidas()
     
     token = authorization.replace("Bearer ", "")
     
     # Decodificar token
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credenciales_invalidas()
     
     user_id: str = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        raise _credenciales_invalidas()
     
-    # Buscar usuario en la BD
     try:
         # Convertir a UUID
-        user_uuid = UUID(user_id)
+        return UUID(user_id)
     except (ValueError, TypeError):
-        raise credentials_exception
-    
-    user = db.query(Usuario).filter(Usuario.id_usuario == user_uuid).first()
+        raise _credenciales_invalidas()
+
+
+def _verificar_usuario(user: Optional[Usuario]) -> Usuario:
+    """401 si el usuario no existe, 403 si está inactivo"""
     if user is None:
-        raise credentials_exception
+        raise _credenciales_invalidas()
     
     if not user.activo:
         raise HTTPException(
@@ -69,6 +74,98 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    authorization: str = Header(...),
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """
+    Dependency para obtener el usuario actual desde el JWT token
+    
+    Args:
+        authorization: Header Authorization con formato "Bearer <token>"
+        db: Sesión de base de datos
+        
+    Returns:
+        Usuario: Usuario autenticado
+        
+    Raises:
+        HTTPException: Si el token es inválido o el usuario no existe
+    """
+    user_uuid = _id_usuario_desde_header(authorization)
+    
+    # Caché: sin consultas; merge(load=False) lo une a la sesión tal cual
+    foto = cache_usuarios.obtener(user_uuid)
+    if foto is not None:
+        return _verificar_usuario(db.merge(usuario_desde_foto(foto), load=False))
+    
+    # Buscar usuario en la BD
+    user = db.query(Usuario).options(*OPCIONES_USUARIO).filter(
+        Usuario.id_usuario == user_uuid
+    ).first()
+    if user is not None:
+        cache_usuarios.guardar(user)
+    return _verificar_usuario(user)
+
+
+async def get_current_user_async(
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_async_db)
+) -> Usuario:
+    """
+    Igual que get_current_user, para routers async def con AsyncSession
+    """
+    user_uuid = _id_usuario_desde_header(authorization)
+    
+    foto = cache_usuarios.obtener(user_uuid)
+    if foto is not None:
+        return _verificar_usuario(await db.merge(usuario_desde_foto(foto), load=False))
+    
+    # Buscar usuario en la BD
+    result = await db.execute(
+        select(Usuario).options(*OPCIONES_USUARIO).where(Usuario.id_usuario == user_uuid)
+    )
+    user = result.scalars().first()
+    if user is not None:
+        cache_usuarios.guardar(user)
+    return _verificar_usuario(user)
+
+
+async def get_current_user_websocket(websocket: WebSocket) -> Usuario:
+    """
+    Usuario autenticado en el handshake de un WebSocket
+
+    El token va en el header Authorization o, para navegadores (que no
+    pueden mandar headers al abrir un WebSocket), en ?token=. No usa
+    get_async_db: esa sesión (y su conexión del pool) quedaría tomada
+    mientras el socket siga abierto. Con un acierto del caché no toca la BD;
+    si no, abre una sesión solo para esta consulta.
+
+    Raises:
+        WebSocketException: 1008 si el token o el usuario no son válidos
+    """
+    authorization = websocket.headers.get("authorization")
+    if authorization is None and "token" in websocket.query_params:
+        authorization = f"Bearer {websocket.query_params['token']}"
+    
+    try:
+        user_uuid = _id_usuario_desde_header(authorization or "")
+        
+        foto = cache_usuarios.obtener(user_uuid)
+        if foto is not None:
+            return _verificar_usuario(usuario_desde_foto(foto))
+        
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Usuario).options(*OPCIONES_USUARIO).where(Usuario.id_usuario == user_uuid)
+            )
+            user = result.scalars().first()
+        if user is not None:
+            cache_usuarios.guardar(user)
+        return _verificar_usuario(user)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+
 def get_current_active_user(
     current_user: Usuario = Depends(get_current_user)
 ) -> Usuario:
@@ -108,4 +205,13 @@ def get_current_arrendador(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Se requiere perfil de arrendador"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+async def get_current_estudiante_async(
+    current_user: Usuario = Depends(get_current_user_async)
+) -> Usuario:
+    """
+    Verifica que el usuario actual sea un estudiante (versión async)
+    """
+    return get_current_estudiante(current_user)
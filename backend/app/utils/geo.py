@@ -0,0 +1,96 @@
+"""
+Utilidades geográficas: distancias y búsquedas por cercanía
+"""
+
+import math
+from typing import Tuple
+import numpy as np
+from sqlalchemy import func
+
+RADIO_TIERRA_KM = 6371
+KM_POR_GRADO_LATITUD = 111.32
+
+
+def calcular_distancia(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Calcula la distancia entre dos coordenadas usando la fórmula de Haversine
+    Retorna la distancia en kilómetros
+    """
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) * math.sin(dlon / 2))
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return RADIO_TIERRA_KM * c
+
+
+def calcular_distancias(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Versión vectorizada (NumPy) de calcular_distancia para lotes de coordenadas
+
+    Acepta escalares, listas o arrays (incluso de Decimal) y aplica broadcasting,
+    por ejemplo un punto contra N propiedades:
+        calcular_distancias(uni_lat, uni_lng, lats, lngs) -> array de N distancias
+
+    Retorna un array de distancias en kilómetros
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def caja_delimitadora(lat: float, lng: float, radio_km: float) -> Tuple[float, float, float, float]:
+    """
+    Calcula el rectángulo (lat_min, lng_min, lat_max, lng_max) que contiene
+    el círculo de radio_km alrededor del punto. Sirve como pre-filtro barato
+    (usa el índice) antes de calcular la distancia exacta.
+    """
+    delta_lat = radio_km / KM_POR_GRADO_LATITUD
+    delta_lng = radio_km / (KM_POR_GRADO_LATITUD * max(math.cos(math.radians(lat)), 1e-6))
+
+    return (lat - delta_lat, lng - delta_lng, lat + delta_lat, lng + delta_lng)
+
+
+def punto_sql(col_lat, col_lng):
+    """
+    Expresión point(lng, lat) de PostgreSQL.
+    Debe coincidir con la expresión del índice GiST ix_propiedades_ubicacion.
+    """
+    return func.point(col_lng, col_lat)
+
+
+def dentro_de_caja_sql(col_lat, col_lng, lat: float, lng: float, radio_km: float):
+    """
+    Condición SQL "el punto está dentro de la caja delimitadora" (operador <@),
+    resuelta con el índice GiST sobre point(longitud, latitud)
+    """
+    lat_min, lng_min, lat_max, lng_max = caja_delimitadora(lat, lng, radio_km)
+    caja = func.box(func.point(lng_min, lat_min), func.point(lng_max, lat_max))
+
+    return punto_sql(col_lat, col_lng).op("<@")(caja)
+
+
+def distancia_sql(col_lat, col_lng, lat: float, lng: float):
+    """
+    Expresión SQL con la distancia Haversine (en km) entre las columnas
+    de coordenadas y un punto fijo
+    """
+    dlat = func.radians(col_lat - lat)
+    dlng = func.radians(col_lng - lng)
+
+    a = (func.power(func.sin(dlat / 2), 2) +
+         math.cos(math.radians(lat)) * func.cos(func.radians(col_lat)) *
+         func.power(func.sin(dlng / 2), 2))
+
+    # least() evita errores de dominio en asin por redondeo de punto flotante
+    return 2 * RADIO_TIERRA_KM * func.asin(func.least(1.0, func.sqrt(a)))
@@ -0,0 +1,52 @@
+"""
+Paginación por cursor (keyset) para listados
+
+En lugar de OFFSET, cada página devuelve un cursor opaco con los valores de
+ordenamiento de su última fila, por ejemplo (precio_mensual, id_propiedad).
+La siguiente página pide "filas después de esos valores", que se resuelve con
+un índice compuesto: la página 500 cuesta lo mismo que la página 1 y no se
+duplican ni saltan filas cuando se insertan propiedades nuevas.
+"""
+
+import base64
+import json
+from decimal import Decimal
+from typing import Any, Callable, List, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+# Header donde se devuelve el cursor de la siguiente página
+HEADER_SIGUIENTE_CURSOR = "X-Siguiente-Cursor"
+
+
+def codificar_cursor(orden: str, valores: Sequence[Any]) -> str:
+    """
+    Codifica el tipo de orden y los valores de la última fila en un string opaco
+    """
+    serializables = [str(v) if isinstance(v, (UUID, Decimal)) else v for v in valores]
+    datos = json.dumps([orden, serializables], separators=(",", ":"))
+
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, orden: str, tipos: Sequence[Callable]) -> List[Any]:
+    """
+    Decodifica un cursor y convierte cada valor con su tipo (ej: Decimal, UUID)
+
+    Raises:
+        HTTPException: Si el cursor está malformado o es de otro tipo de orden
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        orden_cursor, valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+
+        if orden_cursor != orden or len(valores) != len(tipos):
+            raise ValueError("Cursor de otro listado")
+
+        return [tipo(valor) for tipo, valor in zip(tipos, valores)]
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
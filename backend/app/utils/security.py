@@ -2,14 +2,141 @@
 Utilidades de seguridad: hash de passwords y JWT tokens
 """
 
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, Tuple, TypeVar
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import settings
 
-# Configuración para hash de passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Configuración para hash de passwords. min_rounds = max_rounds = BCRYPT_ROUNDS:
+# un hash con otro costo se marca para actualizar (ver verify_and_update_password)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+T = TypeVar("T")
+
+
+# ============================================================================
+# POOL DE HASHING (bcrypt)
+# ============================================================================
+
+class PoolHashing:
+    """
+    Hilos dedicados a bcrypt (100-300 ms de CPU por llamada; la librería
+    bcrypt suelta el GIL mientras calcula).
+
+    A lo más `hilos` hashes corren a la vez, así que una ola de logins no
+    acapara el CPU ni los hilos del servidor. Las peticiones que no caben
+    esperan en la cola hasta `max_pendientes`; pasado ese límite se responde
+    503 con Retry-After de inmediato en lugar de acumular esperas.
+    """
+
+    def __init__(self, hilos: int, max_pendientes: int):
+        self.hilos = hilos
+        self.max_pendientes = max_pendientes
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="bcrypt")
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._lock = threading.Lock()
+        self.pendientes = 0
+        self.en_ejecucion = 0
+        self.completadas = 0
+        self.rechazadas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.calculo_total = 0.0
+
+    def _encolar(self, funcion: Callable[..., T], *args) -> Future:
+        """Envía funcion(*args) al pool, o 503 si ya hay max_pendientes"""
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self.rechazadas += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intenta de nuevo en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+
+        encolada = time.perf_counter()
+        with self._lock:
+            self.pendientes += 1
+
+        def tarea():
+            inicio = time.perf_counter()
+            with self._lock:
+                self.pendientes -= 1
+                self.en_ejecucion += 1
+                espera = inicio - encolada
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+            try:
+                return funcion(*args)
+            finally:
+                with self._lock:
+                    self.en_ejecucion -= 1
+                    self.completadas += 1
+                    self.calculo_total += time.perf_counter() - inicio
+
+        def liberar(futuro: Future):
+            # También si se canceló antes de empezar (el cliente se desconectó)
+            if futuro.cancelled():
+                with self._lock:
+                    self.pendientes -= 1
+            self._cupos.release()
+
+        futuro = self._executor.submit(tarea)
+        futuro.add_done_callback(liberar)
+        return futuro
+
+    async def ejecutar_async(self, funcion: Callable[..., T], *args) -> T:
+        """
+        Corre funcion(*args) en el pool y espera su resultado sin bloquear:
+        mientras espera turno no ocupa ningún hilo del threadpool de
+        Starlette, que queda libre para los endpoints y dependencias sync.
+        Usar desde endpoints async def (login, registro).
+        """
+        return await asyncio.wrap_future(self._encolar(funcion, *args))
+
+    def ejecutar(self, funcion: Callable[..., T], *args) -> T:
+        """
+        Versión bloqueante para código sync (ej: scripts, usuario_service):
+        el hilo que llama queda tomado hasta que termina el hash. No usar
+        desde endpoints def, cuyo hilo es del threadpool de Starlette.
+        """
+        return self._encolar(funcion, *args).result()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "hilos": self.hilos,
+                "max_pendientes": self.max_pendientes,
+                "en_cola": self.pendientes,
+                "en_ejecucion": self.en_ejecucion,
+                "completadas": self.completadas,
+                "rechazadas": self.rechazadas,
+                "espera_promedio_ms": round(self.espera_total / self.completadas * 1000, 3) if self.completadas else 0.0,
+                "espera_maxima_ms": round(self.espera_maxima * 1000, 3),
+                "calculo_promedio_ms": round(self.calculo_total / self.completadas * 1000, 3) if self.completadas else 0.0,
+                "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            }
+
+
+pool_hashing = PoolHashing(
+    settings.PASSWORD_HASH_THREADS or os.cpu_count() or 1,
+    settings.PASSWORD_HASH_MAX_PENDING
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -23,7 +150,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True si coinciden, False si no
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return pool_hashing.ejecutar(pwd_context.verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash usa otro costo (BCRYPT_ROUNDS cambió)
+    o un esquema obsoleto, regresa también el hash nuevo para guardarlo
+    
+    Returns:
+        (coincide, hash_nuevo o None si no hace falta actualizar)
+    """
+    return pool_hashing.ejecutar(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -36,7 +174,17 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: Hash de la contraseña
     """
-    return pwd_context.hash(password)
+    return pool_hashing.ejecutar(pwd_context.hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Igual que verify_and_update_password, para endpoints async def"""
+    return await pool_hashing.ejecutar_async(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Igual que get_password_hash, para endpoints async def"""
+    return await pool_hashing.ejecutar_async(pwd_context.hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -63,18 +211,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+class CacheTokens:
+    """
+    Tokens ya verificados -> claims, hasta su exp.
+
+    Un cliente manda el mismo token en cada petición durante toda su vida;
+    la firma se verifica una vez y las siguientes peticiones solo calculan un
+    SHA-256. La llave es el digest (no se guardan los tokens). LRU acotado:
+    al llenarse se descartan primero los vencidos y luego los menos usados.
+    Solo se guardan tokens válidos y con exp.
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._claims: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+    @staticmethod
+    def llave(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def obtener(self, llave: bytes) -> Optional[dict]:
+        with self._lock:
+            entrada = self._claims.get(llave)
+            if entrada is None:
+                return None
+            if entrada[0] <= time.time():
+                del self._claims[llave]
+                return None
+            self._claims.move_to_end(llave)
+        # Copia: quien llama puede modificar el dict sin afectar al caché
+        return dict(entrada[1])
+
+    def guardar(self, llave: bytes, payload: dict):
+        exp = payload.get("exp")
+        if self.maximo <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._claims[llave] = (float(exp), dict(payload))
+            self._claims.move_to_end(llave)
+            if len(self._claims) > self.maximo:
+                self._descartar_vencidos()
+            while len(self._claims) > self.maximo:
+                self._claims.popitem(last=False)
+
+    def _descartar_vencidos(self):
+        ahora = time.time()
+        for llave in [llave for llave, (exp, _) in self._claims.items() if exp <= ahora]:
+            del self._claims[llave]
+
+    def limpiar(self):
+        with self._lock:
+            self._claims.clear()
+
+
+cache_tokens = CacheTokens(settings.JWT_CACHE_MAX_ENTRIES)
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """
     Decodifica y verifica un JWT token
     
+    Los tokens ya verificados salen de cache_tokens mientras no venzan.
+    
     Args:
         token: JWT token a decodificar
         
     Returns:
         dict: Datos del token si es válido, None si no
     """
+    llave = CacheTokens.llave(token)
+    payload = cache_tokens.obtener(llave)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    
+    cache_tokens.guardar(llave, payload)
+    return payload
\ No newline at end of file
@@ -3,6 +3,12 @@ Base de datos de universidades en Puebla con sus coordenadas
 Este archivo se puede mantener y actualizar fácilmente
 """
 
+import json
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from app.utils.autocompletado import IndiceAutocompletado, normalizar
+
 UNIVERSIDADES_PUEBLA = [
     # Universidades Públicas
     {
@@ -191,42 +197,96 @@ def get_universidades_nombres():
     return sorted(nombres, key=lambda x: x["label"])
 
 
-def get_coordenadas_universidad(nombre: str):
+# Siglas alternativas que se refieren a la misma universidad (alias -> siglas principales)
+ALIAS_UNIVERSIDADES = {
+    "UTM": "UTP",
+    "UAP": "UDLAP",
+}
+
+
+def _coordenadas_congeladas(uni: dict) -> Mapping:
+    """Resultado inmutable de get_coordenadas_universidad para una universidad"""
+    campus = tuple(MappingProxyType(dict(c)) for c in uni["campus"])
+    return MappingProxyType({
+        "id": uni["id"],
+        "nombre": uni["nombre"],
+        "nombre_completo": uni["nombre_completo"],
+        "lat": campus[0]["lat"],
+        "lng": campus[0]["lng"],
+        "campus": campus
+    })
+
+
+def _construir_mapa_universidades():
     """
-    Obtiene las coordenadas de una universidad por nombre
-    Si tiene múltiples campus, retorna el principal (primer elemento)
+    Mapa de búsqueda O(1), construido una sola vez al importar: por
+    nombre/siglas, alias y nombre completo (normalizados)
     """
+    principales = {}
+    for uni in UNIVERSIDADES_PUEBLA:
+        principales[uni["nombre"]] = _coordenadas_congeladas(uni)
+
+    por_nombre = {}
     for uni in UNIVERSIDADES_PUEBLA:
-        if uni["nombre"].upper() == nombre.upper():
-            # Retornar el primer campus (principal)
-            campus_principal = uni["campus"][0]
-            return {
-                "nombre": uni["nombre"],
-                "nombre_completo": uni["nombre_completo"],
-                "lat": campus_principal["lat"],
-                "lng": campus_principal["lng"],
-                "campus": uni["campus"]
-            }
-    return None
-
-
-def buscar_universidades(query: str):
+        # Un alias resuelve a la universidad principal (mismo id y campus)
+        resultado = principales[ALIAS_UNIVERSIDADES.get(uni["nombre"], uni["nombre"])]
+        por_nombre[normalizar(uni["nombre"])] = resultado
+        por_nombre[normalizar(uni["nombre_completo"])] = resultado
+
+    return MappingProxyType(por_nombre)
+
+
+_UNIVERSIDADES_POR_NOMBRE = _construir_mapa_universidades()
+
+
+def get_coordenadas_universidad(nombre: str) -> Optional[Mapping]:
+    """
+    Obtiene las coordenadas de una universidad por siglas, alias o nombre completo
+    (sin importar mayúsculas ni acentos). "lat"/"lng" son las del campus
+    principal (primer elemento); "campus" trae todos.
+
+    El resultado es de solo lectura y se comparte entre peticiones.
+    """
+    if not nombre:
+        return None
+    return _UNIVERSIDADES_POR_NOMBRE.get(normalizar(nombre))
+
+
+def construir_indice_universidades(universidades: list) -> IndiceAutocompletado:
+    """
+    Índice de autocompletado (siglas y nombre completo) para un catálogo de
+    universidades con el formato de UNIVERSIDADES_PUEBLA
+    """
+    return IndiceAutocompletado(
+        (
+            (uni["nombre"], uni["nombre_completo"]),
+            {"value": uni["nombre"], "label": uni["nombre_completo"], "tipo": uni["tipo"]}
+        )
+        for uni in universidades
+    )
+
+
+def cargar_catalogo_universidades(ruta: str) -> list:
+    """
+    Carga un catálogo de universidades desde un archivo JSON (lista de
+    universidades con el formato de UNIVERSIDADES_PUEBLA), por ejemplo para
+    un catálogo nacional: construir_indice_universidades(cargar_catalogo_universidades(ruta))
+    """
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+# Se construye una sola vez al importar el módulo
+INDICE_UNIVERSIDADES = construir_indice_universidades(UNIVERSIDADES_PUEBLA)
+
+
+def buscar_universidades(query: str, limit: Optional[int] = None):
     """
     Busca universidades por nombre (para autocomplete)
+    Sin acentos ni mayúsculas, por prefijo de palabra, subcadena o con
+    errores de escritura; ordenadas por relevancia
     """
-    query_lower = query.lower()
-    resultados = []
-    
-    for uni in UNIVERSIDADES_PUEBLA:
-        if (query_lower in uni["nombre"].lower() or 
-            query_lower in uni["nombre_completo"].lower()):
-            resultados.append({
-                "value": uni["nombre"],
-                "label": uni["nombre_completo"],
-                "tipo": uni["tipo"]
-            })
-    
-    return resultados
+    return INDICE_UNIVERSIDADES.buscar(query, limit=limit)
 
 
 # Para agregar fácilmente nuevas universidades, solo necesitas:
@@ -0,0 +1,27 @@
+"""
+Vistas de los listados de propiedades (GET /propiedades, /propiedades/cercanas,
+/favoritos)
+
+    - completa: PropiedadResponse con características y todas las fotos
+    - tarjeta: solo título, tipo, precio, colonia y foto principal (grid de la app)
+"""
+
+from app.models.propiedad import Propiedad, CAMPOS_TARJETA
+from app.schemas.propiedad import PropiedadResponse
+
+# Valores aceptados en el parámetro ?vista=
+PATRON_VISTA = "^(completa|tarjeta)$"
+
+
+def serializar_propiedad(fila, vista: str = "completa") -> dict:
+    """
+    Convierte una fila de un listado en el dict de respuesta de la vista pedida
+
+    Para "tarjeta" la fila viene de columnas_tarjeta() y se copia tal cual
+    (sin Pydantic); para "completa" la fila es (o empieza con) un Propiedad.
+    """
+    if vista == "tarjeta":
+        return {campo: fila._mapping[campo] for campo in CAMPOS_TARJETA}
+
+    propiedad = fila if isinstance(fila, Propiedad) else fila[0]
+    return PropiedadResponse.model_validate(propiedad).model_dump()
@@ -0,0 +1,69 @@
+"""
+BENCHMARK - Costo de autenticación por petición (verificar el JWT)
+
+Compara, para el mismo token enviado en cada petición:
+    - jose: jwt.decode completo (firma + claims), como se hacía siempre
+    - caché: decode_access_token con el token ya verificado (SHA-256 + dict)
+    - header: lo que hace get_current_user antes de ir a la BD
+      (_id_usuario_desde_header), sin caché y con caché
+
+Usa la SECRET_KEY/ALGORITHM de la configuración; no toca la BD.
+
+Uso:
+    python benchmark_auth.py
+"""
+
+import time
+import uuid
+
+from jose import jwt
+
+from app.config import settings
+from app.utils.security import create_access_token, decode_access_token, cache_tokens
+from app.utils.dependencies import _id_usuario_desde_header
+
+LLAMADAS = 20_000
+
+
+def medir(funcion, repeticiones: int = 5) -> float:
+    """Mejor tiempo por llamada de varias repeticiones, en microsegundos"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(LLAMADAS):
+            funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / LLAMADAS * 1_000_000
+
+
+def main():
+    token = create_access_token({"sub": str(uuid.uuid4())})
+    authorization = f"Bearer {token}"
+
+    def sin_cache_header():
+        cache_tokens.limpiar()
+        _id_usuario_desde_header(authorization)
+
+    # Costo de limpiar el caché, para descontarlo de "header sin caché"
+    limpiar = medir(cache_tokens.limpiar)
+
+    jose = medir(lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]))
+    decode_access_token(token)
+    cacheado = medir(lambda: decode_access_token(token))
+    header_sin_cache = medir(sin_cache_header) - limpiar
+    decode_access_token(token)
+    header_con_cache = medir(lambda: _id_usuario_desde_header(authorization))
+
+    assert decode_access_token(token) == jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    print(f"{'camino':>28} | {'µs/petición':>11}")
+    print("-" * 43)
+    print(f"{'jose jwt.decode':>28} | {jose:>11.2f}")
+    print(f"{'decode_access_token (caché)':>28} | {cacheado:>11.2f}")
+    print(f"{'header sin caché':>28} | {header_sin_cache:>11.2f}")
+    print(f"{'header con caché':>28} | {header_con_cache:>11.2f}")
+    print(f"\nAceleración del header: {header_sin_cache / header_con_cache:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+BENCHMARK - Distancias Haversine escalar vs vectorizada (NumPy)
+
+Compara calcular_distancia (un llamado por propiedad, con conversión
+Decimal -> float en el ciclo, como se hacía en los routers) contra
+calcular_distancias (un solo llamado vectorizado para todo el lote).
+
+Uso:
+    python benchmark_distancias.py
+"""
+
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from app.utils.geo import calcular_distancia, calcular_distancias
+
+TAMANIOS = [10_000, 100_000, 1_000_000]
+UNI_LAT, UNI_LNG = 19.0022, -98.2066  # BUAP - Ciudad Universitaria
+
+
+def generar_propiedades(n: int, semilla: int = 42):
+    """Coordenadas aleatorias alrededor de Puebla, como Decimal (igual que la BD)"""
+    rnd = random.Random(semilla)
+    lats = [Decimal(f"{19.0 + rnd.uniform(-0.15, 0.15):.8f}") for _ in range(n)]
+    lngs = [Decimal(f"{-98.2 + rnd.uniform(-0.15, 0.15):.8f}") for _ in range(n)]
+    return lats, lngs
+
+
+def medir(funcion, repeticiones: int = 3) -> float:
+    """Mejor tiempo de varias repeticiones, en segundos"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    print(f"{'propiedades':>12} | {'escalar (s)':>12} | {'numpy (s)':>10} | "
+          f"{'numpy sin conv. (s)':>19} | {'aceleración':>11}")
+    print("-" * 78)
+
+    for n in TAMANIOS:
+        lats, lngs = generar_propiedades(n)
+
+        escalar = medir(lambda: [
+            calcular_distancia(UNI_LAT, UNI_LNG, float(lat), float(lng))
+            for lat, lng in zip(lats, lngs)
+        ], repeticiones=1 if n >= 1_000_000 else 3)
+
+        # Incluye la conversión Decimal -> float64 del lote
+        vectorizado = medir(lambda: calcular_distancias(UNI_LAT, UNI_LNG, lats, lngs))
+
+        # Solo el kernel, con los arrays ya en float64 (p. ej. índice en memoria)
+        lats_f = np.asarray(lats, dtype=np.float64)
+        lngs_f = np.asarray(lngs, dtype=np.float64)
+        kernel = medir(lambda: calcular_distancias(UNI_LAT, UNI_LNG, lats_f, lngs_f))
+
+        # Ambos caminos deben dar el mismo resultado
+        esperado = np.array([calcular_distancia(UNI_LAT, UNI_LNG, float(a), float(b))
+                             for a, b in zip(lats[:1000], lngs[:1000])])
+        assert np.allclose(calcular_distancias(UNI_LAT, UNI_LNG, lats_f[:1000], lngs_f[:1000]), esperado)
+
+        print(f"{n:>12,} | {escalar:>12.4f} | {vectorizado:>10.4f} | "
+              f"{kernel:>19.4f} | {escalar / kernel:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
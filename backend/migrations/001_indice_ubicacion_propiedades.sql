@@ -0,0 +1,6 @@
+-- Índice geográfico para búsquedas por cercanía a universidades
+-- Ejecutar una vez en bases de datos existentes (create_all lo crea en bases nuevas)
+
+CREATE INDEX IF NOT EXISTS ix_propiedades_ubicacion
+    ON propiedades
+    USING gist (point(longitud, latitud));
@@ -0,0 +1,13 @@
+-- Distancias precalculadas propiedad x campus
+-- Después de crear la tabla, llenarla con: python recalcular_distancias.py
+
+CREATE TABLE IF NOT EXISTS distancias_propiedad_campus (
+    id_propiedad   uuid NOT NULL REFERENCES propiedades(id_propiedad) ON DELETE CASCADE,
+    id_universidad integer NOT NULL,
+    indice_campus  integer NOT NULL,
+    distancia_km   double precision NOT NULL,
+    PRIMARY KEY (id_propiedad, id_universidad, indice_campus)
+);
+
+CREATE INDEX IF NOT EXISTS ix_distancias_universidad_distancia
+    ON distancias_propiedad_campus (id_universidad, distancia_km);
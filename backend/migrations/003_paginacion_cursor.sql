@@ -0,0 +1,16 @@
+-- Índices compuestos para la paginación por cursor de GET /propiedades
+-- Después de aplicar, volver a llenar las distancias con: python recalcular_distancias.py
+
+-- Orden por precio: (precio_mensual, id_propiedad)
+CREATE INDEX IF NOT EXISTS ix_propiedades_precio_id
+    ON propiedades (precio_mensual, id_propiedad);
+
+-- Orden por distancia: (distancia al campus más cercano, id_propiedad)
+ALTER TABLE distancias_propiedad_campus
+    ADD COLUMN IF NOT EXISTS es_mas_cercano boolean NOT NULL DEFAULT false;
+
+DROP INDEX IF EXISTS ix_distancias_universidad_distancia;
+
+CREATE INDEX IF NOT EXISTS ix_distancias_universidad_cercano
+    ON distancias_propiedad_campus (id_universidad, distancia_km, id_propiedad)
+    WHERE es_mas_cercano;
@@ -0,0 +1,5 @@
+-- Índice para la foto principal de la vista tarjeta (?vista=tarjeta)
+-- La subconsulta busca por id_propiedad y ordena por orden
+
+CREATE INDEX IF NOT EXISTS ix_fotos_propiedad_orden
+    ON fotos_propiedad (id_propiedad, orden);
@@ -0,0 +1,11 @@
+-- Índices parciales para los filtros de GET /propiedades
+-- (disponible=true, tipo, rango de precio; orden por precio_mensual, id_propiedad)
+-- Verificar los planes con: python test_planes_busqueda.py
+
+CREATE INDEX IF NOT EXISTS ix_propiedades_publicadas_precio
+    ON propiedades (precio_mensual, id_propiedad)
+    WHERE disponible AND activa;
+
+CREATE INDEX IF NOT EXISTS ix_propiedades_publicadas_tipo_precio
+    ON propiedades (tipo_propiedad, precio_mensual, id_propiedad)
+    WHERE disponible AND activa;
@@ -0,0 +1,40 @@
+-- Búsqueda de texto completo en propiedades (GET /propiedades?q=)
+-- Español con stemming y sin acentos; columna tsvector mantenida por trigger
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- Configuración "es_sin_acentos": copia de spanish que quita acentos antes del stemming
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_sin_acentos') THEN
+        CREATE TEXT SEARCH CONFIGURATION es_sin_acentos (COPY = pg_catalog.spanish);
+        ALTER TEXT SEARCH CONFIGURATION es_sin_acentos
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END
+$$;
+
+ALTER TABLE propiedades ADD COLUMN IF NOT EXISTS busqueda tsvector;
+
+-- titulo pesa más que colonia, y colonia más que descripcion
+CREATE OR REPLACE FUNCTION propiedades_actualizar_busqueda() RETURNS trigger AS $$
+BEGIN
+    NEW.busqueda :=
+        setweight(to_tsvector('es_sin_acentos', coalesce(NEW.titulo, '')), 'A') ||
+        setweight(to_tsvector('es_sin_acentos', coalesce(NEW.colonia, '')), 'B') ||
+        setweight(to_tsvector('es_sin_acentos', coalesce(NEW.descripcion, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_propiedades_busqueda ON propiedades;
+
+CREATE TRIGGER tr_propiedades_busqueda
+    BEFORE INSERT OR UPDATE OF titulo, colonia, descripcion ON propiedades
+    FOR EACH ROW EXECUTE FUNCTION propiedades_actualizar_busqueda();
+
+-- Llenar las propiedades existentes (dispara el trigger)
+UPDATE propiedades SET titulo = titulo;
+
+CREATE INDEX IF NOT EXISTS ix_propiedades_busqueda
+    ON propiedades USING gin (busqueda);
@@ -0,0 +1,20 @@
+-- Bitmask de amenidades en caracteristicas_propiedad (filtro ?amenidades= de GET /propiedades)
+-- El orden de los bits es el de AMENIDADES en app/models/propiedad.py
+
+ALTER TABLE caracteristicas_propiedad
+    ADD COLUMN IF NOT EXISTS amenidades integer NOT NULL DEFAULT 0;
+
+UPDATE caracteristicas_propiedad SET amenidades =
+      (coalesce(wifi, false)::int)
+    | (coalesce(agua_incluida, false)::int << 1)
+    | (coalesce(luz_incluida, false)::int << 2)
+    | (coalesce(gas_incluido, false)::int << 3)
+    | (coalesce(amueblado, false)::int << 4)
+    | (coalesce(cocina, false)::int << 5)
+    | (coalesce(lavadora, false)::int << 6)
+    | (coalesce(estacionamiento, false)::int << 7)
+    | (coalesce(mascotas_permitidas, false)::int << 8)
+    | (coalesce(banio_privado, false)::int << 9);
+
+CREATE INDEX IF NOT EXISTS ix_caracteristicas_amenidades
+    ON caracteristicas_propiedad (amenidades);
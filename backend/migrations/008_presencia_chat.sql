@@ -0,0 +1,14 @@
+-- Presencia del chat para CHAT_BACKPLANE=postgres (app/services/chat_backplane.py)
+-- Una fila por (usuario, nodo) con sockets abiertos. Cada nodo renueva "visto"
+-- periódicamente; las filas de un nodo caído dejan de contar al vencer y los
+-- nodos vivos las borran en su siguiente latido.
+-- UNLOGGED: es estado efímero, no necesita WAL ni sobrevivir a un reinicio.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS presencia_chat (
+    id_usuario text NOT NULL,
+    nodo text NOT NULL,
+    visto timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_usuario, nodo)
+);
+
+CREATE INDEX IF NOT EXISTS ix_presencia_chat_nodo ON presencia_chat (nodo);
@@ -0,0 +1,14 @@
+-- Índices para la lista de conversaciones (GET /mensajes/conversaciones)
+
+-- Último mensaje de cada par de usuarios (DISTINCT ON por el par ordenado)
+CREATE INDEX IF NOT EXISTS ix_mensajes_par_fecha
+    ON mensajes (least(id_remitente, id_destinatario), greatest(id_remitente, id_destinatario), fecha_envio);
+
+-- Mensajes enviados o recibidos por el usuario (id_remitente = X OR id_destinatario = X)
+CREATE INDEX IF NOT EXISTS ix_mensajes_remitente ON mensajes (id_remitente);
+CREATE INDEX IF NOT EXISTS ix_mensajes_destinatario ON mensajes (id_destinatario);
+
+-- No leídos por remitente
+CREATE INDEX IF NOT EXISTS ix_mensajes_no_leidos
+    ON mensajes (id_destinatario, id_remitente)
+    WHERE leido = false;
@@ -0,0 +1,7 @@
+-- Sin lista pendiente en el índice GIN de búsqueda de texto: cada búsqueda la
+-- recorre completa hasta que el autovacuum la vacía, y el planificador la
+-- cuenta como costo. Las propiedades se editan poco, así que insertar
+-- directo en el índice no encarece las escrituras.
+ALTER INDEX IF EXISTS ix_propiedades_busqueda SET (fastupdate = off);
+SELECT gin_clean_pending_list('ix_propiedades_busqueda'::regclass)
+WHERE to_regclass('ix_propiedades_busqueda') IS NOT NULL;
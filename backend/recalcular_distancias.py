@@ -0,0 +1,17 @@
+"""
+Script para (re)construir la tabla de distancias propiedad x campus
+Ejecutar después de crear la tabla o al agregar campus en universidades.py
+"""
+
+from app.database import SessionLocal
+import app.models  # noqa: F401 - registrar todos los modelos
+from app.services.distancias_campus import recalcular_todas_las_distancias
+
+print("Recalculando distancias propiedad x campus...")
+db = SessionLocal()
+try:
+    recalcular_todas_las_distancias(db)
+    db.commit()
+    print("¡Distancias recalculadas exitosamente!")
+finally:
+    db.close()
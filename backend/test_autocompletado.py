@@ -0,0 +1,142 @@
+"""
+PRUEBA DEL ÍNDICE DE AUTOCOMPLETADO - Catálogo grande
+
+Construye un catálogo sintético de NUM_UNIVERSIDADES universidades (del
+tamaño de un catálogo nacional) y verifica que IndiceAutocompletado:
+
+    - da los mismos resultados que revisar el catálogo completo (los
+      filtros de candidatos no pierden nada)
+    - en búsquedas con errores de escritura o subcadenas compara un número
+      de elementos proporcional a las coincidencias, no al catálogo
+      (trigramas comunes como " un" o "de " no arrastran todo)
+    - responde cada tecla en menos de MAXIMO_MS_POR_TECLA
+
+No usa la BD.
+
+Uso:
+    python test_autocompletado.py
+"""
+
+import random
+import sys
+import time
+from typing import Dict, List, Set
+
+from app.utils.autocompletado import IndiceAutocompletado, UMBRAL_SIMILITUD, normalizar, trigramas
+from app.utils.universidades import UNIVERSIDADES_PUEBLA, construir_indice_universidades
+
+NUM_UNIVERSIDADES = 5000
+LIMITE = 10
+MAXIMO_MS_POR_TECLA = 5.0
+REPETICIONES_POR_TECLA = 3
+# Candidatos que se comparan en búsquedas sin prefijo: a lo más este
+# múltiplo de las coincidencias reales (más un margen fijo)
+MAXIMO_CANDIDATOS_POR_COINCIDENCIA = 5
+MARGEN_CANDIDATOS = 50
+
+TIPOS = ["Universidad", "Instituto", "Centro Universitario", "Escuela Superior", "Colegio"]
+AREAS = ["Tecnológico", "Autónoma", "Politécnica", "Pedagógica", "Intercultural", "de Estudios Superiores", "Popular", "Metropolitana"]
+CIUDADES = [
+    "Puebla", "Tlaxcala", "Veracruz", "Oaxaca", "Guadalajara", "Monterrey", "Querétaro", "Mérida", "Chihuahua",
+    "Hermosillo", "Culiacán", "Morelia", "Toluca", "Pachuca", "Cuernavaca", "Zacatecas", "Durango", "Saltillo",
+]
+
+BUSQUEDAS_SIN_PREFIJO = ["anahuak", "politecnika", "ebla", "tecnologiko de", "guadalajra", "ueretaro"]
+
+
+def catalogo_sintetico(cantidad: int) -> list:
+    rnd = random.Random(13)
+    silabas = ["ra", "to", "mi", "ca", "le", "zu", "no", "pa", "ti", "xo", "be", "du", "qui", "hua", "tzi"]
+    universidades = []
+    for id_universidad in range(1, cantidad + 1):
+        nombre_propio = "".join(rnd.choice(silabas) for _ in range(rnd.randint(2, 4))).capitalize()
+        nombre_completo = f"{rnd.choice(TIPOS)} {rnd.choice(AREAS)} {nombre_propio} de {rnd.choice(CIUDADES)}"
+        siglas = "".join(palabra[0] for palabra in nombre_completo.split() if palabra[0].isupper()) + str(id_universidad)
+        universidades.append({
+            "id": id_universidad, "nombre": siglas, "nombre_completo": nombre_completo, "tipo": "publica",
+        })
+    return universidades + list(UNIVERSIDADES_PUEBLA)
+
+
+class IndiceSinFiltro(IndiceAutocompletado):
+    """Referencia: revisa el catálogo completo, sin índices de trigramas"""
+
+    def _por_subcadena(self, consulta: str, tokens: List[str]) -> Set[int]:
+        return set(range(len(self))) if len(consulta) >= 3 else set()
+
+    def _parecidos(self, tokens: List[str]) -> Dict[int, float]:
+        parecidos = {}
+        for id_elemento, texto in enumerate(self._textos):
+            de_palabras = [trigramas(palabra) for palabra in set(texto.split()) if palabra != "|"]
+            similitudes = []
+            for token in tokens:
+                del_token = trigramas(token)
+                similitudes.append(max((len(del_token & t) / len(del_token | t) for t in de_palabras), default=0.0))
+            if min(similitudes) >= UMBRAL_SIMILITUD:
+                parecidos[id_elemento] = sum(similitudes) / len(similitudes)
+        return parecidos
+
+
+def comparten_trigrama(indice: IndiceAutocompletado, tokens: List[str]) -> int:
+    """Elementos que comparten algún trigrama con la búsqueda (lo que habría que comparar sin filtros)"""
+    return len(set().union(*(indice._por_trigrama.get(t, ()) for token in tokens for t in trigramas(token))))
+
+
+def test_autocompletado():
+    print(f"🔎 Verificando el autocompletado con {NUM_UNIVERSIDADES} universidades...")
+    universidades = catalogo_sintetico(NUM_UNIVERSIDADES)
+    indice = construir_indice_universidades(universidades)
+    referencia = IndiceSinFiltro(
+        ((uni["nombre"], uni["nombre_completo"]), uni["nombre"]) for uni in universidades
+    )
+    fallas = []
+
+    # 1. Mismos resultados que sin filtro de candidatos
+    busquedas = BUSQUEDAS_SIN_PREFIJO + ["anahuac", "BUAP", "universidad de", "benem aut", "udlap", "de puebla", "o de pu", "de la", "xyz"]
+    for busqueda in busquedas:
+        for limit in (None, LIMITE):
+            obtenidos = [r["value"] for r in indice.buscar(busqueda, limit=limit)]
+            esperados = referencia.buscar(busqueda, limit=limit)
+            if obtenidos != esperados:
+                fallas.append(f"resultados distintos para {busqueda!r} (limit={limit})")
+
+    # 2. Candidatos acotados cuando no hay coincidencia por prefijo
+    for busqueda in BUSQUEDAS_SIN_PREFIJO:
+        consulta = normalizar(busqueda)
+        tokens = consulta.split()
+        candidatos = len(indice._por_subcadena(consulta, tokens) | set(indice._parecidos(tokens)))
+        sin_filtro = comparten_trigrama(indice, tokens)
+        coincidencias = len(indice.buscar(busqueda))
+        maximo = MAXIMO_CANDIDATOS_POR_COINCIDENCIA * coincidencias + MARGEN_CANDIDATOS
+        estado = "✅" if candidatos <= maximo else "❌"
+        print(f"   {estado} {busqueda!r}: {candidatos} candidatos, {coincidencias} coincidencias (sin filtro: {sin_filtro})")
+        if candidatos > maximo:
+            fallas.append(f"{busqueda!r} compara {candidatos} elementos para {coincidencias} coincidencias")
+
+    # 3. Tiempo por tecla escribiendo búsquedas completas (mejor de
+    # REPETICIONES_POR_TECLA, para no medir una pausa del GC o del sistema)
+    peor = 0.0
+    indice.buscar("calentar", limit=LIMITE)
+    for busqueda in ["universidad de puebla", "instituto tecnologico", "anahuak", "politecnica de guadalajara"]:
+        for fin in range(1, len(busqueda) + 1):
+            tiempos = []
+            for _ in range(REPETICIONES_POR_TECLA):
+                inicio = time.perf_counter()
+                indice.buscar(busqueda[:fin], limit=LIMITE)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            peor = max(peor, min(tiempos))
+    estado = "✅" if peor <= MAXIMO_MS_POR_TECLA else "❌"
+    print(f"   {estado} peor tecla: {peor:.2f} ms")
+    if peor > MAXIMO_MS_POR_TECLA:
+        fallas.append(f"una tecla tardó {peor:.2f} ms")
+
+    assert not fallas, "\n❌ ".join(fallas)
+    print("\n🎉 El autocompletado escala con el catálogo")
+
+
+if __name__ == "__main__":
+    try:
+        test_autocompletado()
+    except AssertionError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
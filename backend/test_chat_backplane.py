@@ -0,0 +1,108 @@
+"""
+PRUEBA DEL BACKPLANE DEL CHAT - ConnectionManager sobre BackplaneMemoria
+
+Simula NUM_NODOS workers con un ConnectionManager cada uno, todos sobre el
+mismo BusMemoria, y verifica que:
+
+    - un mensaje llega a los sockets del destinatario en el nodo que lo
+      envía y en los demás nodos, una sola vez a cada socket
+    - el nodo que publica no recibe su propio mensaje de vuelta
+    - la presencia refleja los sockets abiertos en cualquier nodo, y se
+      pierde al cerrar el último o al detener el nodo
+
+No usa la BD ni la red: los sockets son objetos falsos que guardan lo que
+se les envía.
+
+Uso:
+    python test_chat_backplane.py
+"""
+
+import asyncio
+import sys
+
+from app.routers.mensajes import ConnectionManager
+from app.services.chat_backplane import BackplaneMemoria, BusMemoria
+
+NUM_NODOS = 3
+
+
+class SocketFalso:
+    """Lo mínimo de WebSocket que usan ConnectionManager y ConexionChat"""
+
+    def __init__(self):
+        self.recibidos = []
+        self.cerrado = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, mensaje: dict):
+        self.recibidos.append(mensaje)
+
+    async def close(self, code: int = 1000):
+        self.cerrado = True
+
+
+async def probar_backplane() -> list:
+    fallas = []
+
+    def verificar(condicion: bool, descripcion: str):
+        estado = "✅" if condicion else "❌"
+        print(f"   {estado} {descripcion}")
+        if not condicion:
+            fallas.append(descripcion)
+
+    bus = BusMemoria()
+    nodos = [ConnectionManager(BackplaneMemoria(bus)) for _ in range(NUM_NODOS)]
+    for nodo in nodos:
+        await nodo.iniciar()
+
+    # "ana" con dos dispositivos en nodos distintos, "beto" en el último
+    celular, laptop, socket_beto = SocketFalso(), SocketFalso(), SocketFalso()
+    await nodos[0].connect("ana", celular)
+    conexion_laptop = await nodos[1].connect("ana", laptop)
+    await nodos[2].connect("beto", socket_beto)
+
+    # 1. Entrega local y remota
+    await nodos[0].send_personal_message({"n": 1}, "ana")
+    await nodos[2].send_personal_message({"n": 2}, "ana")
+    await asyncio.sleep(0.05)  # que las tareas de envío vacíen las colas
+    verificar(celular.recibidos == [{"n": 1}, {"n": 2}], "el socket local y el remoto reciben cada mensaje una vez (celular)")
+    verificar(laptop.recibidos == [{"n": 1}, {"n": 2}], "el socket local y el remoto reciben cada mensaje una vez (laptop)")
+    verificar(socket_beto.recibidos == [], "quien envía no recibe el mensaje de otro usuario")
+
+    # 2. Presencia desde cualquier nodo
+    verificar(await nodos[2].en_linea("ana"), "ana aparece en línea desde un nodo sin sus sockets")
+    verificar(not await nodos[0].en_linea("carla"), "un usuario sin sockets no aparece en línea")
+
+    await nodos[0].disconnect(next(iter(nodos[0].active_connections["ana"])))
+    verificar(await nodos[0].en_linea("ana"), "ana sigue en línea mientras le quede un socket en otro nodo")
+    await nodos[1].disconnect(conexion_laptop)
+    verificar(not await nodos[2].en_linea("ana"), "ana deja de estar en línea al cerrar su último socket")
+
+    # 3. Un nodo que se detiene retira la presencia de sus usuarios
+    await nodos[2].detener()
+    verificar(not await nodos[0].en_linea("beto"), "detener un nodo retira la presencia de sus usuarios")
+    verificar(socket_beto.cerrado, "detener un nodo cierra sus sockets")
+    await nodos[0].send_personal_message({"n": 3}, "beto")
+    verificar(socket_beto.recibidos == [], "un nodo detenido ya no recibe publicaciones")
+
+    for nodo in nodos[:2]:
+        await nodo.detener()
+    verificar(not bus.suscriptores and not bus.presencia, "el bus queda vacío al detener todos los nodos")
+    return fallas
+
+
+def test_chat_backplane():
+    print(f"💬 Verificando el chat con {NUM_NODOS} nodos en memoria...")
+    fallas = asyncio.run(probar_backplane())
+    assert not fallas, "\n❌ ".join(fallas)
+    print("\n🎉 Los mensajes y la presencia cruzan entre nodos")
+
+
+if __name__ == "__main__":
+    try:
+        test_chat_backplane()
+    except AssertionError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,86 @@
+"""
+PRUEBA DE LECTURA TRAS ESCRITURA - Fijación al primario
+
+Verifica que un commit que escribió algo fija al usuario al primario
+(READ_AFTER_WRITE_SECONDS), también cuando la escritura es SQL en text()
+como en favoritos y calificaciones, y que un commit que solo leyó no lo
+fija.
+
+Corre contra la BD local (DATABASE_URL) dentro de una transacción que se
+revierte al final, sobre una tabla temporal: no deja datos. Usa fijaciones
+en memoria aunque haya REDIS_URL.
+
+Uso:
+    python test_lectura_tras_escritura.py
+"""
+
+import sys
+import uuid
+
+from sqlalchemy import text
+
+import app.database as database
+from app.database import FijacionesPrimario, SesionEnrutada, asociar_usuario, engine, es_escritura
+
+# (descripción, sentencias, debe fijar al usuario)
+CASOS = [
+    ("SELECT en text()", ["SELECT * FROM favoritos_prueba"], False),
+    ("INSERT en text()", ["INSERT INTO favoritos_prueba (id_usuario) VALUES (:id)"], True),
+    ("DELETE en text()", ["DELETE FROM favoritos_prueba WHERE id_usuario = :id"], True),
+    ("UPDATE en text()", ["  update favoritos_prueba SET id_usuario = :id"], True),
+    ("WITH ... DELETE en text()", [
+        "WITH viejos AS (SELECT id_usuario FROM favoritos_prueba) "
+        "DELETE FROM favoritos_prueba WHERE id_usuario IN (SELECT id_usuario FROM viejos)"
+    ], True),
+    ("SELECT ... FOR UPDATE en text()", ["SELECT * FROM favoritos_prueba FOR UPDATE"], False),
+]
+
+
+def test_lectura_tras_escritura():
+    print("🔁 Verificando la fijación al primario después de escribir...")
+
+    fijaciones_originales = database.fijaciones_primario
+    database.fijaciones_primario = FijacionesPrimario(60)
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    fallas = []
+
+    try:
+        conexion.execute(text("CREATE TEMP TABLE favoritos_prueba (id_usuario text)"))
+
+        for descripcion, sentencias, debe_fijar in CASOS:
+            id_usuario = str(uuid.uuid4())
+            # El commit de la sesión libera un savepoint: la transacción
+            # externa sigue abierta y se revierte al final
+            db = SesionEnrutada(bind=conexion, join_transaction_mode="create_savepoint")
+            asociar_usuario(db, id_usuario)
+            for sentencia in sentencias:
+                db.execute(text(sentencia), {"id": id_usuario})
+            db.commit()
+            db.close()
+
+            fijado = database.fijaciones_primario.activa(id_usuario)
+            estado = "✅" if fijado == debe_fijar else "❌"
+            print(f"   {estado} {descripcion}: {'fija' if fijado else 'no fija'} al usuario")
+            if fijado != debe_fijar:
+                fallas.append(descripcion)
+
+        # Un text() que escribe tampoco se manda a la réplica
+        for descripcion, sentencias, debe_fijar in CASOS:
+            if es_escritura(text(sentencias[0])) != debe_fijar:
+                fallas.append(f"{descripcion} (enrutamiento)")
+    finally:
+        transaccion.rollback()
+        conexion.close()
+        database.fijaciones_primario = fijaciones_originales
+
+    assert not fallas, f"{len(fallas)} caso(s) mal detectados: {', '.join(fallas)}"
+    print("\n🎉 Las escrituras en text() fijan al usuario al primario")
+
+
+if __name__ == "__main__":
+    try:
+        test_lectura_tras_escritura()
+    except AssertionError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+PRUEBA DE PLANES DE CONSULTA - Búsqueda de propiedades
+
+Siembra NUM_PROPIEDADES de prueba en la BD local (DATABASE_URL), ejecuta
+GET /propiedades con cada combinación de filtros y corre EXPLAIN sobre
+todas las consultas SQL que genera. Falla si alguna usa Seq Scan, es decir,
+si una forma de búsqueda se quedó sin índice. Con ese volumen (y ANALYZE)
+el planificador ya prefiere un índice siempre que exista uno aplicable.
+
+Los planes se revisan con random_page_cost = RANDOM_PAGE_COST_SSD (SET
+LOCAL, solo en la transacción de la prueba), el valor que se configura en
+la BD de producción (ver "Configuración de PostgreSQL" en el README).
+
+Todo corre dentro de una transacción que se revierte al final: no deja
+datos en la BD. Requiere las tablas e índices ya creados (migrations/).
+
+Uso:
+    python test_planes_busqueda.py
+"""
+
+import random
+import sys
+from decimal import Decimal
+
+from fastapi import Response
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+import app.models  # noqa: F401 - registrar todos los modelos
+from app.models.usuario import Usuario
+from app.models.propiedad import Propiedad, CaracteristicaPropiedad, FotoPropiedad
+from app.routers.propiedades import get_propiedades
+from app.services.distancias_campus import recalcular_todas_las_distancias
+from app.utils.paginacion import HEADER_SIGUIENTE_CURSOR
+
+NUM_PROPIEDADES = 2000
+# Costo de lectura aleatoria en disco SSD, como en la BD de producción
+RANDOM_PAGE_COST_SSD = 1.1
+TIPOS = ["habitacion", "departamento", "casa", "estudio"]
+COLONIAS = ["Centro", "San Manuel", "Cholula", "La Paz", "Angelópolis"]
+DESCRIPCIONES = [
+    "Habitación amueblada cerca de CU con baño privado",
+    "Departamento con estacionamiento y cocina equipada",
+    "Casa compartida con jardín, se aceptan mascotas",
+    "Estudio iluminado a dos cuadras del transporte",
+    "Cuarto sencillo con internet y servicios incluidos",
+    "Loft moderno con terraza y vista a los volcanes",
+    "Recámara en casa familiar, ambiente tranquilo",
+    "Departamento pequeño ideal para estudiantes foráneos",
+]
+
+# Valores por defecto de los Query(...) de get_propiedades
+FILTROS_BASE = {
+    "cursor": None,
+    "limit": 20,
+    "q": None,
+    "universidad": None,
+    "distancia_max": 5.0,
+    "precio_min": None,
+    "precio_max": None,
+    "tipo": None,
+    "num_habitaciones": None,
+    "amenidades": None,
+    "disponible": True,
+    "vista": "completa",
+}
+
+# (nombre, filtros, pedir también la segunda página con el cursor)
+FORMAS_BUSQUEDA = [
+    ("sin filtros", {}, True),
+    ("tipo", {"tipo": "departamento"}, True),
+    ("rango de precio", {"precio_min": 3000, "precio_max": 5000}, True),
+    ("tipo + rango de precio", {"tipo": "casa", "precio_min": 3000, "precio_max": 6000}, True),
+    ("num_habitaciones", {"num_habitaciones": 2}, False),
+    ("amenidades", {"amenidades": "wifi,amueblado,-mascotas_permitidas"}, True),
+    ("num_habitaciones + amenidades", {"num_habitaciones": 2, "amenidades": "wifi,-mascotas_permitidas"}, False),
+    ("incluye no disponibles", {"disponible": False}, True),
+    ("universidad", {"universidad": "BUAP"}, True),
+    ("universidad + tipo + precio", {"universidad": "BUAP", "tipo": "habitacion", "precio_max": 6000}, False),
+    ("texto", {"q": "terraza volcanes"}, True),
+    ("texto + tipo + precio", {"q": "mascotas", "tipo": "casa", "precio_max": 8000}, False),
+    ("texto + universidad", {"q": "amueblada", "universidad": "BUAP"}, False),
+    ("vista tarjeta", {"vista": "tarjeta"}, True),
+    ("vista tarjeta + tipo", {"vista": "tarjeta", "tipo": "estudio"}, False),
+    ("vista tarjeta + universidad", {"vista": "tarjeta", "universidad": "UDLAP"}, False),
+]
+
+
+def sembrar(db: Session, n: int, semilla: int = 7):
+    """Arrendador de prueba con n propiedades alrededor de Puebla"""
+    rnd = random.Random(semilla)
+
+    arrendador = Usuario(
+        email="planes.busqueda@campusnest.test",
+        password_hash="x",
+        tipo_usuario="arrendador",
+        nombre_completo="Arrendador Planes"
+    )
+    db.add(arrendador)
+    db.flush()
+
+    for i in range(n):
+        propiedad = Propiedad(
+            id_arrendador=arrendador.id_usuario,
+            titulo=f"Propiedad de prueba {i}",
+            descripcion=rnd.choice(DESCRIPCIONES),
+            tipo_propiedad=rnd.choice(TIPOS),
+            precio_mensual=Decimal(rnd.randint(1500, 12000)),
+            direccion_completa="Calle de prueba 123, Puebla",
+            latitud=Decimal(f"{19.04 + rnd.uniform(-0.12, 0.12):.8f}"),
+            longitud=Decimal(f"{-98.22 + rnd.uniform(-0.12, 0.12):.8f}"),
+            colonia=rnd.choice(COLONIAS),
+            disponible=rnd.random() < 0.8,
+            activa=rnd.random() < 0.95
+        )
+        propiedad.caracteristicas = CaracteristicaPropiedad(
+            wifi=rnd.random() < 0.7,
+            amueblado=rnd.random() < 0.5,
+            mascotas_permitidas=rnd.random() < 0.3,
+            numero_camas=rnd.randint(1, 4)
+        )
+        propiedad.fotos = [
+            FotoPropiedad(url_foto=f"https://fotos.test/{i}/{j}.jpg", orden=j, es_principal=(j == 0))
+            for j in range(3)
+        ]
+        db.add(propiedad)
+
+    db.flush()
+    recalcular_todas_las_distancias(db)
+    db.flush()
+
+
+def nodos_seq_scan(plan: dict):
+    """Tablas que el plan recorre completas (nodos Seq Scan)"""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name")
+    for subplan in plan.get("Plans", []):
+        yield from nodos_seq_scan(subplan)
+
+
+def indices_usados(plan: dict):
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for subplan in plan.get("Plans", []):
+        yield from indices_usados(subplan)
+
+
+def buscar(db: Session, filtros: dict):
+    """Llama a GET /propiedades y regresa las consultas SQL que ejecutó"""
+    consultas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append((statement, parameters))
+
+    conexion = db.connection()
+    event.listen(conexion, "before_cursor_execute", capturar)
+    try:
+        response = Response()
+        get_propiedades(response=response, db=db, current_user=None, **{**FILTROS_BASE, **filtros})
+    finally:
+        event.remove(conexion, "before_cursor_execute", capturar)
+
+    return consultas, response.headers.get(HEADER_SIGUIENTE_CURSOR)
+
+
+def test_planes_busqueda():
+    print("🔎 Verificando planes de consulta de GET /propiedades...")
+
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    db = Session(bind=conexion)
+    fallas = []
+
+    try:
+        # Con el valor por defecto (4.0, disco mecánico) y tablas tan pequeñas
+        # como las sembradas, leer la tabla completa sale más barato que el índice
+        db.execute(text(f"SET LOCAL random_page_cost = {RANDOM_PAGE_COST_SSD}"))
+
+        sembrar(db, NUM_PROPIEDADES)
+        # Estadísticas al día, como las deja el autovacuum
+        for tabla in ("propiedades", "caracteristicas_propiedad", "fotos_propiedad", "distancias_propiedad_campus"):
+            db.execute(text(f"ANALYZE {tabla}"))
+
+        for nombre, filtros, segunda_pagina in FORMAS_BUSQUEDA:
+            consultas, cursor = buscar(db, filtros)
+            if segunda_pagina and cursor:
+                mas_consultas, _ = buscar(db, {**filtros, "cursor": cursor})
+                consultas += mas_consultas
+
+            tablas_completas, indices = set(), set()
+            for statement, parameters in consultas:
+                plan = conexion.exec_driver_sql(
+                    "EXPLAIN (FORMAT JSON) " + statement, parameters
+                ).scalar()[0]["Plan"]
+                tablas_completas.update(nodos_seq_scan(plan))
+                indices.update(indices_usados(plan))
+
+            if tablas_completas:
+                fallas.append(nombre)
+                print(f"   ❌ {nombre}: Seq Scan en {', '.join(sorted(tablas_completas))}")
+            else:
+                print(f"   ✅ {nombre}: {', '.join(sorted(indices))}")
+    finally:
+        db.close()
+        transaccion.rollback()
+        conexion.close()
+
+    assert not fallas, f"{len(fallas)} forma(s) de búsqueda sin índice: {', '.join(fallas)}"
+    print(f"\n🎉 Las {len(FORMAS_BUSQUEDA)} formas de búsqueda usan índices")
+
+
+if __name__ == "__main__":
+    try:
+        test_planes_busqueda()
+    except AssertionError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
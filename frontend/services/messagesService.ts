@@ -23,12 +23,32 @@ export const messagesService = {
   },
 
   /**
-   * Obtener lista de conversaciones
+   * Obtener una página de conversaciones (de la más reciente a la más antigua).
+   * siguienteCursor es null en la última página.
+   */
+  async obtenerPaginaConversaciones(
+    cursor: string | null = null,
+    limit: number = 50
+  ): Promise<{ conversaciones: Conversacion[]; siguienteCursor: string | null }> {
+    const { data, headers } = await api.get<Conversacion[]>('/mensajes/conversaciones', {
+      params: cursor ? { limit, cursor } : { limit },
+    });
+    return { conversaciones: data, siguienteCursor: (headers['x-siguiente-cursor'] as string | undefined) ?? null };
+  },
+
+  /**
+   * Obtener lista completa de conversaciones (recorre todas las páginas)
    */
   async obtenerConversaciones(): Promise<Conversacion[]> {
     try {
-      const { data } = await api.get<Conversacion[]>('/mensajes/conversaciones');
-      return data;
+      const conversaciones: Conversacion[] = [];
+      let cursor: string | null = null;
+      do {
+        const pagina = await this.obtenerPaginaConversaciones(cursor, 100);
+        conversaciones.push(...pagina.conversaciones);
+        cursor = pagina.siguienteCursor;
+      } while (cursor);
+      return conversaciones;
     } catch (error) {
       console.error('❌ Error obteniendo conversaciones:', error);
       throw error;
@@ -81,15 +101,17 @@ export const messagesService = {
 
   /**
    * Conectar a WebSocket para chat en tiempo real
+   * (el token va en la URL: el navegador no permite headers en el WebSocket)
    */
   conectarWebSocket(
     userId: string,
+    token: string,
     onMessage: (mensaje: WebSocketMessage) => void,
     onError?: (error: Event) => void,
     onClose?: () => void
   ): WebSocket {
     try {
-      const ws = new WebSocket(`${WS_URL}/ws/chat/${userId}`);
+      const ws = new WebSocket(`${WS_URL}/ws/chat/${userId}?token=${encodeURIComponent(token)}`);
 
       ws.onopen = () => {
         console.log('✅ WebSocket conectado');